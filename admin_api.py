@@ -0,0 +1,194 @@
+"""
+Model administration of api_model.py: background reloads and the /admin routes.
+
+ModelReloader loads a model version off the request path, warms it up and
+swaps it in with api_model.activate; /admin/model reports the active and
+available versions and /admin/model/reload starts a reload. api_model
+registers the routes with register().
+"""
+import hmac
+import os
+import threading
+import time
+
+from flask import Blueprint, jsonify, request
+
+bp = Blueprint('admin', __name__)
+# api_model, whose active version, reloader and settings the routes use (set by register)
+api = None
+
+
+def register(app, api_module):
+    """Serve the /admin routes on `app` for the model and reloader of `api_module`."""
+    global api
+    api = api_module
+    app.register_blueprint(bp)
+
+
+class ModelReloader:
+    """
+    Load a model version in a background thread, warm it up, then activate it.
+    Requests keep being served by the active version until the swap; a version
+    that fails to load or to predict is never activated. One reload at a time.
+    With `poll_seconds` > 0, a watcher thread reloads the active directory
+    whenever its metadata.json (and therefore its version id) changes.
+    `api` is the api_model module, whose loaders and active version it uses.
+    """
+
+    def __init__(self, api, warmup=20, poll_seconds=0):
+        self.api = api
+        self.warmup = warmup
+        self.poll_seconds = poll_seconds
+        self._lock = threading.Lock()
+        self._thread = None
+        self._watcher = None
+        self._seen_version = None
+        self.state = 'idle'
+        self.target = None
+        self.last_error = None
+        self.last_reload = None
+        self.reloads = 0
+        self.failures = 0
+
+    def start(self, model_dir):
+        """Start loading `model_dir`; returns False if a reload is already running."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            self.state, self.target, self.last_error = 'loading', model_dir, None
+            self._thread = threading.Thread(
+                target=self._run, args=(model_dir,), name='model-reload', daemon=True
+            )
+            self._thread.start()
+            return True
+
+    def wait(self, timeout=None):
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _run(self, model_dir):
+        previous = self.api.active
+        try:
+            started = time.perf_counter()
+            version = self.api.load_version(model_dir)
+            loaded = time.perf_counter()
+            self.api.warm_up(version, self.warmup)
+            warmed = time.perf_counter()
+            self.api.activate(version)
+        except Exception as e:
+            self.failures += 1
+            self.last_error = str(e)
+            self.state = 'failed'
+            print(f"Model reload from {model_dir} failed: {e}. Keeping the active version.")
+            return
+        self.reloads += 1
+        self.last_reload = {
+            'version': version.version,
+            'previous_version': previous.version if previous is not None else None,
+            'dir': model_dir,
+            'load_seconds': loaded - started,
+            'warmup_seconds': warmed - loaded,
+            'finished_at': time.time(),
+        }
+        self.state = 'idle'
+        print(f"Model version {version.version} from {model_dir} is now active.")
+
+    def ensure_watching(self):
+        # Started lazily so that forked workers get their own thread
+        if self.poll_seconds <= 0 or (self._watcher is not None and self._watcher.is_alive()):
+            return
+        with self._lock:
+            if self._watcher is None or not self._watcher.is_alive():
+                self._watcher = threading.Thread(target=self._watch, name='model-watcher', daemon=True)
+                self._watcher.start()
+
+    def _watch(self):
+        from stunting_prediction_project.model_registry import METADATA_FILE, metadata_version
+        while True:
+            time.sleep(self.poll_seconds)
+            current = self.api.active
+            model_dir = current.model_dir if current is not None else self.api.MODEL_DIR
+            try:
+                version = metadata_version(os.path.join(model_dir, METADATA_FILE))
+            except OSError:
+                continue  # Mid-write or removed; look again next time
+            if self._seen_version is None and current is not None:
+                self._seen_version = current.version
+            # Each new version id is attempted once, so a broken deploy is not retried in a loop
+            if version != self._seen_version:
+                self._seen_version = version
+                self.start(model_dir)
+
+    def stats(self):
+        return {
+            'state': self.state,
+            'target': self.target,
+            'last_error': self.last_error,
+            'last_reload': self.last_reload,
+            'reloads': self.reloads,
+            'failures': self.failures,
+            'poll_seconds': self.poll_seconds,
+        }
+
+
+def admin_allowed():
+    """With ADMIN_TOKEN set, require it in X-Admin-Token; otherwise allow localhost only."""
+    if api.ADMIN_TOKEN:
+        return hmac.compare_digest(request.headers.get('X-Admin-Token', ''), api.ADMIN_TOKEN)
+    return request.remote_addr in ('127.0.0.1', '::1')
+
+
+@bp.route('/admin/model', methods=['GET'])
+def admin_model():
+    """Report the active model version, reload status and the versions available on disk."""
+    if not admin_allowed():
+        return jsonify({'error': 'Forbidden'}), 403
+    from stunting_prediction_project.model_registry import scan
+    current = api.active
+    available = [{
+        'version': entry['version'],
+        'dir': entry['dir'],
+        'model_path': entry['model_path'],
+        'modified': entry['modified'],
+        'active': current is not None and entry['version'] == current.version,
+    } for entry in scan(api.MODEL_ROOT)]
+    return jsonify({
+        'active': current.info() if current is not None else None,
+        'reload': api.reloader.stats(),
+        'available': available,
+    })
+
+
+@bp.route('/admin/model/reload', methods=['POST'])
+def admin_reload():
+    """
+    Load a model version in the background and swap it in once warmed up.
+    Body (optional): {"version": "<id, id prefix or artifacts_* dir>", "force": false, "wait": false}.
+    Without a version the active directory is re-read (e.g. after train.py wrote to it).
+    """
+    if not admin_allowed():
+        return jsonify({'error': 'Forbidden'}), 403
+    from stunting_prediction_project.model_registry import describe, resolve
+    body = request.get_json(silent=True) or {}
+    current = api.active
+    try:
+        if body.get('version'):
+            entry = resolve(api.MODEL_ROOT, str(body['version']))
+        else:
+            model_dir = current.model_dir if current is not None else api.MODEL_DIR
+            entry = describe(model_dir) or {'dir': model_dir, 'version': None}
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 404
+
+    if current is not None and entry['version'] == current.version and not body.get('force'):
+        return jsonify({'message': 'Version already active', 'active': current.info()})
+    if not api.reloader.start(entry['dir']):
+        return jsonify({'error': 'A reload is already in progress', 'reload': api.reloader.stats()}), 409
+    if body.get('wait'):
+        api.reloader.wait()
+        code = 500 if api.reloader.state == 'failed' else 200
+        return jsonify({'reload': api.reloader.stats(),
+                        'active': api.active.info() if api.active is not None else None}), code
+    return jsonify({'message': 'Reload started', 'dir': entry['dir'],
+                    'version': entry['version']}), 202
@@ -1,39 +1,282 @@
 import os
-import joblib
-import pandas as pd
-from flask import Flask, request, jsonify
+import sys
+import json
+import queue
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+import numpy as np
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS
+import admin_api
+from admin_api import ModelReloader
+import explain_api
+from explain_api import build_explainer
+import drift_api
+from drift_api import observe_drift
+import history_api
+from history_api import parse_visit, record_visits
+from metrics import NULL_STOPWATCH, Registry, Stopwatch
+from prediction_batcher import PredictionBatcher
+from prediction_cache import PredictionCache
+from record_scorer import build_scorer, model_columns, model_input, score_records, to_model_row
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
 # Configuration
-MODEL_DIR = 'stunting_prediction_project/artifacts_sklearn171'
+# Artifact directories (artifacts_*) written by train.py live under MODEL_ROOT;
+# MODEL_DIR is the one loaded at startup
+MODEL_ROOT = os.environ.get('MODEL_ROOT', 'stunting_prediction_project')
+MODEL_DIR = os.environ.get('MODEL_DIR', os.path.join(MODEL_ROOT, 'artifacts_sklearn171'))
 MODEL_FILE = 'best_model_RandomForest.joblib'
 MODEL_PATH = os.path.join(MODEL_DIR, MODEL_FILE)
+# Inference engine: 'sklearn' (joblib Pipeline, the default: fastest for
+# /predict/batch and /explain/batch), 'compiled' (compiled_model.npz written into
+# the artifact directory by train.py or export_compiled.py) or 'auto': the
+# compiled bundle when it is up to date, else the Pipeline. The bundle loads
+# without importing sklearn or pandas and wins on cold start and single-record
+# /predict, but scores large batches about 3x slower.
+INFERENCE_ENGINE = os.environ.get('INFERENCE_ENGINE', 'sklearn')
+COMPILED_MODEL_FILE = 'compiled_model.npz'
+# Precomputed risk table (risk_table.npy from stunting_prediction_project/build_lookup.py):
+# 'off', 'nearest' or 'interpolate'. Inputs outside the grid still use the model.
+RISK_TABLE_MODE = os.environ.get('RISK_TABLE', 'off')
+RISK_TABLE_FILE = 'risk_table.npy'
+# Maximum number of records accepted by /predict/batch in a single request
+MAX_BATCH_SIZE = int(os.environ.get('MAX_BATCH_SIZE', 5000))
 
-# Global variable to hold the model
+# Optional request coalescing for /predict (see PredictionBatcher)
+BATCHING_ENABLED = os.environ.get('PREDICT_BATCHING', '0') == '1'
+BATCH_MAX_SIZE = int(os.environ.get('PREDICT_BATCH_MAX_SIZE', 64))
+BATCH_MAX_WAIT_MS = float(os.environ.get('PREDICT_BATCH_MAX_WAIT_MS', 5))
+BATCH_QUEUE_SIZE = int(os.environ.get('PREDICT_BATCH_QUEUE_SIZE', 1024))
+# Longest a /predict request waits for its batch before it is scored directly:
+# a few batch windows plus the model time of a full batch
+BATCH_TIMEOUT_MS = float(os.environ.get('PREDICT_BATCH_TIMEOUT_MS', 4 * BATCH_MAX_WAIT_MS + 250))
+
+# Hot reload (see /admin/model): predictions run on a new version before it is
+# swapped in, and MODEL_RELOAD_POLL > 0 makes every process watch MODEL_DIR's
+# metadata.json and reload when it changes (needed with several gunicorn workers)
+RELOAD_WARMUP = int(os.environ.get('MODEL_RELOAD_WARMUP', 20))
+RELOAD_POLL_SECONDS = float(os.environ.get('MODEL_RELOAD_POLL', 0))
+# Required in X-Admin-Token for /admin/*; without it only localhost is allowed
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+# Per-stage latency histograms and counters served at /metrics (METRICS=0 disables)
+METRICS_ENABLED = os.environ.get('METRICS', '1') != '0'
+
+# Memoized /predict results keyed on the quantized input (0 disables the cache)
+CACHE_SIZE = int(os.environ.get('PREDICT_CACHE_SIZE', 4096))
+CACHE_TTL_SECONDS = float(os.environ.get('PREDICT_CACHE_TTL', 3600))
+
+# Growth-history store (stunting_prediction_project/growth_history.py): an SQLite
+# file that /predict and /predict/batch add records with an 'id_anak' to, and
+# that /history/* scores trajectories from. Unset: history is off.
+GROWTH_HISTORY_DB = os.environ.get('GROWTH_HISTORY_DB')
+# Input-drift monitor against the drift_reference.json of each model version
+# (see /drift). DRIFT_WINDOW: rows per window; reports cover the last two.
+DRIFT_MONITOR_ENABLED = os.environ.get('DRIFT_MONITOR', '1') != '0'
+DRIFT_WINDOW = int(os.environ.get('DRIFT_WINDOW', 10000))
+
+REQUIRED_FIELDS = ['usia_bulan', 'tinggi_badan', 'berat_badan', 'gender']
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+# Sample record used to warm a model up before it serves traffic
+WARMUP_RECORD = {'usia_bulan': 24, 'tinggi_badan': 85.0, 'berat_badan': 11.5, 'gender': 'L'}
+# Confidence labels '0.0%' ... '100.0%', looked up instead of formatted for every prediction
+CONFIDENCE_TEXT = tuple(f"{i / 10:.1f}%" for i in range(1001))
+
+# Dummy Logic Mapping (0-3)
+DUMMY_STATUS_MAP = {
+    0: 'Sangat Pendek',
+    1: 'Pendek',
+    2: 'Normal',
+    3: 'Tinggi'
+}
+
+metrics_registry = Registry()
+request_seconds = metrics_registry.histogram(
+    'stunting_request_duration_seconds', 'End-to-end request latency.', ('endpoint',))
+stage_seconds = metrics_registry.histogram(
+    'stunting_stage_duration_seconds',
+    'Time per request stage (json_parse, validation, lookup, encode or dataframe, '
+    'preprocess, predict_proba, batched_predict, contributions, history, drift, serialize).', ('endpoint', 'stage'))
+requests_total = metrics_registry.counter(
+    'stunting_http_requests_total', 'Requests by endpoint and HTTP status.', ('endpoint', 'status'))
+predictions_total = metrics_registry.counter(
+    'stunting_predictions_total', 'Records answered by the model or by the rule-based fallback.',
+    ('endpoint', 'source'))
+errors_total = metrics_registry.counter(
+    'stunting_errors_total', 'Errors by kind (bad_request, model, internal).', ('endpoint', 'kind'))
+
+def stopwatch(endpoint):
+    """Stage timer for one request (a no-op when metrics are disabled)."""
+    return Stopwatch(stage_seconds, endpoint) if METRICS_ENABLED else NULL_STOPWATCH
+
+# The ModelVersion serving new requests. Reloads replace the reference in one
+# assignment; a request takes it once and uses that version until it returns.
+active = None
+# Mirrors of active.model / active.risk_table
 model = None
+risk_table = None
+
+class ModelVersion:
+    """A loaded artifact directory: the model, its risk table and metadata."""
+
+    def __init__(self, version, model_dir, model_path, model, risk_table=None, metadata=None,
+                 engine=INFERENCE_ENGINE, drift=None):
+        self.version = version
+        self.model_dir = model_dir
+        self.model_path = model_path
+        self.model = model
+        self.risk_table = risk_table
+        self.metadata = metadata or {}
+        self.engine = engine
+        self.columns = model_columns(self.metadata)
+        # {'features': [...], 'columns': {role: name}} for models trained with WHO z-scores
+        self.who_features = self.metadata.get('who_features')
+        # DriftMonitor of the inputs this version serves (None: no training reference)
+        self.drift = drift
+        self.loaded_at = time.time()
+        self._scorer = None
+        self._scorer_built = False
+        self._explainer = None
+        self._explainer_built = False
+
+    @property
+    def scorer(self):
+        """RecordScorer of this version, built on first use (None: use model_input)."""
+        if not self._scorer_built:
+            self._scorer = build_scorer(self)
+            self._scorer_built = True
+        return self._scorer
+
+    @property
+    def explainer(self):
+        """CompiledForest giving path contributions for this version, built on
+        first use (None: the model is not a RandomForest)."""
+        if not self._explainer_built:
+            self._explainer = build_explainer(self)
+            self._explainer_built = True
+        return self._explainer
+
+    def info(self):
+        return {
+            'version': self.version,
+            'dir': self.model_dir,
+            'model_path': self.model_path,
+            'engine': self.engine,
+            'risk_table': self.risk_table is not None,
+            'drift_monitor': self.drift is not None,
+            'loaded_at': self.loaded_at,
+        }
+
+prediction_cache = PredictionCache(CACHE_SIZE, CACHE_TTL_SECONDS) if CACHE_SIZE > 0 else None
+
+def load_version(model_dir):
+    """Load an artifact directory into a ModelVersion; raises if it cannot be loaded."""
+    from stunting_prediction_project.model_registry import describe
+    from stunting_prediction_project.compiled_model import resolve_engine
+    entry = describe(model_dir) or {}
+    model_path = entry.get('model_path') or os.path.join(model_dir, MODEL_FILE)
+    engine = resolve_engine(INFERENCE_ENGINE, os.path.join(model_dir, COMPILED_MODEL_FILE), model_path)
+    if engine == 'compiled':
+        from stunting_prediction_project.compiled_model import CompiledForest
+        path, loader = os.path.join(model_dir, COMPILED_MODEL_FILE), CompiledForest.load
+    else:
+        # Imports sklearn (and pandas) when the pipeline is unpickled
+        import joblib
+        path, loader = model_path, joblib.load
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Model file not found at {path}")
+    print(f"Loading model from {path}...")
+    loaded = loader(path)
+    table = load_risk_table(model_dir, model_path)
+    return ModelVersion(entry.get('version', 'unversioned'), model_dir, path, loaded,
+                        table, entry.get('metadata'), engine, load_drift_monitor(model_dir))
 
-def load_model():
-    global model
+def load_risk_table(model_dir, model_path):
+    if RISK_TABLE_MODE == 'off':
+        return None
+    from stunting_prediction_project.lookup_table import RiskTable
+    table_path = os.path.join(model_dir, RISK_TABLE_FILE)
     try:
-        if os.path.exists(MODEL_PATH):
-            print(f"Loading model from {MODEL_PATH}...")
-            model = joblib.load(MODEL_PATH)
-            print("Model loaded successfully.")
-        else:
-            print(f"Model file not found at {MODEL_PATH}. Using dummy logic.")
+        if os.path.exists(table_path):
+            # Refuses a table that was built from a different model file
+            table = RiskTable.load(table_path, model_path=model_path if os.path.exists(model_path) else None)
+            print(f"Risk table loaded from {table_path} ({RISK_TABLE_MODE}).")
+            return table
+        print(f"Risk table not found at {table_path}. Using the model only.")
+    except Exception as e:
+        print(f"Error loading risk table: {e}. Using the model only.")
+    return None
+
+def load_drift_monitor(model_dir):
+    """DriftMonitor for the training reference in `model_dir`, or None (off, or no reference)."""
+    if not DRIFT_MONITOR_ENABLED:
+        return None
+    from stunting_prediction_project.drift import DRIFT_FILE, DriftMonitor, load_reference
+    try:
+        reference = load_reference(model_dir)
+    except Exception as e:
+        print(f"Error loading drift reference: {e}. Drift monitoring is off.")
+        return None
+    if reference is None:
+        print(f"No {DRIFT_FILE} in {model_dir}. Drift monitoring is off (retrain to create it).")
+        return None
+    return DriftMonitor(reference, DRIFT_WINDOW)
+
+def activate(version):
+    """
+    Route new requests to `version`. This is a plain reference swap, so it never
+    waits for requests in flight; those finish on the version they started with.
+    Cached predictions belong to the old model and are dropped on first use.
+    """
+    global active, model, risk_table
+    active = version
+    model, risk_table = version.model, version.risk_table
+
+def load_model(model_dir=None):
+    """Load MODEL_DIR (or `model_dir`) synchronously and activate it."""
+    try:
+        activate(load_version(model_dir or MODEL_DIR))
+        print("Model loaded successfully.")
+    except FileNotFoundError as e:
+        print(f"{e}. Using dummy logic.")
     except Exception as e:
         print(f"Error loading model: {e}. Using dummy logic.")
 
 # Load model on startup
 load_model()
 
-def get_dummy_prediction(usia, tinggi, berat, gender_code):
+def load_growth_standard():
+    """WHO LMS tables for the rule-based fallback, or None (then a simple height heuristic is used)."""
+    try:
+        from stunting_prediction_project.who_growth import load
+        return load()
+    except Exception as e:
+        print(f"WHO growth tables not available ({e}). Fallback uses a simple height heuristic.")
+        return None
+
+growth_standard = load_growth_standard()
+
+def load_history_store():
+    """GrowthHistory at GROWTH_HISTORY_DB, or None when history is off or the file cannot be opened."""
+    if not GROWTH_HISTORY_DB:
+        return None
+    try:
+        from stunting_prediction_project.growth_history import GrowthHistory
+        store = GrowthHistory(GROWTH_HISTORY_DB)
+        print(f"Growth history at {GROWTH_HISTORY_DB}.")
+        return store
+    except Exception as e:
+        print(f"Growth history not available ({e}).")
+        return None
+
+history_store = load_history_store()
+
+def heuristic_height_class(usia, tinggi):
     """
-    Dummy logic to simulate prediction when model is not available.
-    Simple heuristic for demonstration purposes.
+    Height class from a linear growth approximation, for ages outside the
+    WHO tables (0-60 months) or when they could not be loaded.
     """
     # Very basic WHO-like approximation (NOT ACCURATE MEDICALLY)
     # Average height at 12 months is ~75cm.
@@ -51,63 +294,245 @@ def get_dummy_prediction(usia, tinggi, berat, gender_code):
     else:
         return 2  # Normal
 
+def rule_based_classes(parsed):
+    """
+    Fallback classes (DUMMY_STATUS_MAP codes) for parsed records, used when the
+    model is not available: the WHO height-for-age z-score category
+    (< -3 Sangat Pendek, < -2 Pendek, > 3 Tinggi), computed for all records in
+    one vectorised pass.
+    """
+    if not parsed:
+        return []
+    usia, tinggi, _, gender_val = (np.asarray(col, dtype=np.float64) for col in list(zip(*parsed))[:4])
+    classes = np.full(len(parsed), -1, dtype=np.int8)
+    if growth_standard is not None:
+        from stunting_prediction_project.who_growth import classify_height_for_age
+        classes = classify_height_for_age(growth_standard.height_for_age(gender_val, usia, tinggi))
+    for i in np.flatnonzero(classes < 0):
+        classes[i] = heuristic_height_class(usia[i], tinggi[i])
+    return classes.tolist()
+
+def get_dummy_prediction(usia, tinggi, berat, gender_code):
+    """
+    Rule-based prediction when the model is not available (see rule_based_classes).
+    """
+    return rule_based_classes([(usia, tinggi, berat, gender_code)])[0]
+
+def model_status(prediction_class):
+    """Binary Model Mapping: 0 = Normal/Tall, 1 = Stunting (Pendek/Sangat Pendek)."""
+    if prediction_class == 0:
+        return "Normal" # Includes Tall
+    if prediction_class == 1:
+        return "Stunting" # Includes Severely Stunted
+    return "Unknown"
+
+def find_missing_field(data):
+    """Return the first required field absent from `data`, or None."""
+    for field in REQUIRED_FIELDS:
+        if field not in data:
+            return field
+    return None
+
+def parse_record(data):
+    """
+    Convert one raw input record into model-ready values.
+    Returns (usia, tinggi, berat, gender_val, gender_str); raises on bad values.
+    """
+    usia = int(data['usia_bulan'])
+    tinggi = float(data['tinggi_badan'])
+    berat = float(data['berat_badan'])
+    gender_input = data['gender'] # Expect 'L'/'P' or 'Laki-laki'/'Perempuan'
+
+    # Preprocessing
+    # Map gender to 1 (Laki-laki) or 0 (Perempuan)
+    if gender_input.lower() in ['l', 'laki-laki', 'laki']:
+        gender_val = 1
+        gender_str = 'Laki-laki'
+    else:
+        gender_val = 0
+        gender_str = 'Perempuan'
+
+    return usia, tinggi, berat, gender_val, gender_str
+
+def confidence_texts(p):
+    """Confidence labels for an array of probabilities (rounded to 0.1%)."""
+    return [CONFIDENCE_TEXT[i] for i in np.rint(np.asarray(p) * 1000).astype(np.intp).tolist()]
+
+batcher = None
+if BATCHING_ENABLED:
+    batcher = PredictionBatcher(
+        score_records,
+        max_batch_size=BATCH_MAX_SIZE,
+        max_wait_ms=BATCH_MAX_WAIT_MS,
+        max_queue_size=BATCH_QUEUE_SIZE,
+    )
+
+def predict_one(current, record, watch=NULL_STOPWATCH):
+    """
+    Score one parsed record (usia, tinggi, berat, gender_val) with `current`;
+    returns (prediction_class, confidence).
+    """
+    model = current.model
+    if not hasattr(model, 'predict_proba'):
+        input_data = model_input(current, [to_model_row(*record, current.columns)])
+        watch.lap('dataframe')
+        prediction_class = model.predict(input_data)[0]
+        watch.lap('predict_proba')
+        return prediction_class, "High (Model)"
+
+    probs = None
+    if batcher is not None:
+        try:
+            # Coalesced with concurrent requests into one model call
+            probs = batcher.predict_proba(current, record, BATCH_TIMEOUT_MS / 1000.0)
+            watch.lap('batched_predict')
+        except queue.Full:
+            pass  # Saturated: score this request directly
+        except FutureTimeoutError:
+            # Batch thread stalled or far behind: don't hold the request open
+            errors_total.inc('predict', 'batcher_timeout')
+    if probs is None:
+        # One pass gives both the class (argmax, as predict does) and its confidence
+        probs = score_records(current, [record], watch)[0]
+    best = probs.argmax()
+    return model.classes_[best], CONFIDENCE_TEXT[round(probs[best] * 1000)]
+
+def table_result(table, p):
+    """Turn a table P(stunting) into (prediction_class, confidence) like predict_one."""
+    best = 1 if p > 0.5 else 0
+    return table.classes[best], CONFIDENCE_TEXT[round(max(p, 1 - p) * 1000)]
+
+def predict_from_table(current, usia, tinggi, berat, gender_str):
+    """Answer from the version's risk table, or None when the input is off-grid."""
+    table = current.risk_table
+    p = table.lookup_one(usia, gender_str, tinggi, berat, RISK_TABLE_MODE == 'interpolate')
+    return None if p is None else table_result(table, p)
+
+def predict_parsed(parsed, current=None, watch=NULL_STOPWATCH):
+    """
+    Score parsed records with the risk table (when enabled) and the model of
+    `current` (default: the active version). `watch` times the stages.
+    Off-grid records go through the model in a single predict_proba pass.
+    Returns (classes, confidences).
+    """
+    if current is None:
+        current = active
+    model, risk_table = current.model, current.risk_table
+    classes = [None] * len(parsed)
+    confidences = [None] * len(parsed)
+    todo = list(range(len(parsed)))
+
+    if risk_table is not None and parsed:
+        usia, tinggi, berat, _, gender_str = zip(*parsed)
+        probs, in_grid = risk_table.lookup(
+            usia, risk_table.sex_codes(gender_str), tinggi, berat,
+            RISK_TABLE_MODE == 'interpolate'
+        )
+        for i in np.flatnonzero(in_grid):
+            classes[i], confidences[i] = table_result(risk_table, probs[i])
+        todo = np.flatnonzero(~in_grid).tolist()
+        watch.lap('lookup')
+
+    if todo:
+        if hasattr(model, 'predict_proba'):
+            # One pass through the forest gives both class and confidence
+            probs = score_records(current, [parsed[i][:4] for i in todo], watch)
+            best = probs.argmax(axis=1)
+            model_classes = model.classes_[best]
+            model_confidences = confidence_texts(probs[np.arange(len(best)), best])
+        else:
+            input_data = model_input(current, [to_model_row(*parsed[i][:4], current.columns) for i in todo])
+            watch.lap('dataframe')
+            model_classes = model.predict(input_data)
+            model_confidences = ["High (Model)"] * len(todo)
+            watch.lap('predict_proba')
+        for i, c, conf in zip(todo, model_classes, model_confidences):
+            classes[i], confidences[i] = c, conf
+
+    return classes, confidences
+
+def warm_up(version, n):
+    """Run a few predictions so the first real requests do not pay one-time costs."""
+    parsed = [parse_record(WARMUP_RECORD)]
+    for _ in range(n):
+        predict_parsed(parsed, version)
+
+reloader = ModelReloader(sys.modules[__name__], warmup=RELOAD_WARMUP, poll_seconds=RELOAD_POLL_SECONDS)
+
+@app.before_request
+def start_model_watcher():
+    reloader.ensure_watching()
+
+@app.before_request
+def start_request_timer():
+    if METRICS_ENABLED:
+        g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request(response):
+    started = g.get('request_started')
+    if started is not None:
+        # Routes of blueprints (e.g. 'explain.explain') are labelled by their view name
+        endpoint = (request.endpoint or 'unknown').rpartition('.')[2]
+        request_seconds.observe(time.perf_counter() - started, endpoint)
+        requests_total.inc(endpoint, str(response.status_code))
+    return response
+
 @app.route('/predict', methods=['POST'])
 def predict():
+    watch = stopwatch('predict')
     try:
         data = request.get_json()
+        watch.lap('json_parse')
         
         # Validate input
-        required_fields = ['usia_bulan', 'tinggi_badan', 'berat_badan', 'gender']
-        for field in required_fields:
-            if field not in data:
-                return jsonify({'error': f'Missing field: {field}'}), 400
-
-        usia = int(data['usia_bulan'])
-        tinggi = float(data['tinggi_badan'])
-        berat = float(data['berat_badan'])
-        gender_input = data['gender'] # Expect 'L'/'P' or 'Laki-laki'/'Perempuan'
-
-        # Preprocessing
-        # Map gender to 1 (Laki-laki) or 0 (Perempuan)
-        if gender_input.lower() in ['l', 'laki-laki', 'laki']:
-            gender_val = 1
-            gender_str = 'Laki-laki'
-        else:
-            gender_val = 0
-            gender_str = 'Perempuan'
-
-        # Prepare data for model (matching the training columns)
-        # Columns: 'Umur (bulan)', 'Tinggi Badan (cm)', 'Berat Badan (kg)', 'Jenis Kelamin', 'Wasting'
-        # Note: 'Wasting' seems to be required by the model. We'll initialize it to "Normal weight" as a placeholder
-        input_data = pd.DataFrame([{
-            'Umur (bulan)': usia,
-            'Tinggi Badan (cm)': tinggi,
-            'Berat Badan (kg)': berat,
-            'Jenis Kelamin': gender_val,
-            'Wasting': "Normal weight" 
-        }])
+        missing = find_missing_field(data)
+        if missing:
+            errors_total.inc('predict', 'bad_request')
+            return jsonify({'error': f'Missing field: {missing}'}), 400
+
+        usia, tinggi, berat, gender_val, gender_str = parse_record(data)
+        visit = None
+        if history_store is not None:
+            try:
+                visit = parse_visit(data)
+            except ValueError as e:
+                errors_total.inc('predict', 'bad_request')
+                return jsonify({'error': str(e)}), 400
+        # Pin this request to one model version, even if a reload swaps it meanwhile
+        current = active
+        watch.lap('validation')
+        if current is not None and current.drift is not None:
+            observe_drift(current, [(usia, tinggi, berat, gender_val)], 'predict')
+            watch.lap('drift')
 
         # Prediction Logic
         prediction_class = None
         confidence = "N/A"
         message = ""
 
-        if model:
+        if current is not None:
             try:
-                # TODO: LOAD PICKLE MODEL HERE - Already implemented in load_model()
-                prediction_class = model.predict(input_data)[0]
-                # Try to get probability if supported
-                if hasattr(model, 'predict_proba'):
-                    probs = model.predict_proba(input_data)[0]
-                    # If binary, probs is [prob_0, prob_1]
-                    # If prediction is 0, confidence is probs[0]
-                    # If prediction is 1, confidence is probs[1]
-                    confidence_val = probs[prediction_class]
-                    confidence = f"{confidence_val*100:.1f}%"
-                else:
-                    confidence = "High (Model)"
+                result = None
+                cache_key = None
+                if current.risk_table is not None:
+                    # In-grid inputs are answered without touching the model
+                    result = predict_from_table(current, usia, tinggi, berat, gender_str)
+                if result is None and prediction_cache is not None:
+                    # Measurements are taken to one decimal; the key is quantized so
+                    # resubmissions share an entry (the inputs themselves stay as sent)
+                    cache_key = (usia, round(tinggi, 1), round(berat, 1), gender_val)
+                    result = prediction_cache.get(cache_key, current.model)
+                if current.risk_table is not None or prediction_cache is not None:
+                    watch.lap('lookup')
+                if result is None:
+                    result = predict_one(current, (usia, tinggi, berat, gender_val), watch)
+                    if cache_key is not None:
+                        prediction_cache.put(cache_key, result, current.model)
+                prediction_class, confidence = result
                 message = "Prediction based on AI Model."
             except Exception as e:
+                errors_total.inc('predict', 'model')
                 print(f"Prediction error: {e}")
                 # Fallback to dummy if model fails during predict
                 prediction_class = get_dummy_prediction(usia, tinggi, berat, gender_val)
@@ -125,23 +550,18 @@ def predict():
         
         status_text = "Unknown"
         
-        if model and message == "Prediction based on AI Model.":
-            # Binary Model Mapping
-            if prediction_class == 0:
-                status_text = "Normal" # Includes Tall
-            elif prediction_class == 1:
-                status_text = "Stunting" # Includes Severely Stunted
+        if current is not None and message == "Prediction based on AI Model.":
+            status_text = model_status(prediction_class)
+            predictions_total.inc('predict', 'model')
         else:
-            # Dummy Logic Mapping (0-3)
-            status_map = {
-                0: 'Sangat Pendek',
-                1: 'Pendek',
-                2: 'Normal',
-                3: 'Tinggi'
-            }
-            status_text = status_map.get(prediction_class, "Unknown")
+            status_text = DUMMY_STATUS_MAP.get(prediction_class, "Unknown")
+            predictions_total.inc('predict', 'fallback')
+
+        if visit is not None:
+            record_visits([visit], [(usia, tinggi, berat, gender_val)], 'predict')
+            watch.lap('history')
 
-        return jsonify({
+        response = jsonify({
             'status': status_text,
             'confidence': confidence,
             'message': message,
@@ -152,10 +572,214 @@ def predict():
                 'gender': gender_str
             }
         })
+        watch.lap('serialize')
+        return response
+
+    except Exception as e:
+        errors_total.inc('predict', 'internal')
+        return jsonify({'error': str(e)}), 500
+
+def read_batch_records():
+    """
+    Read the records of a batch request body.
+    Accepts a JSON array, or NDJSON (one JSON object per line).
+    Returns (records, errors) where errors holds lines that failed to parse.
+    """
+    if request.mimetype in NDJSON_MIMETYPES:
+        records = []
+        errors = []
+        lines = request.get_data(as_text=True).splitlines()
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError as e:
+                errors.append({'index': len(records), 'error': f'Invalid JSON line: {e}'})
+                records.append(None)
+        return records, errors
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, list):
+        raise ValueError('Expected a JSON array of records or an NDJSON body')
+    return data, []
+
+def parse_batch(records, errors, with_visits=False):
+    """
+    Validate every record of a batch; invalid ones are reported in `errors`
+    (sorted by index), not fatal. Returns (indices, parsed, visits) of the
+    valid ones; `visits` (see parse_visit) only when `with_visits` is set and
+    the growth history is on, else None.
+    """
+    failed = {err['index'] for err in errors}
+    with_visits = with_visits and history_store is not None
+    indices = []
+    parsed = []
+    visits = [] if with_visits else None
+    for i, data in enumerate(records):
+        if i in failed:
+            continue
+        try:
+            if not isinstance(data, dict):
+                raise ValueError('Record must be a JSON object')
+            missing = find_missing_field(data)
+            if missing:
+                raise ValueError(f'Missing field: {missing}')
+            record = parse_record(data)
+            if with_visits:
+                visits.append(parse_visit(data))
+            parsed.append(record)
+            indices.append(i)
+        except Exception as e:
+            errors.append({'index': i, 'error': str(e)})
+    errors.sort(key=lambda err: err['index'])
+    return indices, parsed, visits
+
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    """
+    Score many children in one request.
+    Builds one model input for all valid records and makes a single predict_proba pass.
+    """
+    watch = stopwatch('predict_batch')
+    try:
+        try:
+            records, errors = read_batch_records()
+        except ValueError as e:
+            errors_total.inc('predict_batch', 'bad_request')
+            return jsonify({'error': str(e)}), 400
+        watch.lap('json_parse')
+
+        if len(records) > MAX_BATCH_SIZE:
+            errors_total.inc('predict_batch', 'bad_request')
+            return jsonify({
+                'error': f'Batch too large: {len(records)} records (max {MAX_BATCH_SIZE})'
+            }), 413
+
+        indices, parsed, visits = parse_batch(records, errors, with_visits=True)
+        watch.lap('validation')
+
+        statuses = None
+        confidences = []
+        message = ""
+        current = active
+
+        if current is not None and current.drift is not None:
+            observe_drift(current, parsed, 'predict_batch')
+            watch.lap('drift')
+
+        if current is not None:
+            try:
+                classes, confidences = predict_parsed(parsed, current, watch)
+                statuses = [model_status(c) for c in classes]
+                message = "Prediction based on AI Model."
+                predictions_total.inc('predict_batch', 'model', amount=len(parsed))
+            except Exception as e:
+                errors_total.inc('predict_batch', 'model')
+                print(f"Batch prediction error: {e}")
+                # Fallback to dummy if model fails during predict
+                message = f"Model error, using fallback logic. Error: {str(e)}"
+                confidences = ["Low (Fallback)"] * len(parsed)
+        else:
+            message = "Model file not found. Using rule-based fallback logic."
+            confidences = ["Medium (Rule-based)"] * len(parsed)
+
+        if statuses is None:
+            statuses = [DUMMY_STATUS_MAP.get(c, "Unknown") for c in rule_based_classes(parsed)]
+            predictions_total.inc('predict_batch', 'fallback', amount=len(parsed))
+
+        if visits is not None:
+            record_visits(visits, parsed, 'predict_batch')
+            watch.lap('history')
+
+        results = []
+        for i, (usia, tinggi, berat, _, gender_str), status_text, confidence in zip(
+                indices, parsed, statuses, confidences):
+            results.append({
+                'index': i,
+                'status': status_text,
+                'confidence': confidence,
+                'input_received': {
+                    'usia': usia,
+                    'tinggi': tinggi,
+                    'berat': berat,
+                    'gender': gender_str
+                }
+            })
+
+        response = jsonify({
+            'message': message,
+            'count': len(results),
+            'results': results,
+            'errors': errors
+        })
+        watch.lap('serialize')
+        return response
 
     except Exception as e:
+        errors_total.inc('predict_batch', 'internal')
         return jsonify({'error': str(e)}), 500
 
+@app.route('/predict/batcher', methods=['GET'])
+def batcher_stats():
+    """Report request-coalescing settings and observed queue/batch statistics."""
+    if batcher is None:
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, **batcher.stats()})
+
+@app.route('/predict/cache', methods=['GET'])
+def cache_stats():
+    """Report prediction cache size and hit/miss/eviction counters."""
+    if prediction_cache is None:
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, **prediction_cache.stats()})
+
+def model_info_series():
+    current = active
+    return {} if current is None else {(current.version, current.engine): 1}
+
+metrics_registry.gauge('stunting_model_loaded', '1 when a model is active, 0 while on the rule-based fallback.',
+                       callback=lambda: {(): int(active is not None)})
+metrics_registry.gauge('stunting_model_info', 'Active model version and inference engine.',
+                       ('version', 'engine'), callback=model_info_series)
+metrics_registry.gauge('stunting_model_reloads', 'Model reloads by result since the process started.',
+                       ('result',), callback=lambda: {('ok',): reloader.reloads, ('failed',): reloader.failures})
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Metrics of this process in the Prometheus text format."""
+    return Response(metrics_registry.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/health', methods=['GET'])
+def health():
+    """Liveness: the process is up and serving requests."""
+    return jsonify({'status': 'ok'})
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    """Readiness: the model is loaded (503 while only the rule-based fallback is available)."""
+    current = active
+    if current is None:
+        return jsonify({'ready': False, 'reason': 'Model not loaded; using rule-based fallback'}), 503
+    return jsonify({'ready': True, **current.info()})
+
+# Routes kept in their own modules; they use the active version and helpers of this one
+admin_api.register(app, sys.modules[__name__])
+explain_api.register(app, sys.modules[__name__])
+history_api.register(app, sys.modules[__name__])
+drift_api.register(app, sys.modules[__name__])
+
+def create_app():
+    """
+    Application factory for production servers (see serve.py).
+    The model is loaded when this module is imported, so a server that imports
+    it before forking shares one copy-on-write model across all workers.
+    """
+    if active is None:
+        load_model()
+    return app
+
 if __name__ == '__main__':
+    # Development server only; use serve.py for production
     print("Starting Flask Server on port 5000...")
-    app.run(debug=True, port=5000)
+    app.run(debug=os.environ.get('FLASK_DEBUG') == '1', port=5000)
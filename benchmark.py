@@ -0,0 +1,397 @@
+"""
+Offline performance benchmark suite (no server, no network).
+
+Generates synthetic data with the sample_input.csv schema (1k, 100k and 1M
+rows by default) and measures every inference path:
+
+  pipeline        - model.predict / predict_proba at batch sizes 1..10000:
+                    latency percentiles per call and rows/s
+  pipeline_full   - predict_proba over the whole dataset of each size
+  api             - /predict (one record per request) and /predict/batch
+                    through the Flask test client
+  infer           - stunting_prediction_project/infer.py end-to-end on each size
+
+Each case runs in a fresh process so that its peak RSS is its own. Cases run
+once per engine ('sklearn' = joblib Pipeline, 'compiled' = compiled_model.npz).
+Results are written as JSON; with --baseline they are compared against an
+earlier results file and the exit code is 1 when a metric regressed by more
+than --tolerance. Cold start is measured separately by benchmark_startup.py.
+
+Usage:
+    python benchmark.py --json-out bench.json
+    python benchmark.py --sizes 1000 100000 --baseline bench.json --json-out bench_new.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.join(BASE_DIR, 'stunting_prediction_project')
+DEFAULT_MODEL_DIR = os.path.join(PROJECT_DIR, 'artifacts_sklearn171')
+DEFAULT_SIZES = (1000, 100000, 1000000)
+BATCH_SIZES = (1, 10, 100, 1000, 10000)
+API_BATCH_SIZE = 1000
+MARKER = '@@bench '
+
+# Metrics compared against the baseline and whether higher is better
+TRACKED_METRICS = {'rows_per_s': True, 'p50_ms': False, 'p95_ms': False, 'peak_rss_mb': False}
+
+
+def make_dataset(n, seed=0):
+    """Synthetic children with the sample_input.csv columns and plausible growth values."""
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    sex = rng.choice(['Laki-laki', 'Perempuan'], n)
+    age = rng.integers(0, 61, n)
+    exp_height = 50 + age * 0.9 - 0.006 * age ** 2 + (sex == 'Laki-laki')
+    height = np.round(exp_height + rng.normal(0, 5, n), 1)
+    exp_weight = 3.3 + age * 0.25 - 0.0015 * age ** 2
+    weight = np.round(np.clip(exp_weight + rng.normal(0, 1.5, n), 1.5, None), 1)
+    z_height = (height - exp_height) / 3.0
+    z_weight = weight - exp_weight
+    return pd.DataFrame({
+        'Jenis Kelamin': sex,
+        'Umur (bulan)': age,
+        'Tinggi Badan (cm)': height,
+        'Berat Badan (kg)': weight,
+        'Stunting': np.select([z_height < -3, z_height < -2, z_height > 2],
+                              ['Severely Stunted', 'Stunted', 'Tall'], 'Normal'),
+        'Wasting': np.select([z_weight < -2, z_weight > 1],
+                             ['Underweight', 'Risk of Overweight'], 'Normal weight'),
+    })
+
+
+def dataset_path(data_dir, n):
+    """CSV with `n` synthetic rows, generated on first use and reused afterwards."""
+    path = os.path.join(data_dir, f'synthetic_{n}.csv')
+    if not os.path.exists(path):
+        make_dataset(n).to_csv(path + '.tmp', index=False)
+        os.replace(path + '.tmp', path)
+    return path
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB (None where unavailable)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return round(peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024, 1)
+
+
+def latency_summary(seconds):
+    """Per-call latency percentiles in milliseconds."""
+    lat = np.asarray(seconds) * 1000.0
+    return {
+        'calls': int(lat.size),
+        'mean_ms': round(float(lat.mean()), 4),
+        'p50_ms': round(float(np.percentile(lat, 50)), 4),
+        'p90_ms': round(float(np.percentile(lat, 90)), 4),
+        'p95_ms': round(float(np.percentile(lat, 95)), 4),
+        'p99_ms': round(float(np.percentile(lat, 99)), 4),
+    }
+
+
+def timed_calls(fn, batches, min_seconds, max_calls):
+    """Call fn(batch) over `batches` (cycling) for at least `min_seconds` or `max_calls` calls."""
+    fn(batches[0])  # warm-up
+    times = []
+    start = time.perf_counter()
+    while len(times) < max_calls and (len(times) < 5 or time.perf_counter() - start < min_seconds):
+        batch = batches[len(times) % len(batches)]
+        t0 = time.perf_counter()
+        fn(batch)
+        times.append(time.perf_counter() - t0)
+    return times
+
+
+# --- Cases (each runs in its own process, see run_case) ---
+
+def load_engine_model(model_dir, engine):
+    sys.path.insert(0, PROJECT_DIR)
+    from infer import load_model
+
+    if engine == 'compiled':
+        path = os.path.join(model_dir, 'compiled_model.npz')
+    else:
+        from model_registry import find_model_file
+        path = find_model_file(model_dir, read_metadata(model_dir))
+    if not path or not os.path.exists(path):
+        raise FileNotFoundError(f'No {engine} model in {model_dir}')
+    return load_model(engine, path)
+
+
+def read_metadata(model_dir):
+    with open(os.path.join(model_dir, 'metadata.json')) as f:
+        return json.load(f)
+
+
+def model_features(model_dir, df):
+    """The feature columns of `df`, named as the model expects them (plus derived WHO z-scores)."""
+    import infer
+
+    meta = read_metadata(model_dir)
+    return infer.model_features(df, list(meta.get('numeric_cols', [])) + list(meta.get('categorical_cols', [])),
+                                meta.get('who_features'))
+
+
+def case_pipeline(spec):
+    """predict / predict_proba latency and throughput at each batch size."""
+    import pandas as pd
+
+    model = load_engine_model(spec['model_dir'], spec['engine'])
+    X = model_features(spec['model_dir'], pd.read_csv(dataset_path(spec['data_dir'], max(BATCH_SIZES))))
+    results = []
+    for method in ('predict', 'predict_proba'):
+        fn = getattr(model, method)
+        for batch_size in BATCH_SIZES:
+            batches = [X.iloc[i:i + batch_size] for i in range(0, len(X), batch_size)][:50]
+            times = timed_calls(fn, batches, spec['min_seconds'], spec['max_calls'])
+            results.append({
+                'method': method,
+                'batch_size': batch_size,
+                'rows_per_s': round(batch_size * len(times) / sum(times), 1),
+                **latency_summary(times),
+            })
+    return results
+
+
+def case_pipeline_full(spec):
+    """predict_proba over a whole dataset in one call."""
+    import pandas as pd
+
+    model = load_engine_model(spec['model_dir'], spec['engine'])
+    X = model_features(spec['model_dir'], pd.read_csv(dataset_path(spec['data_dir'], spec['size'])))
+    model.predict_proba(X.iloc[:10])  # warm-up
+    t0 = time.perf_counter()
+    model.predict_proba(X)
+    seconds = time.perf_counter() - t0
+    return [{'method': 'predict_proba', 'seconds': round(seconds, 4),
+             'rows_per_s': round(len(X) / seconds, 1)}]
+
+
+def case_api(spec):
+    """/predict and /predict/batch through the Flask test client (cache off)."""
+    import pandas as pd
+
+    os.environ.update(MODEL_DIR=spec['model_dir'], INFERENCE_ENGINE=spec['engine'],
+                      PREDICT_CACHE_SIZE='0', RISK_TABLE='off')
+    sys.path.insert(0, BASE_DIR)
+    import api_model
+
+    if api_model.active is None or api_model.active.engine != spec['engine']:
+        raise RuntimeError(f"API could not load the {spec['engine']} model from {spec['model_dir']}")
+    df = pd.read_csv(dataset_path(spec['data_dir'], max(BATCH_SIZES)))
+    payloads = [
+        {'usia_bulan': int(u), 'tinggi_badan': float(t), 'berat_badan': float(b),
+         'gender': 'L' if g == 'Laki-laki' else 'P'}
+        for u, t, b, g in zip(df['Umur (bulan)'], df['Tinggi Badan (cm)'],
+                              df['Berat Badan (kg)'], df['Jenis Kelamin'])
+    ]
+    client = api_model.app.test_client()
+
+    def post(path, body):
+        response = client.post(path, json=body)
+        if response.status_code != 200:
+            raise RuntimeError(f'{path} returned {response.status_code}: {response.get_data(as_text=True)}')
+
+    single = timed_calls(lambda p: post('/predict', p), payloads, spec['min_seconds'], spec['max_calls'])
+    batches = [payloads[i:i + API_BATCH_SIZE] for i in range(0, len(payloads), API_BATCH_SIZE)]
+    batch = timed_calls(lambda b: post('/predict/batch', b), batches, spec['min_seconds'], spec['max_calls'])
+    return [
+        {'method': '/predict', 'batch_size': 1,
+         'rows_per_s': round(len(single) / sum(single), 1), **latency_summary(single)},
+        {'method': '/predict/batch', 'batch_size': API_BATCH_SIZE,
+         'rows_per_s': round(API_BATCH_SIZE * len(batch) / sum(batch), 1), **latency_summary(batch)},
+    ]
+
+
+def case_infer(spec):
+    """infer.py end-to-end (read, score, write) on a whole dataset."""
+    sys.path.insert(0, PROJECT_DIR)
+    import infer
+
+    model_dir = spec['model_dir']
+    from model_registry import find_model_file
+    with tempfile.TemporaryDirectory() as tmp:
+        sys.argv = ['infer.py', '--input', dataset_path(spec['data_dir'], spec['size']),
+                    '--output', os.path.join(tmp, 'predictions.csv'),
+                    '--model', find_model_file(model_dir, read_metadata(model_dir)) or '',
+                    '--compiled_model', os.path.join(model_dir, 'compiled_model.npz'),
+                    '--metadata', os.path.join(model_dir, 'metadata.json'), '--engine', spec['engine']]
+        t0 = time.perf_counter()
+        infer.main()
+        seconds = time.perf_counter() - t0
+    return [{'method': 'infer.py', 'seconds': round(seconds, 4),
+             'rows_per_s': round(spec['size'] / seconds, 1)}]
+
+
+CASES = {
+    'pipeline': case_pipeline,
+    'pipeline_full': case_pipeline_full,
+    'api': case_api,
+    'infer': case_infer,
+}
+
+
+def run_case(spec):
+    """Child process entry point: run one case and print its results after MARKER."""
+    results = CASES[spec['case']](spec)
+    rss = peak_rss_mb()
+    for row in results:
+        row['peak_rss_mb'] = rss
+    print(MARKER + json.dumps(results), flush=True)
+
+
+def spawn_case(spec):
+    """Run one case in a fresh interpreter; returns its result rows."""
+    proc = subprocess.run([sys.executable, os.path.abspath(__file__), '--case', json.dumps(spec)],
+                          cwd=BASE_DIR, capture_output=True, text=True)
+    lines = [line for line in proc.stdout.splitlines() if line.startswith(MARKER)]
+    if proc.returncode != 0 or not lines:
+        output = proc.stderr.strip().splitlines() or proc.stdout.strip().splitlines()
+        raise RuntimeError(output[-1] if output else f'exit code {proc.returncode}')
+    return json.loads(lines[-1][len(MARKER):])
+
+
+def result_key(row):
+    return (row['case'], row['engine'], row.get('size'), row.get('method'), row.get('batch_size'))
+
+
+def format_key(key):
+    case, engine, size, method, batch_size = key
+    parts = [case, engine, method]
+    if size is not None:
+        parts.append(f'{size} rows')
+    if batch_size is not None:
+        parts.append(f'batch {batch_size}')
+    return ' '.join(str(p) for p in parts if p is not None)
+
+
+def compare(results, baseline, tolerance):
+    """Metric changes versus `baseline`; regressions are changes worse than `tolerance`."""
+    previous = {result_key(row): row for row in baseline.get('results', []) if 'error' not in row}
+    changes = []
+    for row in results:
+        old = previous.get(result_key(row))
+        if old is None or 'error' in row:
+            continue
+        for metric, higher_is_better in TRACKED_METRICS.items():
+            if not old.get(metric) or row.get(metric) is None:
+                continue
+            ratio = row[metric] / old[metric]
+            worse = ratio < 1 - tolerance if higher_is_better else ratio > 1 + tolerance
+            changes.append({
+                'key': format_key(result_key(row)),
+                'metric': metric,
+                'baseline': old[metric],
+                'current': row[metric],
+                'change_pct': round((ratio - 1) * 100, 1),
+                'regression': worse,
+            })
+    return changes
+
+
+def print_row(row):
+    label = format_key(result_key(row))
+    if 'error' in row:
+        print(f'{label:55s} failed: {row["error"]}')
+        return
+    latency = f" p50 {row['p50_ms']:.3f} ms p95 {row['p95_ms']:.3f} ms" if 'p50_ms' in row else ''
+    print(f"{label:55s} {row['rows_per_s']:>12,.0f} rows/s{latency}  peak RSS {row['peak_rss_mb']} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline benchmark of every inference path')
+    parser.add_argument('--model-dir', default=DEFAULT_MODEL_DIR,
+                        help='Artifact directory (best_model_*.joblib, metadata.json, compiled_model.npz)')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES),
+                        help='Synthetic dataset sizes for pipeline_full and infer')
+    parser.add_argument('--engines', nargs='+', choices=['sklearn', 'compiled'], default=['sklearn', 'compiled'])
+    parser.add_argument('--cases', nargs='+', choices=list(CASES), default=list(CASES))
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'stunting_benchmark'),
+                        help='Where synthetic datasets are generated and cached')
+    parser.add_argument('--min-seconds', type=float, default=1.0,
+                        help='Minimum time spent per latency measurement')
+    parser.add_argument('--max-calls', type=int, default=200,
+                        help='Maximum calls per latency measurement')
+    parser.add_argument('--json-out', default=None, help='Write the results as JSON to this file')
+    parser.add_argument('--baseline', default=None, help='Earlier --json-out file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.15,
+                        help='Relative change counted as a regression (default 0.15 = 15%%)')
+    parser.add_argument('--case', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        run_case(json.loads(args.case))
+        return
+
+    args.model_dir = os.path.abspath(args.model_dir)
+    os.makedirs(args.data_dir, exist_ok=True)
+    print(f'Preparing synthetic datasets in {args.data_dir}...')
+    for n in sorted(set(args.sizes) | {max(BATCH_SIZES)}):
+        dataset_path(args.data_dir, n)
+
+    common = {'model_dir': args.model_dir, 'data_dir': args.data_dir,
+              'min_seconds': args.min_seconds, 'max_calls': args.max_calls}
+    specs = []
+    for case in args.cases:
+        for engine in args.engines:
+            if case in ('pipeline_full', 'infer'):
+                specs += [{'case': case, 'engine': engine, 'size': n, **common} for n in args.sizes]
+            else:
+                specs.append({'case': case, 'engine': engine, **common})
+
+    results = []
+    for spec in specs:
+        key = {'case': spec['case'], 'engine': spec['engine'], 'size': spec.get('size')}
+        try:
+            rows = [{**key, **row} for row in spawn_case(spec)]
+        except RuntimeError as e:
+            rows = [{**key, 'error': str(e)}]
+        for row in rows:
+            print_row(row)
+        results += rows
+
+    summary = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'model_dir': args.model_dir,
+        'sizes': args.sizes,
+        'results': results,
+    }
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            summary['comparison'] = compare(results, json.load(f), args.tolerance)
+        regressions = [c for c in summary['comparison'] if c['regression']]
+        print(f'\nCompared with {args.baseline} (tolerance {args.tolerance:.0%}): '
+              f'{len(summary["comparison"])} metrics, {len(regressions)} regressions')
+        for c in regressions:
+            print(f"  REGRESSION {c['key']} {c['metric']}: {c['baseline']} -> {c['current']} "
+                  f"({c['change_pct']:+.1f}%)")
+    if args.json_out:
+        with open(args.json_out, 'w') as f:
+            json.dump(summary, f, indent=2)
+        print(f'Results written to {args.json_out}')
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
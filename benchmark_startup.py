@@ -0,0 +1,155 @@
+"""
+Startup benchmark: time-to-first-prediction of a fresh process.
+
+Each scenario runs in a new Python process (interpreter start, imports, model
+load and the first prediction all count) and is repeated to report the
+median and minimum wall time. Scenarios:
+
+  api  - import api_model and answer one /predict through the Flask test client
+  infer - stunting_prediction_project/infer.py on sample_input.csv
+  cli  - stunting_prediction_project/stunting_updated.py with piped input
+
+api and infer run once per engine ('sklearn' = joblib Pipeline, 'compiled' =
+compiled_model.npz bundle); the cli picks the bundle by itself when present.
+The process also reports whether sklearn/pandas were imported.
+
+Usage:
+    python benchmark_startup.py --repeats 5 --json-out startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.join(BASE_DIR, 'stunting_prediction_project')
+DEFAULT_MODEL_DIR = os.path.join(PROJECT_DIR, 'artifacts_sklearn171')
+MARKER = '@@startup '
+
+# Appended to every scenario: report the in-process timings and heavy imports
+REPORT = f'''
+import json, sys
+print({MARKER!r} + json.dumps({{
+    'load_seconds': t_loaded - t0, 'first_prediction_seconds': t_first - t0,
+    'sklearn': 'sklearn' in sys.modules, 'pandas': 'pandas' in sys.modules,
+}}), flush=True)
+'''
+
+API_SCENARIO = '''
+import time
+t0 = time.perf_counter()
+import api_model
+t_loaded = time.perf_counter()
+response = api_model.app.test_client().post('/predict', json=api_model.WARMUP_RECORD)
+assert response.status_code == 200 and 'AI Model' in response.get_json()['message'], response.get_json()
+t_first = time.perf_counter()
+'''
+
+RUNPY_SCENARIO = '''
+import runpy, sys, time
+t0 = time.perf_counter()
+sys.argv = {argv!r}
+sys.path.insert(0, {project!r})
+runpy.run_path(sys.argv[0], run_name='__main__')
+t_loaded = t_first = time.perf_counter()
+'''
+
+CLI_INPUT = '24\n11.5\n85\nL\n'
+# stunting_updated.py reports errors without failing; only count runs that predicted
+CLI_EXPECT = 'Probabilitas Stunting'
+
+
+def run_once(code, cwd, env, stdin=None, expect=None):
+    """Run `code` in a fresh interpreter; returns (wall seconds, in-process report)."""
+    t0 = time.perf_counter()
+    proc = subprocess.run([sys.executable, '-c', code + REPORT], cwd=cwd, env=env, input=stdin,
+                          capture_output=True, text=True)
+    wall = time.perf_counter() - t0
+    lines = proc.stdout.splitlines()
+    reports = [line[len(MARKER):] for line in lines if line.startswith(MARKER)]
+    if proc.returncode != 0 or not reports or (expect and expect not in proc.stdout):
+        output = proc.stderr.strip().splitlines() or [l for l in lines if l.strip() and not l.startswith(MARKER)]
+        raise RuntimeError(output[-1].strip() if output else f'exit code {proc.returncode}')
+    return wall, json.loads(reports[-1])
+
+
+def scenarios(args, output):
+    """(name, engine, code, cwd, env overrides, stdin, expected output) of every scenario."""
+    model_path = os.path.join(args.model_dir, 'best_model_RandomForest.joblib')
+    bundle_path = os.path.join(args.model_dir, 'compiled_model.npz')
+    for engine in args.engines:
+        yield 'api', engine, API_SCENARIO, BASE_DIR, {
+            'MODEL_DIR': args.model_dir, 'INFERENCE_ENGINE': engine, 'RISK_TABLE': 'off'}, None, None
+    for engine in args.engines:
+        argv = [os.path.join(PROJECT_DIR, 'infer.py'), '--input', args.input, '--output', output,
+                '--model', model_path, '--compiled_model', bundle_path,
+                '--metadata', os.path.join(args.model_dir, 'metadata.json'), '--engine', engine]
+        yield 'infer', engine, RUNPY_SCENARIO.format(argv=argv, project=PROJECT_DIR), PROJECT_DIR, {}, None, None
+    # stunting_updated.py reads ./artifacts_sklearn171 relative to its working directory
+    if os.path.basename(os.path.normpath(args.model_dir)) == 'artifacts_sklearn171':
+        argv = [os.path.join(PROJECT_DIR, 'stunting_updated.py')]
+        engine = 'compiled' if os.path.exists(bundle_path) else 'sklearn'
+        yield ('cli', engine, RUNPY_SCENARIO.format(argv=argv, project=PROJECT_DIR),
+               os.path.dirname(os.path.normpath(args.model_dir)), {}, CLI_INPUT, CLI_EXPECT)
+
+
+def benchmark(args):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        output = os.path.join(tmp, 'predictions.csv')
+        for name, engine, code, cwd, env_extra, stdin, expect in scenarios(args, output):
+            env = dict(os.environ, **env_extra)
+            row = {'scenario': name, 'engine': engine}
+            try:
+                run_once(code, cwd, env, stdin, expect)  # Warm the page cache; not counted
+                runs = [run_once(code, cwd, env, stdin, expect) for _ in range(args.repeats)]
+            except RuntimeError as e:
+                row['error'] = str(e)
+                print(f"{name:6s} {engine:9s} failed: {e}")
+                results.append(row)
+                continue
+            walls = [wall for wall, _ in runs]
+            report = runs[-1][1]
+            row.update(
+                runs=args.repeats,
+                wall_seconds_median=round(statistics.median(walls), 4),
+                wall_seconds_min=round(min(walls), 4),
+                load_seconds_median=round(statistics.median(r['load_seconds'] for _, r in runs), 4),
+                first_prediction_seconds_median=round(
+                    statistics.median(r['first_prediction_seconds'] for _, r in runs), 4),
+                imports_sklearn=report['sklearn'],
+                imports_pandas=report['pandas'],
+            )
+            print(f"{name:6s} {engine:9s} first prediction after {row['wall_seconds_median']:.3f}s "
+                  f"(min {row['wall_seconds_min']:.3f}s; sklearn={'yes' if row['imports_sklearn'] else 'no'}, "
+                  f"pandas={'yes' if row['imports_pandas'] else 'no'})")
+            results.append(row)
+    return {'model_dir': args.model_dir, 'python': sys.version.split()[0], 'results': results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure time-to-first-prediction of fresh processes")
+    parser.add_argument('--model-dir', default=DEFAULT_MODEL_DIR,
+                        help='Artifact directory (best_model_*.joblib, metadata.json, compiled_model.npz)')
+    parser.add_argument('--input', default=os.path.join(PROJECT_DIR, 'sample_input.csv'),
+                        help='Input file for the infer.py scenario')
+    parser.add_argument('--engines', nargs='+', choices=['sklearn', 'compiled'], default=['sklearn', 'compiled'])
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--json-out', default=None, help='Write the results as JSON to this file')
+    args = parser.parse_args()
+    args.model_dir = os.path.abspath(args.model_dir)
+    args.input = os.path.abspath(args.input)
+
+    summary = benchmark(args)
+    if args.json_out:
+        with open(args.json_out, 'w') as f:
+            json.dump(summary, f, indent=2)
+        print(f"Results written to {args.json_out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Input-drift routes of api_model.py: /drift and the stunting_drift_* metrics.
+
+Every record scored by /predict and /predict/batch is counted in the
+DriftMonitor of the model version that served it (see
+stunting_prediction_project/drift.py); /drift compares recent windows with
+the version's training reference. api_model registers the route and gauges
+with register().
+"""
+from flask import Blueprint, jsonify
+
+from record_scorer import to_model_row
+
+bp = Blueprint('drift', __name__)
+# api_model, whose active version, settings and metrics the routes use (set by register)
+api = None
+
+
+def register(app, api_module):
+    """Serve /drift on `app` for the model of `api_module` and add the drift gauges to its metrics."""
+    global api
+    api = api_module
+    app.register_blueprint(bp)
+    api.metrics_registry.gauge(
+        'stunting_drift_psi', 'Population stability index of recent inputs vs training, per feature.',
+        ('feature',), callback=lambda: drift_series(0))
+    api.metrics_registry.gauge(
+        'stunting_drift_unseen_rate', 'Share of recent categorical inputs never seen in training.',
+        ('feature',), callback=lambda: drift_series(1))
+
+
+def observe_drift(current, parsed, endpoint):
+    """
+    Count the model rows of parsed records in the drift monitor of `current`,
+    as the model sees them (including the Wasting placeholder and, for
+    --who_features versions, the WHO z-scores). Best-effort like
+    record_visits: a failure is counted, never raised.
+    """
+    monitor = current.drift
+    if monitor is None or not parsed:
+        return
+    try:
+        if len(parsed) == 1 and not current.who_features:
+            monitor.observe_row(to_model_row(*parsed[0][:4], current.columns))
+        else:
+            # Columns of all records at once; the placeholder stays a scalar
+            usia, tinggi, berat, gender_val = list(zip(*parsed))[:4]
+            columns = to_model_row(usia, tinggi, berat, gender_val, current.columns)
+            if current.who_features:
+                from stunting_prediction_project.who_growth import add_features
+                add_features(columns, current.who_features['features'], current.who_features['columns'])
+            monitor.observe(columns, len(parsed))
+    except Exception as e:
+        api.errors_total.inc(endpoint, 'drift')
+        print(f"Drift monitor update failed: {e}")
+
+
+@bp.route('/drift', methods=['GET'])
+def drift_report():
+    """
+    Drift of the inputs of recent /predict and /predict/batch records against
+    the active version's training data: PSI per feature, missing, out-of-range
+    and unseen-category rates, and alerts. Counts are per process.
+    """
+    current = api.active
+    if current is None or current.drift is None:
+        reason = 'No model loaded' if current is None else (
+            'Drift monitoring is off (DRIFT_MONITOR=0)' if not api.DRIFT_MONITOR_ENABLED
+            else 'The active model has no drift reference (retrain with train.py)')
+        return jsonify({'error': reason}), 404
+    return jsonify({'version': current.version, **current.drift.report()})
+
+
+def drift_series(index):
+    """{(feature,): value} of recent drift (index 0: PSI, 1: unseen-category rate)."""
+    current = api.active
+    if current is None or current.drift is None:
+        return {}
+    return {(feature,): values[index] for feature, values in current.drift.gauges().items()
+            if values[index] is not None}
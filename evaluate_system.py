@@ -1,105 +1,346 @@
-import pandas as pd
-import requests
+import argparse
+import asyncio
 import json
-from sklearn.model_selection import train_test_split
 import time
-import concurrent.futures
-import threading
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import train_test_split
 
 # Configuration
 DATASET_PATH = 'stunting_prediction_project/stunting_wasting_dataset.csv'
 API_URL = 'http://127.0.0.1:5000/predict'
 # SAMPLE_SIZE = 100  # Removed for full evaluation
+DEFAULT_CONCURRENCY = 10
+REQUEST_TIMEOUT = 5
+
+NORMAL_LABELS = ['Normal', 'Tall', 'Normal weight']
+STUNTING_LABELS = ['Stunted', 'Severely Stunted', 'Pendek', 'Sangat Pendek']
+
+
+def load_test_split(dataset_path=DATASET_PATH):
+    """Load the dataset and return the same 80-20 test split used since the first evaluation."""
+    print(f"Loading dataset from {dataset_path}...")
+    df = pd.read_csv(dataset_path)
+    print("Splitting data 80-20...")
+    _, test_df = train_test_split(df, test_size=0.2, random_state=42)
+    return test_df
 
-# Thread-safe counters
-stats = {
-    "correct": 0,
-    "total": 0,
-    "errors": 0,
-    "processed": 0
-}
-stats_lock = threading.Lock()
-
-def process_row(row):
-    # Prepare payload
-    payload = {
-        "usia_bulan": int(row['Umur (bulan)']),
-        "tinggi_badan": float(row['Tinggi Badan (cm)']),
-        "berat_badan": float(row['Berat Badan (kg)']),
-        "gender": row['Jenis Kelamin']
+
+def build_payloads(test_df):
+    """Request payloads for every row, built column-wise (no iterrows)."""
+    usia = test_df['Umur (bulan)'].astype(int).tolist()
+    tinggi = test_df['Tinggi Badan (cm)'].astype(float).tolist()
+    berat = test_df['Berat Badan (kg)'].astype(float).tolist()
+    gender = test_df['Jenis Kelamin'].tolist()
+    return [
+        {"usia_bulan": u, "tinggi_badan": t, "berat_badan": b, "gender": g}
+        for u, t, b, g in zip(usia, tinggi, berat, gender)
+    ]
+
+
+def expected_binary_labels(test_df):
+    """Map the dataset's Stunting column to the API's binary status ('Normal'/'Stunting')."""
+    expected_status = test_df['Stunting']
+    return np.select(
+        [expected_status.isin(NORMAL_LABELS), expected_status.isin(STUNTING_LABELS)],
+        ["Normal", "Stunting"],
+        default="Unknown",
+    )
+
+
+def percentile_summary(latencies):
+    """Latency statistics in milliseconds."""
+    if not latencies:
+        return {}
+    lat = np.asarray(latencies) * 1000.0
+    return {
+        "count": int(lat.size),
+        "mean_ms": float(lat.mean()),
+        "p50_ms": float(np.percentile(lat, 50)),
+        "p90_ms": float(np.percentile(lat, 90)),
+        "p99_ms": float(np.percentile(lat, 99)),
+        "max_ms": float(lat.max()),
     }
 
-    expected_status = row['Stunting']
-    
-    expected_binary = "Unknown"
-    if expected_status in ['Normal', 'Tall', 'Normal weight']:
-        expected_binary = "Normal"
-    elif expected_status in ['Stunted', 'Severely Stunted', 'Pendek', 'Sangat Pendek']:
-        expected_binary = "Stunting"
-        
-    is_match = False
-    is_error = False
-    
+
+class LoadRecorder:
+    """Collects latencies, status codes and error kinds for one run."""
+
+    def __init__(self):
+        self.latencies = []
+        self.errors = Counter()
+        self.ok = 0
+
+    def record(self, latency, error=None):
+        if error is None:
+            self.ok += 1
+            self.latencies.append(latency)
+        else:
+            self.errors[error] += 1
+
+    def summary(self, elapsed):
+        total = self.ok + sum(self.errors.values())
+        return {
+            "requests": total,
+            "ok": self.ok,
+            "errors": sum(self.errors.values()),
+            "error_breakdown": dict(self.errors),
+            "elapsed_s": elapsed,
+            "throughput_rps": total / elapsed if elapsed > 0 else 0.0,
+            "latency": percentile_summary(self.latencies),
+        }
+
+
+async def send(session, url, body, recorder, started=None, on_response=None):
+    """POST one pre-serialised body; latency counts from `started` (scheduled time) if given."""
+    import aiohttp
+
+    t0 = started if started is not None else time.perf_counter()
     try:
-        response = requests.post(API_URL, json=payload, timeout=5)
-        if response.status_code == 200:
-            result = response.json()
-            predicted_status = result['status']
-            is_match = (predicted_status == expected_binary)
+        async with session.post(url, data=body, headers={'Content-Type': 'application/json'}) as resp:
+            payload = await resp.read()
+            latency = time.perf_counter() - t0
+            if resp.status != 200:
+                recorder.record(latency, f"HTTP {resp.status}")
+                return
+            recorder.record(latency)
+            if on_response is not None:
+                on_response(payload)
+    except asyncio.TimeoutError:
+        recorder.record(None, "Timeout")
+    except aiohttp.ClientError as e:
+        recorder.record(None, type(e).__name__)
+
+
+async def closed_loop(session, url, bodies, n_requests, concurrency, recorder, on_response=None):
+    """`concurrency` workers each send their next request as soon as the previous one returns."""
+    counter = iter(range(n_requests))
+
+    async def worker():
+        for i in counter:
+            cb = (lambda payload, i=i: on_response(i, payload)) if on_response else None
+            await send(session, url, bodies[i % len(bodies)], recorder, on_response=cb)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+async def open_loop(session, url, bodies, n_requests, rps, max_inflight, recorder):
+    """Send at a fixed arrival rate regardless of completions (latency includes queueing)."""
+    inflight = asyncio.Semaphore(max_inflight)
+    start = time.perf_counter()
+    tasks = []
+
+    async def fire(i, scheduled):
+        async with inflight:
+            await send(session, url, bodies[i % len(bodies)], recorder, started=scheduled)
+
+    for i in range(n_requests):
+        scheduled = start + i / rps
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(fire(i, scheduled)))
+    await asyncio.gather(*tasks)
+
+
+async def run_load(url, bodies, n_requests, concurrency, rps=None, warmup=0,
+                   max_inflight=1000, on_response=None):
+    import aiohttp
+
+    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+    # Pooled keep-alive connections, one per concurrent worker
+    limit = concurrency if rps is None else max_inflight
+    connector = aiohttp.TCPConnector(limit=limit, limit_per_host=limit)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        if warmup:
+            await closed_loop(session, url, bodies, warmup, concurrency, LoadRecorder())
+
+        recorder = LoadRecorder()
+        start = time.perf_counter()
+        if rps is None:
+            await closed_loop(session, url, bodies, n_requests, concurrency, recorder, on_response)
         else:
-            is_error = True
-    except Exception:
-        is_error = True
-        
-    with stats_lock:
-        stats["total"] += 1
-        stats["processed"] += 1
-        if is_error:
-            stats["errors"] += 1
-        elif is_match:
-            stats["correct"] += 1
-            
-        if stats["processed"] % 1000 == 0:
-            print(f"Processed: {stats['processed']}...")
-
-def evaluate():
-    print(f"Loading dataset from {DATASET_PATH}...")
+            await open_loop(session, url, bodies, n_requests, rps, max_inflight, recorder)
+        return recorder.summary(time.perf_counter() - start)
+
+
+def print_summary(summary):
+    lat = summary["latency"]
+    print(f"Requests: {summary['requests']} (ok: {summary['ok']}, errors: {summary['errors']})")
+    print(f"Time Taken: {summary['elapsed_s']:.2f} seconds")
+    print(f"Throughput: {summary['throughput_rps']:.1f} req/s")
+    if lat:
+        print(f"Latency (ms): p50 {lat['p50_ms']:.2f} | p90 {lat['p90_ms']:.2f} | "
+              f"p99 {lat['p99_ms']:.2f} | max {lat['max_ms']:.2f}")
+    for kind, count in summary["error_breakdown"].items():
+        print(f"  {kind}: {count}")
+
+
+def evaluate(args):
     try:
-        df = pd.read_csv(DATASET_PATH)
+        test_df = load_test_split(args.dataset)
     except FileNotFoundError:
         print("Error: Dataset file not found.")
         return
 
-    # Split 80-20
-    print("Splitting data 80-20...")
-    _, test_df = train_test_split(df, test_size=0.2, random_state=42)
-    
     print(f"Total test set size: {len(test_df)}")
-    print("Starting full evaluation with parallel requests (Max Workers: 10)...")
+    print(f"Starting full evaluation with {args.concurrency} concurrent connections...")
     print("-" * 60)
 
-    start_time = time.time()
-    
-    # Convert DataFrame rows to a list of dicts for iteration
-    rows = [row for _, row in test_df.iterrows()]
+    bodies = [json.dumps(p).encode() for p in build_payloads(test_df)]
+    expected = expected_binary_labels(test_df)
+    correct = 0
 
-    with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-        executor.map(process_row, rows)
+    def check(i, payload):
+        nonlocal correct
+        if json.loads(payload)['status'] == expected[i]:
+            correct += 1
+
+    summary = asyncio.run(run_load(args.url, bodies, len(bodies), args.concurrency,
+                                   on_response=check))
 
-    end_time = time.time()
-    duration = end_time - start_time
-    
     print("-" * 60)
-    if stats["total"] > 0:
-        accuracy = (stats["correct"] / stats["total"]) * 100
+    if summary["requests"] > 0:
+        accuracy = (correct / summary["requests"]) * 100
         print(f"\nFull Evaluation Complete.")
-        print(f"Time Taken: {duration:.2f} seconds")
-        print(f"Total Tested: {stats['total']}")
-        print(f"Correct: {stats['correct']}")
-        print(f"Errors (API/Net): {stats['errors']}")
+        print(f"Total Tested: {summary['requests']}")
+        print(f"Correct: {correct}")
+        print(f"Errors (API/Net): {summary['errors']}")
         print(f"Accuracy: {accuracy:.2f}%")
+        print_summary(summary)
+        summary["accuracy"] = accuracy
+        write_json(args.json_out, summary)
     else:
         print("No tests completed.")
 
+
+def predict_in_process(payloads):
+    """
+    Score payloads directly with the API's model, using the same request parsing
+    (parse_record/to_model_row) and status mapping as the /predict handler.
+    """
+    import api_model
+
+    if api_model.model is None:
+        raise RuntimeError(f"Model not available at {api_model.MODEL_PATH}")
+    parsed = [api_model.parse_record(p) for p in payloads]
+    classes, _ = api_model.predict_parsed(parsed)
+    return np.array([api_model.model_status(c) for c in classes])
+
+
+def evaluate_in_process(args):
+    """Offline accuracy on the test split without a running server (one vectorised model call)."""
+    from sklearn.metrics import classification_report, confusion_matrix
+
+    try:
+        test_df = load_test_split(args.dataset)
+    except FileNotFoundError:
+        print("Error: Dataset file not found.")
+        return
+
+    print(f"Total test set size: {len(test_df)}")
+    print("Starting in-process evaluation (no HTTP)...")
+    print("-" * 60)
+
+    start_time = time.time()
+    expected = expected_binary_labels(test_df)
+    predicted = predict_in_process(build_payloads(test_df))
+    duration = time.time() - start_time
+
+    labels = ["Normal", "Stunting"] + (["Unknown"] if (expected == "Unknown").any() else [])
+    correct = int((predicted == expected).sum())
+    accuracy = correct / len(expected) * 100 if len(expected) else 0.0
+    cm = confusion_matrix(expected, predicted, labels=labels)
+    report = classification_report(expected, predicted, labels=labels,
+                                   output_dict=True, zero_division=0)
+
+    print(f"\nIn-Process Evaluation Complete.")
+    print(f"Time Taken: {duration:.2f} seconds")
+    print(f"Total Tested: {len(expected)}")
+    print(f"Correct: {correct}")
+    print(f"Accuracy: {accuracy:.2f}%")
+    print("\nConfusion Matrix (rows = expected, columns = predicted):")
+    print(pd.DataFrame(cm, index=labels, columns=labels).to_string())
+    print()
+    print(classification_report(expected, predicted, labels=labels, zero_division=0))
+
+    write_json(args.json_out, {
+        "mode": "in-process",
+        "total": len(expected),
+        "correct": correct,
+        "accuracy": accuracy,
+        "elapsed_s": duration,
+        "labels": labels,
+        "confusion_matrix": cm.tolist(),
+        "classification_report": report,
+    })
+
+
+def benchmark(args):
+    """Latency/throughput benchmark of the running service (responses are not checked)."""
+    try:
+        test_df = load_test_split(args.dataset)
+    except FileNotFoundError:
+        print("Error: Dataset file not found.")
+        return
+
+    bodies = [json.dumps(p).encode() for p in build_payloads(test_df)]
+    n_requests = args.requests or len(bodies)
+    loop_kind = f"open loop @ {args.rps} req/s" if args.rps else f"closed loop x{args.concurrency}"
+    print(f"Benchmarking {args.url}: {n_requests} requests, {loop_kind}, warm-up {args.warmup}")
+    print("-" * 60)
+
+    summary = asyncio.run(run_load(args.url, bodies, n_requests, args.concurrency,
+                                   rps=args.rps, warmup=args.warmup,
+                                   max_inflight=args.max_inflight))
+    summary["config"] = {
+        "url": args.url,
+        "mode": "open" if args.rps else "closed",
+        "concurrency": args.concurrency,
+        "rps": args.rps,
+        "warmup": args.warmup,
+        "requests": n_requests,
+    }
+    print_summary(summary)
+    write_json(args.json_out, summary)
+
+
+def write_json(path, summary):
+    if path:
+        with open(path, "w") as f:
+            json.dump(summary, f, indent=2)
+        print(f"Results written to {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mode", choices=["accuracy", "benchmark"], default="accuracy")
+    parser.add_argument("--in-process", action="store_true",
+                        help="Accuracy mode without HTTP: load the API's model and score the test split directly")
+    parser.add_argument("--dataset", default=DATASET_PATH)
+    parser.add_argument("--url", default=API_URL)
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help="Concurrent connections (closed loop)")
+    parser.add_argument("--rps", type=float, default=None,
+                        help="Target request rate; switches the benchmark to open loop")
+    parser.add_argument("--max-inflight", type=int, default=1000,
+                        help="Cap on outstanding requests in open-loop mode")
+    parser.add_argument("--requests", type=int, default=None,
+                        help="Number of measured requests (default: size of the test set)")
+    parser.add_argument("--warmup", type=int, default=0,
+                        help="Requests sent before measuring (not recorded)")
+    parser.add_argument("--json-out", default=None, help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    if args.mode == "benchmark":
+        benchmark(args)
+    elif args.in_process:
+        evaluate_in_process(args)
+    else:
+        evaluate(args)
+
+
 if __name__ == "__main__":
-    evaluate()
+    main()
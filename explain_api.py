@@ -0,0 +1,201 @@
+"""
+Explanation routes of api_model.py: /explain and /explain/batch.
+
+Per-column contributions to the predicted class, from one walk over the
+decision paths of a RandomForest (CompiledForest.contributions). The routes
+use the active model version and the request helpers of api_model, which
+registers them with register().
+"""
+import numpy as np
+from flask import Blueprint, jsonify, request
+
+from metrics import NULL_STOPWATCH
+from record_scorer import model_input, to_model_row
+
+# Keys of the /explain contributions for the model columns of each role (others keep their name)
+EXPLAIN_FIELDS = {
+    'age': 'usia_bulan',
+    'height': 'tinggi_badan',
+    'weight': 'berat_badan',
+    'sex': 'gender',
+    'wasting': 'wasting',
+}
+
+bp = Blueprint('explain', __name__)
+# api_model, whose active version, metrics and request helpers the routes use (set by register)
+api = None
+
+
+def register(app, api_module):
+    """Serve the /explain routes on `app` with the model and helpers of `api_module`."""
+    global api
+    api = api_module
+    app.register_blueprint(bp)
+
+
+def build_explainer(current):
+    """CompiledForest of `current` for path contributions, or None when its model is not a RandomForest."""
+    if not hasattr(current.model, 'predict_proba'):
+        return None
+    try:
+        from stunting_prediction_project.compiled_model import forest_explainer
+        return forest_explainer(current.model)
+    except Exception as e:
+        print(f"Explanations not available for {current.version} ({e}).")
+        return None
+
+
+def explain_parsed(parsed, current, watch=NULL_STOPWATCH):
+    """
+    Classes, confidences and explanations of `current` for parsed records.
+    One walk over all trees gives each record's decision-path contributions
+    per model column (see CompiledForest.contributions); the probabilities are
+    their sum plus the baseline, so no separate predict_proba pass is made.
+    Each explanation covers the predicted class: its baseline probability and
+    how far the splits on every column moved it.
+    """
+    if not parsed:
+        return [], [], []
+    explainer = current.explainer
+    records = [record[:4] for record in parsed]
+    scorer = current.scorer
+    if scorer is not None:
+        X = scorer.encode(records)
+    else:
+        X = explainer.encode(model_input(current, [to_model_row(*record, current.columns) for record in records]))
+    watch.lap('encode')
+    Xt = explainer.transform(X)
+    watch.lap('preprocess')
+    contributions = explainer.contributions(Xt)
+    watch.lap('contributions')
+    # Rounded so exact ties pick the first class, as predict_proba's argmax does
+    probs = np.round(explainer.baseline + contributions.sum(axis=1), 12)
+    best = probs.argmax(axis=1)
+    rows = np.arange(len(best))
+    names = {name: EXPLAIN_FIELDS[role] for role, name in current.columns.items()}
+    keys = [names.get(col, col) for col in explainer.feature_cols]
+    baselines = np.round(explainer.baseline[best], 4).tolist()
+    picked = np.round(contributions[rows, :, best], 4).tolist()
+    classes = explainer.classes_[best]
+    explanations = [{
+        'class': api.model_status(c),
+        'baseline': b,
+        'contributions': dict(zip(keys, values)),
+    } for c, b, values in zip(classes, baselines, picked)]
+    return classes, api.confidence_texts(probs[rows, best]), explanations
+
+
+def explainer_unavailable(current):
+    """Error response when `current` cannot explain predictions, else None."""
+    if current is None:
+        return jsonify({'error': 'Model not loaded; explanations need the model'}), 503
+    if current.explainer is None:
+        return jsonify({'error': 'Explanations are only available for RandomForest models'}), 501
+    return None
+
+
+@bp.route('/explain', methods=['POST'])
+def explain():
+    """
+    /predict plus why: per-column contributions to the predicted class.
+    Always scored by the model (the risk table, cache and batcher are skipped),
+    so status and confidence match the contributions exactly.
+    """
+    watch = api.stopwatch('explain')
+    try:
+        data = request.get_json()
+        watch.lap('json_parse')
+        missing = api.find_missing_field(data)
+        if missing:
+            api.errors_total.inc('explain', 'bad_request')
+            return jsonify({'error': f'Missing field: {missing}'}), 400
+        parsed = api.parse_record(data)
+        current = api.active
+        watch.lap('validation')
+
+        unavailable = explainer_unavailable(current)
+        if unavailable is not None:
+            api.errors_total.inc('explain', 'model')
+            return unavailable
+        classes, confidences, explanations = explain_parsed([parsed], current, watch)
+        api.predictions_total.inc('explain', 'model')
+        usia, tinggi, berat, _, gender_str = parsed
+        response = jsonify({
+            'status': api.model_status(classes[0]),
+            'confidence': confidences[0],
+            'explanation': explanations[0],
+            'message': "Prediction based on AI Model.",
+            'input_received': {
+                'usia': usia,
+                'tinggi': tinggi,
+                'berat': berat,
+                'gender': gender_str
+            }
+        })
+        watch.lap('serialize')
+        return response
+
+    except Exception as e:
+        api.errors_total.inc('explain', 'internal')
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/explain/batch', methods=['POST'])
+def explain_batch():
+    """
+    /predict/batch with an explanation per record (see /explain); all valid
+    records are explained in one pass over the trees.
+    """
+    watch = api.stopwatch('explain_batch')
+    try:
+        try:
+            records, errors = api.read_batch_records()
+        except ValueError as e:
+            api.errors_total.inc('explain_batch', 'bad_request')
+            return jsonify({'error': str(e)}), 400
+        watch.lap('json_parse')
+
+        if len(records) > api.MAX_BATCH_SIZE:
+            api.errors_total.inc('explain_batch', 'bad_request')
+            return jsonify({
+                'error': f'Batch too large: {len(records)} records (max {api.MAX_BATCH_SIZE})'
+            }), 413
+        indices, parsed, _ = api.parse_batch(records, errors)
+        current = api.active
+        watch.lap('validation')
+
+        unavailable = explainer_unavailable(current)
+        if unavailable is not None:
+            api.errors_total.inc('explain_batch', 'model')
+            return unavailable
+        classes, confidences, explanations = explain_parsed(parsed, current, watch)
+        api.predictions_total.inc('explain_batch', 'model', amount=len(parsed))
+
+        results = []
+        for i, (usia, tinggi, berat, _, gender_str), c, confidence, explanation in zip(
+                indices, parsed, classes, confidences, explanations):
+            results.append({
+                'index': i,
+                'status': api.model_status(c),
+                'confidence': confidence,
+                'explanation': explanation,
+                'input_received': {
+                    'usia': usia,
+                    'tinggi': tinggi,
+                    'berat': berat,
+                    'gender': gender_str
+                }
+            })
+
+        response = jsonify({
+            'message': "Prediction based on AI Model.",
+            'count': len(results),
+            'results': results,
+            'errors': errors
+        })
+        watch.lap('serialize')
+        return response
+
+    except Exception as e:
+        api.errors_total.inc('explain_batch', 'internal')
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,186 @@
+"""
+Growth-history routes of api_model.py: /history/<id_anak> and /history/trajectories.
+
+Records sent to /predict and /predict/batch with an 'id_anak' are stored as
+visits in the GrowthHistory of api_model (GROWTH_HISTORY_DB); these routes
+score the children's trajectories from them. api_model registers them with
+register().
+"""
+import numpy as np
+from flask import Blueprint, jsonify, request
+
+from metrics import NULL_STOPWATCH
+from record_scorer import score_records
+
+# Optional fields of a record kept in the growth history: child ID, measurement date (YYYY-MM-DD, default today), village
+HISTORY_FIELDS = ('id_anak', 'tanggal_ukur', 'desa')
+
+bp = Blueprint('history', __name__)
+# api_model, whose history store, active version and metrics the routes use (set by register)
+api = None
+
+
+def register(app, api_module):
+    """Serve the /history routes on `app` with the history store and model of `api_module`."""
+    global api
+    api = api_module
+    app.register_blueprint(bp)
+
+
+def parse_visit(data):
+    """
+    (id_anak, day number, desa) of a record for the growth history, or None
+    when it has no 'id_anak'. Raises ValueError on a bad 'tanggal_ukur'.
+    """
+    child_id = data.get('id_anak')
+    if child_id is None or str(child_id).strip() == '':
+        return None
+    from stunting_prediction_project.growth_history import to_days, today
+    day = today()
+    if data.get('tanggal_ukur'):
+        try:
+            day = int(to_days([str(data['tanggal_ukur'])])[0])
+        except ValueError:
+            raise ValueError(f"Invalid tanggal_ukur: {data['tanggal_ukur']} (expected YYYY-MM-DD)")
+    village = data.get('desa')
+    return str(child_id).strip(), day, None if village is None else str(village)
+
+
+def record_visits(visits, parsed, endpoint):
+    """
+    Add the visits of parsed records (None entries skipped) to the growth
+    history in one transaction. A failed write is logged and counted; it never
+    fails the prediction it belongs to.
+    """
+    rows = [(visit, record) for visit, record in zip(visits, parsed) if visit is not None]
+    if api.history_store is None or not rows:
+        return
+    child_ids, days, villages = zip(*[visit for visit, _ in rows])
+    usia, tinggi, berat, gender_val = list(zip(*[record for _, record in rows]))[:4]
+    try:
+        api.history_store.add(child_ids, days, gender_val, usia, tinggi, berat, villages)
+    except Exception as e:
+        api.errors_total.inc(endpoint, 'history')
+        print(f"Growth history write failed: {e}")
+
+
+def json_rows(columns):
+    """Row dicts from {column: array}; floats rounded to 4 decimals, NaN as null."""
+    lists = {}
+    for key, values in columns.items():
+        values = np.asarray(values)
+        if values.dtype.kind == 'f':
+            lists[key] = [None if v != v else v for v in np.round(values, 4).tolist()]
+        else:
+            lists[key] = values.tolist()
+    return [dict(zip(lists, row)) for row in zip(*lists.values())]
+
+
+def visit_haz(visits):
+    """WHO height-for-age z-score of every stored visit (NaN without the WHO tables)."""
+    if api.growth_standard is None:
+        return np.full(len(visits['child_id']), np.nan)
+    return api.growth_standard.height_for_age(visits['sex'], visits['age_months'], visits['height_cm'])
+
+
+def visit_probabilities(current, visits, watch=NULL_STOPWATCH):
+    """
+    P(stunting) of every stored visit from the model of `current`, rescored in
+    one pass (so trajectories follow the model version in use), or None.
+    """
+    if current is None or not hasattr(current.model, 'predict_proba') or not len(visits['child_id']):
+        return None
+    positive = np.flatnonzero(current.model.classes_ == 1)
+    if not positive.size:
+        return None
+    # Unknown sex is scored as Perempuan, like parse_record does
+    gender_val = np.where(visits['sex'] == 1, 1, 0)
+    records = list(zip(visits['age_months'].tolist(), visits['height_cm'].tolist(),
+                       visits['weight_kg'].tolist(), gender_val.tolist()))
+    return score_records(current, records, watch)[:, positive[0]]
+
+
+def trajectory_rows(visits, haz, probs):
+    """JSON rows of score_trajectories, with the risk as a label."""
+    from stunting_prediction_project.growth_history import risk_labels, score_trajectories
+    scores = score_trajectories(visits, haz, probs)
+    scores['risk'] = risk_labels(scores['risk'])
+    return json_rows(scores)
+
+
+def history_unavailable():
+    if api.history_store is None:
+        return jsonify({'error': 'Growth history is off (set GROWTH_HISTORY_DB)'}), 404
+    return None
+
+
+@bp.route('/history/<child_id>', methods=['GET'])
+def child_history(child_id):
+    """Every stored visit of one child (with HAZ and the model's P(stunting)) and its trajectory."""
+    unavailable = history_unavailable()
+    if unavailable is not None:
+        return unavailable
+    watch = api.stopwatch('history')
+    try:
+        visits = api.history_store.children([child_id])
+        watch.lap('history')
+        if not len(visits['child_id']):
+            return jsonify({'error': f'No visits for id_anak {child_id}'}), 404
+        haz = visit_haz(visits)
+        probs = visit_probabilities(api.active, visits, watch)
+        from stunting_prediction_project.growth_history import to_dates
+        rows = {
+            'tanggal_ukur': to_dates(visits['measured_on']),
+            'usia': visits['age_months'],
+            'tinggi': visits['height_cm'],
+            'berat': visits['weight_kg'],
+            'gender': np.where(visits['sex'] == 1, 'Laki-laki', 'Perempuan'),
+            'desa': visits['village_id'],
+            'haz': haz,
+        }
+        if probs is not None:
+            rows['prob_stunting'] = probs
+        response = jsonify({
+            'id_anak': child_id,
+            'visits': json_rows(rows),
+            'trajectory': trajectory_rows(visits, haz, probs)[0],
+        })
+        watch.lap('serialize')
+        return response
+    except Exception as e:
+        api.errors_total.inc('history', 'internal')
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/history/trajectories', methods=['POST'])
+def history_trajectories():
+    """
+    Trajectories of many children in one pass.
+    Body: {"id_anak": ["A1", "A2", ...]} or {"desa": "<village>"} (every child measured there).
+    """
+    unavailable = history_unavailable()
+    if unavailable is not None:
+        return unavailable
+    watch = api.stopwatch('history_trajectories')
+    try:
+        body = request.get_json(silent=True) or {}
+        if body.get('desa') is not None:
+            visits = api.history_store.village(body['desa'])
+        elif isinstance(body.get('id_anak'), list):
+            if len(body['id_anak']) > api.MAX_BATCH_SIZE:
+                api.errors_total.inc('history_trajectories', 'bad_request')
+                return jsonify({
+                    'error': f"Too many children: {len(body['id_anak'])} (max {api.MAX_BATCH_SIZE})"
+                }), 413
+            visits = api.history_store.children(body['id_anak'])
+        else:
+            api.errors_total.inc('history_trajectories', 'bad_request')
+            return jsonify({'error': 'Expected {"id_anak": [...]} or {"desa": "..."}'}), 400
+        watch.lap('history')
+        results = trajectory_rows(visits, visit_haz(visits), visit_probabilities(api.active, visits, watch))
+        response = jsonify({'count': len(results), 'visits': len(visits['child_id']), 'results': results})
+        watch.lap('serialize')
+        return response
+    except Exception as e:
+        api.errors_total.inc('history_trajectories', 'internal')
+        return jsonify({'error': str(e)}), 500
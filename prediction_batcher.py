@@ -0,0 +1,120 @@
+"""
+Request coalescing for the /predict endpoint of api_model.py.
+
+Concurrent single-record predictions are queued and scored together by one
+background thread, so a burst of requests costs one model call instead of
+one per request (PREDICT_BATCHING=1 in api_model).
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class PredictionBatcher:
+    """
+    Coalesce concurrent single-record predictions into one model call.
+    Rows are queued until `max_batch_size` are waiting or the oldest one has
+    waited `max_wait_ms`; a background thread then scores them together and
+    hands each probability row back to the request that submitted it.
+    Each row is scored by the model version it was submitted with, so a batch
+    that straddles a model reload is split into one call per version.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=64, max_wait_ms=5.0, max_queue_size=1024):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.queue = queue.Queue(maxsize=max_queue_size)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.rows = 0
+        self.largest_batch = 0
+        self.last_batch_size = 0
+        self.total_wait = 0.0
+        self.max_observed_wait = 0.0
+        self.rejected = 0
+
+    def _ensure_started(self):
+        # Started lazily so that forked workers get their own thread
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name='prediction-batcher', daemon=True
+                )
+                self._thread.start()
+
+    def submit(self, version, record):
+        """Queue one parsed record for `version`; returns a Future resolving to its
+        probabilities. Raises queue.Full when the queue is at capacity."""
+        self._ensure_started()
+        future = Future()
+        try:
+            self.queue.put_nowait((version, record, future, time.perf_counter()))
+        except queue.Full:
+            with self._stats_lock:
+                self.rejected += 1
+            raise
+        return future
+
+    def predict_proba(self, version, record, timeout=None):
+        return self.submit(version, record).result(timeout)
+
+    def _collect(self):
+        first = self.queue.get()
+        batch = [first]
+        deadline = first[3] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self.queue.get(timeout=max(remaining, 0)))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            groups = {}
+            for item in batch:
+                groups.setdefault(id(item[0]), []).append(item)
+            for items in groups.values():
+                try:
+                    probs = self.predict_fn(items[0][0], [item[1] for item in items])
+                except Exception as e:
+                    for item in items:
+                        item[2].set_exception(e)
+                else:
+                    for item, row_probs in zip(items, probs):
+                        item[2].set_result(row_probs)
+
+            waits = [started - item[3] for item in batch]
+            with self._stats_lock:
+                self.batches += 1
+                self.rows += len(batch)
+                self.last_batch_size = len(batch)
+                self.largest_batch = max(self.largest_batch, len(batch))
+                self.total_wait += sum(waits)
+                self.max_observed_wait = max(self.max_observed_wait, max(waits))
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000.0,
+                'max_queue_size': self.queue.maxsize,
+                'queue_depth': self.queue.qsize(),
+                'batches': self.batches,
+                'rows': self.rows,
+                'rejected': self.rejected,
+                'last_batch_size': self.last_batch_size,
+                'largest_batch_size': self.largest_batch,
+                'avg_batch_size': self.rows / self.batches if self.batches else 0.0,
+                'avg_wait_ms': self.total_wait * 1000.0 / self.rows if self.rows else 0.0,
+                'max_wait_observed_ms': self.max_observed_wait * 1000.0,
+            }
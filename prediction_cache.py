@@ -0,0 +1,86 @@
+"""
+Prediction cache for the /predict endpoint of api_model.py.
+
+A bounded LRU with a TTL per entry, keyed on the quantized input record.
+Entries belong to the model that produced them, so a hot reload (see
+api_model.activate) needs no explicit flush: the first lookup with the new
+model drops the old entries.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class PredictionCache:
+    """
+    Bounded LRU cache with per-entry TTL for model predictions.
+    Entries belong to the model object that produced them; looking up with a
+    different (reloaded) model drops everything cached for the old one.
+    """
+
+    def __init__(self, max_size=4096, ttl_seconds=3600.0):
+        self.max_size = max_size
+        self.ttl = ttl_seconds
+        self._entries = OrderedDict()
+        self._owner = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def _check_owner(self, owner):
+        if owner is not self._owner:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._owner = owner
+
+    def get(self, key, owner):
+        with self._lock:
+            self._check_owner(owner)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, owner):
+        with self._lock:
+            self._check_owner(owner)
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._owner = None
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl,
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
@@ -0,0 +1,227 @@
+"""
+Model scoring for api_model.py: from parsed request records to predict_proba.
+
+Each model version gets a RecordScorer that writes parsed records into a
+schema-fixed array (column layout from metadata.json and the fitted
+preprocessing) and preprocesses it with array operations, instead of
+building a DataFrame for the ColumnTransformer on every request. Versions
+it cannot reproduce exactly fall back to model rows via model_input.
+"""
+import re
+
+import numpy as np
+
+from metrics import NULL_STOPWATCH
+
+# Model input columns by role. Artifacts from older train.py runs use the raw
+# dataset headers below; newer ones clean them (e.g. 'Umur_(bulan)'). The actual
+# names are read from each version's metadata.json (see model_columns).
+DEFAULT_COLUMNS = {
+    'age': 'Umur (bulan)',
+    'height': 'Tinggi Badan (cm)',
+    'weight': 'Berat Badan (kg)',
+    'sex': 'Jenis Kelamin',
+    'wasting': 'Wasting',
+}
+COLUMN_PATTERNS = {
+    'age': r'umur|usia|age',
+    'height': r'tinggi|height',
+    'weight': r'berat|weight',
+    'sex': r'kelamin|gender|sex',
+    'wasting': r'wasting',
+}
+# Parsed records (usia, tinggi, berat, gender_val) a RecordScorer must score exactly like the model
+PARITY_RECORDS = [(24, 85.0, 11.5, 1), (24, 85.0, 11.5, 0), (6, 61.2, 6.1, 1), (48, 96.4, 13.8, 0),
+                  (0, 49.3, 3.2, 0), (60, 118.7, 24.9, 1), (13, 68.0, 7.4, 1), (36, 105.5, 18.2, 0)]
+# Rows up to which a sklearn RandomForest's trees are evaluated in-line (see forest_proba_fn)
+DIRECT_TREE_ROWS = 256
+
+
+def model_columns(metadata):
+    """Map each input role to the model's column name, as listed in metadata.json."""
+    names = list(metadata.get('numeric_cols', [])) + list(metadata.get('categorical_cols', []))
+    columns = dict(DEFAULT_COLUMNS)
+    for role, pattern in COLUMN_PATTERNS.items():
+        for name in names:
+            if re.search(pattern, name, flags=re.I):
+                columns[role] = name
+                break
+    return columns
+
+
+def to_model_row(usia, tinggi, berat, gender_val, columns=DEFAULT_COLUMNS):
+    """
+    Prepare data for model (matching the training columns)
+    Columns: 'Umur (bulan)', 'Tinggi Badan (cm)', 'Berat Badan (kg)', 'Jenis Kelamin', 'Wasting'
+    (or the names the model version was trained with, see model_columns)
+    Note: 'Wasting' seems to be required by the model. We'll initialize it to "Normal weight" as a placeholder
+    """
+    return {
+        columns['age']: usia,
+        columns['height']: tinggi,
+        columns['weight']: berat,
+        columns['sex']: gender_val,
+        columns['wasting']: "Normal weight"
+    }
+
+
+def model_input(current, rows):
+    """
+    Model rows as input for the model of `current`: plain column lists for a
+    CompiledForest, so the compiled engine never imports pandas; a DataFrame
+    for sklearn pipelines. Versions trained with WHO z-score features
+    (train.py --who_features) get them computed here for all rows at once.
+    """
+    if hasattr(current.model, 'encode'):
+        data = {col: [row[col] for row in rows] for col in rows[0]}
+    else:
+        import pandas as pd
+        data = pd.DataFrame(rows)
+    if current.who_features:
+        from stunting_prediction_project.who_growth import add_features
+        add_features(data, current.who_features['features'], current.who_features['columns'])
+    return data
+
+
+def forest_proba_fn(estimator):
+    """
+    predict_proba of a fitted estimator for preprocessed float32 rows. For up
+    to DIRECT_TREE_ROWS rows a RandomForest's trees are summed directly, as
+    RandomForestClassifier does, without its per-call validation and thread
+    dispatch; larger inputs keep the forest's multi-threaded predict_proba.
+    """
+    from sklearn.ensemble import RandomForestClassifier
+    if not isinstance(estimator, RandomForestClassifier) or estimator.n_outputs_ != 1:
+        return estimator.predict_proba
+    trees = [est.tree_ for est in estimator.estimators_]
+    n_classes = estimator.n_classes_
+
+    def proba(Xt):
+        if len(Xt) > DIRECT_TREE_ROWS and estimator.n_jobs not in (None, 1):
+            return estimator.predict_proba(Xt)
+        # tree_.predict gives the class fractions of each row's leaf
+        total = trees[0].predict(Xt)[:, :n_classes]
+        for tree in trees[1:]:
+            total += tree.predict(Xt)[:, :n_classes]
+        return total / len(trees)
+    return proba
+
+
+class RecordScorer:
+    """
+    Schema-fixed model input for parsed records, in place of a DataFrame.
+    The feature layout (column order, numeric vs categorical columns, category
+    codes) comes from metadata.json and the fitted preprocessing. A template
+    row with the constant columns (the Wasting placeholder of to_model_row) is
+    encoded once; scoring copies it and writes age, height, weight, the sex
+    code and any WHO z-scores into their slots, then preprocesses with array
+    operations (CompiledPreprocessor) instead of the ColumnTransformer.
+    """
+
+    def __init__(self, current):
+        model = current.model
+        # Trees compare float32 features; other estimators get float64 as from the ColumnTransformer
+        self.dtype = np.float32
+        if hasattr(model, 'forest_proba'):
+            self.pre, self.estimator_proba = model, model.forest_proba
+        else:
+            from stunting_prediction_project.compiled_model import CompiledPreprocessor
+            estimator = model.steps[-1][1]
+            self.pre = CompiledPreprocessor.from_pipeline(model)
+            self.estimator_proba = forest_proba_fn(estimator)
+            if not hasattr(estimator, 'estimators_'):
+                self.dtype = np.float64
+        self.classes_ = model.classes_
+        cols = self.pre.feature_cols
+        columns = current.columns
+        self.columns = columns
+        self.value_slots = [cols.index(columns[role]) for role in ('age', 'height', 'weight')]
+        self.sex_slot = cols.index(columns['sex'])
+        templates = []
+        for gender_val in (0, 1):
+            row = to_model_row(np.nan, np.nan, np.nan, gender_val, columns)
+            templates.append(self.pre.encode({col: [row.get(col, np.nan)] for col in cols}))
+        self.template = templates[0]
+        # Category code of gender_val 0 and 1 in the sex column
+        self.sex_codes = np.array([t[0, self.sex_slot] for t in templates])
+        self.who_features = current.who_features
+        if self.who_features:
+            self.who_slots = [cols.index(name) for name in self.who_features['features']]
+
+    def encode(self, records):
+        """Model input array for parsed records (usia, tinggi, berat, gender_val)."""
+        values = np.array(records, dtype=np.float64).reshape(len(records), 4)
+        X = np.repeat(self.template, len(records), axis=0)
+        X[:, self.value_slots] = values[:, :3]
+        gender = values[:, 3].astype(np.intp)
+        X[:, self.sex_slot] = self.sex_codes[gender]
+        if self.who_features:
+            from stunting_prediction_project.who_growth import add_features
+            data = {self.columns['age']: values[:, 0], self.columns['height']: values[:, 1],
+                    self.columns['weight']: values[:, 2], self.columns['sex']: gender}
+            add_features(data, self.who_features['features'], self.who_features['columns'])
+            for slot, name in zip(self.who_slots, self.who_features['features']):
+                X[:, slot] = data[name]
+        return X
+
+    def predict_proba(self, records, watch=NULL_STOPWATCH):
+        X = self.encode(records)
+        watch.lap('encode')
+        Xt = self.pre.transform(X, self.dtype)
+        watch.lap('preprocess')
+        probs = self.estimator_proba(Xt)
+        watch.lap('predict_proba')
+        return probs
+
+
+def build_scorer(current):
+    """
+    RecordScorer for `current` if it reproduces the model's probabilities on
+    PARITY_RECORDS; None otherwise (records then go through model_input).
+    """
+    try:
+        scorer = RecordScorer(current)
+        rows = [to_model_row(*record, current.columns) for record in PARITY_RECORDS]
+        expected = current.model.predict_proba(model_input(current, rows))
+        max_diff = float(np.abs(scorer.predict_proba(PARITY_RECORDS) - expected).max())
+    except Exception as e:
+        print(f"Schema-fixed input not available for {current.version} ({e}). Using model_input.")
+        return None
+    if max_diff > 1e-9:
+        print(f"Schema-fixed input differs from the model by {max_diff:.3g}. Using model_input.")
+        return None
+    return scorer
+
+
+def staged_predict_proba(model, X, watch=NULL_STOPWATCH):
+    """
+    model.predict_proba(X), with preprocessing and the estimator timed as
+    separate stages when the model exposes them (sklearn Pipeline, CompiledForest).
+    """
+    if hasattr(model, 'steps'):
+        for _, step in model.steps[:-1]:
+            if step is not None and step != 'passthrough':
+                X = step.transform(X)
+        watch.lap('preprocess')
+        probs = model.steps[-1][1].predict_proba(X)
+    elif hasattr(model, 'forest_proba'):
+        Xt = model.transform(model.encode(X))
+        watch.lap('preprocess')
+        probs = model.forest_proba(Xt)
+    else:
+        probs = model.predict_proba(X)
+    watch.lap('predict_proba')
+    return probs
+
+
+def score_records(current, records, watch=NULL_STOPWATCH):
+    """
+    predict_proba of `current` for parsed records (usia, tinggi, berat, gender_val):
+    through the version's RecordScorer, else as model rows via model_input.
+    """
+    scorer = current.scorer
+    if scorer is not None:
+        return scorer.predict_proba(records, watch)
+    input_data = model_input(current, [to_model_row(*record, current.columns) for record in records])
+    watch.lap('dataframe')
+    return staged_predict_proba(current.model, input_data, watch)
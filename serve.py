@@ -0,0 +1,98 @@
+"""
+Production entry point for the prediction API.
+
+Runs api_model's Flask app under gunicorn with N worker processes. The model
+is loaded once in the master before forking, so the forest's arrays are
+shared copy-on-write by every worker instead of being loaded N times.
+
+Usage:
+    python serve.py --workers 4 --port 5000
+"""
+import argparse
+import gc
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Serve the stunting prediction API with gunicorn")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Worker processes (default: number of CPU cores)')
+    parser.add_argument('--threads', type=int, default=4,
+                        help='Threads per worker (lets PREDICT_BATCHING coalesce requests)')
+    parser.add_argument('--timeout', type=int, default=30,
+                        help='Seconds before a silent worker is killed and restarted')
+    parser.add_argument('--graceful-timeout', type=int, default=30,
+                        help='Seconds in-flight requests get to finish on SIGTERM')
+    parser.add_argument('--keepalive', type=int, default=5)
+    parser.add_argument('--warmup', type=int, default=20,
+                        help='Predictions run in the master before forking (0 to skip)')
+    parser.add_argument('--require-model', action='store_true',
+                        help='Exit instead of serving the rule-based fallback when the model is missing')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        sys.exit("gunicorn is required for serve.py (pip install gunicorn; Linux/macOS only)")
+
+    # Model paths in api_model are relative to the repository root
+    os.chdir(BASE_DIR)
+    import api_model
+
+    app = api_model.create_app()
+    if api_model.active is None:
+        if args.require_model:
+            sys.exit(f"Model not available at {api_model.MODEL_PATH}; refusing to start")
+        print("Warning: serving rule-based fallback only (/ready will report 503).")
+    elif args.warmup:
+        print(f"Warming up model with {args.warmup} predictions...")
+        api_model.warm_up(api_model.active, args.warmup)
+
+    # Move everything loaded so far out of the GC's reach so that collections
+    # in the workers do not touch (and un-share) the model's pages.
+    gc.collect()
+    gc.freeze()
+
+    class StuntingApplication(BaseApplication):
+        def __init__(self, application, options):
+            self.application = application
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return self.application
+
+    def when_ready(server):
+        server.log.info("Model %s; accepting connections on %s:%s",
+                        "loaded" if api_model.active is not None else "NOT loaded",
+                        args.host, args.port)
+
+    options = {
+        'bind': f'{args.host}:{args.port}',
+        'workers': args.workers,
+        'threads': args.threads,
+        'worker_class': 'gthread',
+        'timeout': args.timeout,
+        'graceful_timeout': args.graceful_timeout,
+        'keepalive': args.keepalive,
+        # The app (and model) is already imported in the master: workers fork from it
+        'preload_app': True,
+        'when_ready': when_ready,
+    }
+    StuntingApplication(app, options).run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+# Precompute P(stunting) over an age x sex x height x weight grid for lookup_table.RiskTable
+# Usage:
+#   python build_lookup.py --model artifacts_sklearn171/best_model_RandomForest.joblib
+import argparse
+import json
+import re
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from lookup_table import FORMAT_VERSION, file_sha256, grid_axis, save_table
+from who_growth import add_features
+
+
+def find_col(cols, pattern):
+    """Pick the metadata column matching `pattern` (e.g. 'umur' -> 'Umur (bulan)')."""
+    for c in cols:
+        if re.search(pattern, c, flags=re.I):
+            return c
+    raise ValueError(f"No column matching '{pattern}' in {cols}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--model", default="artifacts_sklearn171/best_model_RandomForest.joblib")
+    ap.add_argument("--metadata", default="artifacts_sklearn171/metadata.json")
+    ap.add_argument("--output", default="artifacts_sklearn171/risk_table.npy")
+    ap.add_argument("--age_min", type=int, default=0)
+    ap.add_argument("--age_max", type=int, default=60)
+    ap.add_argument("--height_min", type=float, default=40.0)
+    ap.add_argument("--height_max", type=float, default=130.0)
+    ap.add_argument("--height_step", type=float, default=0.5)
+    ap.add_argument("--weight_min", type=float, default=1.0)
+    ap.add_argument("--weight_max", type=float, default=30.0)
+    ap.add_argument("--weight_step", type=float, default=0.5)
+    ap.add_argument("--sex_values", nargs="+", default=["Laki-laki", "Perempuan"])
+    ap.add_argument("--wasting", default="Normal weight",
+                    help="Wasting value used for every grid cell (same placeholder as the API)")
+    args = ap.parse_args()
+
+    model = joblib.load(args.model)
+    with open(args.metadata, "r") as f:
+        meta = json.load(f)
+    numeric_cols = meta.get("numeric_cols", [])
+    categorical_cols = meta.get("categorical_cols", [])
+    cols = {
+        "age": find_col(numeric_cols, r"umur|usia|age"),
+        "height": find_col(numeric_cols, r"tinggi|height"),
+        "weight": find_col(numeric_cols, r"berat|weight"),
+        "sex": find_col(categorical_cols, r"kelamin|gender|sex"),
+        "wasting": find_col(categorical_cols, r"wasting"),
+    }
+    # Models trained with --who_features also take z-scores computed from the grid values
+    who_features = meta.get("who_features")
+
+    classes = [c.item() if hasattr(c, "item") else c for c in model.classes_]
+    if len(classes) != 2:
+        raise ValueError("Risk table supports binary models only")
+
+    ages = np.arange(args.age_min, args.age_max + 1)
+    heights = grid_axis(args.height_min, args.height_max, args.height_step)
+    weights = grid_axis(args.weight_min, args.weight_max, args.weight_step)
+    hh, ww = np.meshgrid(heights, weights, indexing="ij")
+    table = np.empty((len(ages), len(args.sex_values), len(heights), len(weights)), dtype=np.float32)
+    print(f"Evaluating {table.size} grid cells...")
+
+    t0 = time.perf_counter()
+    for i, age in enumerate(ages):
+        for j, sex in enumerate(args.sex_values):
+            X = pd.DataFrame({
+                cols["age"]: np.full(hh.size, age),
+                cols["height"]: hh.ravel(),
+                cols["weight"]: ww.ravel(),
+                cols["sex"]: sex,
+                cols["wasting"]: args.wasting,
+            })
+            if who_features:
+                add_features(X, who_features["features"], who_features["columns"])
+            X = X[list(numeric_cols) + list(categorical_cols)]
+            table[i, j] = model.predict_proba(X)[:, 1].reshape(hh.shape)
+    print(f"Grid evaluated in {time.perf_counter() - t0:.1f}s")
+
+    params = {
+        "format_version": FORMAT_VERSION,
+        "model_sha256": file_sha256(args.model),
+        "metadata_numeric_cols": numeric_cols,
+        "metadata_categorical_cols": categorical_cols,
+        "columns": cols,
+        "classes": classes,
+        "age_min": args.age_min,
+        "age_max": args.age_max,
+        "height_min": args.height_min,
+        "height_max": args.height_max,
+        "height_step": args.height_step,
+        "weight_min": args.weight_min,
+        "weight_max": args.weight_max,
+        "weight_step": args.weight_step,
+        "sex_values": args.sex_values,
+        "wasting": args.wasting,
+        "dtype": "float16",
+    }
+    save_table(args.output, table, params)
+    print(f"Saved risk table {table.shape} to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
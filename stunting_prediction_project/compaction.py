@@ -0,0 +1,175 @@
+"""Inference cost measurement and RandomForest compaction for train.py.
+
+``inference_cost`` reports what serving a fitted pipeline costs: serialized
+size, load time, single-row and batch ``predict_proba`` latency.
+
+``compact_forest`` looks for a smaller version of a fitted forest that loses
+at most ``max_f1_loss`` F1 (absolute) on the test set. Variants are prefixes
+of the fitted forest (fewer trees; trees are independent, so no refit is
+needed) and forests refitted with a depth or leaf cap, each again cut to
+fewer trees. F1 for every prefix length comes from one pass over the trees.
+"""
+import copy
+import io
+import time
+
+import joblib
+import numpy as np
+from sklearn.base import clone
+from sklearn.metrics import f1_score
+from sklearn.pipeline import Pipeline
+
+TREE_COUNTS = (10, 25, 50, 75, 100)
+
+
+def inference_cost(mdl, X_rows, repeats=50):
+    """Serialized size, load time and predict_proba latency of a fitted model.
+
+    Parameters
+    ----------
+    mdl : fitted estimator or Pipeline
+    X_rows : pandas.DataFrame
+        Raw input rows, as the API/infer.py would pass them. The first row is
+        used for single-row latency, all of them for batch latency.
+    repeats : int
+        Single-row predictions timed (the median is reported).
+    """
+    buf = io.BytesIO()
+    joblib.dump(mdl, buf)
+    size = buf.tell()
+    buf.seek(0)
+    t0 = time.perf_counter()
+    loaded = joblib.load(buf)
+    load_seconds = time.perf_counter() - t0
+
+    one = X_rows.iloc[:1]
+    loaded.predict_proba(one)  # warm-up
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        loaded.predict_proba(one)
+        times.append(time.perf_counter() - t0)
+    t0 = time.perf_counter()
+    loaded.predict_proba(X_rows)
+    batch_seconds = time.perf_counter() - t0
+    return {
+        "model_size_mb": round(size / 2**20, 3),
+        "load_seconds": round(load_seconds, 4),
+        "row_latency_ms": round(float(np.median(times)) * 1000, 3),
+        "batch_rows": len(X_rows),
+        "batch_latency_ms": round(batch_seconds * 1000, 3),
+    }
+
+
+def subset_forest(forest, n_trees):
+    """The same forest restricted to its first `n_trees` trees (shares the tree objects)."""
+    small = copy.copy(forest)
+    small.estimators_ = forest.estimators_[:n_trees]
+    small.n_estimators = n_trees
+    return small
+
+
+def prefix_f1(forest, X, y, tree_counts):
+    """Macro F1 of the first k trees for every k in `tree_counts`, in one pass.
+
+    `X` must be the preprocessed float32 matrix the trees were fitted on.
+    """
+    counts = set(tree_counts)
+    total = np.zeros((X.shape[0], len(forest.classes_)))
+    scores = {}
+    for k, tree in enumerate(forest.estimators_, 1):
+        total += tree.predict_proba(X, check_input=False)
+        if k in counts:
+            y_pred = forest.classes_[total.argmax(axis=1)]
+            scores[k] = f1_score(y, y_pred, average="macro", zero_division=0)
+    return scores
+
+
+def compact_forest(pipeline, Xt_train, y_train, Xt_test, y_test, X_sample, max_f1_loss,
+                   latency_budget_ms=None, size_budget_mb=None, depths=(), leaves=(),
+                   fit=None):
+    """Pick the compacted forest that best fits the budgets within the F1 tolerance.
+
+    Parameters
+    ----------
+    pipeline : Pipeline
+        Fitted ``prep`` + ``RandomForestClassifier`` pipeline.
+    Xt_train, Xt_test : ndarray
+        Train/test data already passed through ``prep`` (float32, C-contiguous).
+    X_sample : pandas.DataFrame
+        Raw rows for ``inference_cost``.
+    max_f1_loss : float
+        Largest acceptable drop in macro F1 versus the original forest.
+    latency_budget_ms, size_budget_mb : float, optional
+        Targets for single-row latency and serialized size. With a budget the
+        most accurate variant within it wins; without one the smallest variant
+        within the F1 tolerance wins.
+    depths, leaves : sequence of int
+        ``max_depth`` / ``max_leaf_nodes`` caps to refit the forest with.
+    fit : callable, optional
+        ``fit(forest, X, y)`` used for the refits (e.g. to apply a core budget).
+
+    Returns
+    -------
+    (pipeline, report) : the chosen pipeline (possibly the original) and a
+    JSON-serialisable summary for metadata.json.
+    """
+    prep, forest = pipeline.steps[0][1], pipeline.steps[-1][1]
+    fit = fit or (lambda est, X, y: est.fit(X, y))
+    n_trees = len(forest.estimators_)
+    tree_counts = sorted({k for k in TREE_COUNTS if k < n_trees} | {n_trees})
+
+    forests = [({"max_depth": forest.max_depth, "max_leaf_nodes": forest.max_leaf_nodes}, forest)]
+    for param, values in (("max_depth", depths), ("max_leaf_nodes", leaves)):
+        for v in values:
+            capped = clone(forest).set_params(**{param: v})
+            fit(capped, Xt_train, y_train)
+            caps = {"max_depth": forest.max_depth, "max_leaf_nodes": forest.max_leaf_nodes, param: v}
+            forests.append((caps, capped))
+
+    scores = [prefix_f1(fitted, Xt_test, y_test, tree_counts) for _, fitted in forests]
+    original_f1 = scores[0][n_trees]
+    variants = []
+    for (caps, fitted), forest_scores in zip(forests, scores):
+        for k, f1 in sorted(forest_scores.items()):
+            variant = {"n_estimators": k, **caps, "f1_macro": f1}
+            if f1 >= original_f1 - max_f1_loss:
+                # Only variants within the tolerance are worth timing
+                candidate = Pipeline([("prep", prep), ("clf", subset_forest(fitted, k))])
+                variant.update(inference_cost(candidate, X_sample))
+                variant["_pipeline"] = candidate
+            variants.append(variant)
+
+    def within_budget(v):
+        return ((latency_budget_ms is None or v["row_latency_ms"] <= latency_budget_ms)
+                and (size_budget_mb is None or v["model_size_mb"] <= size_budget_mb))
+
+    eligible = [v for v in variants if "_pipeline" in v]
+    has_budget = latency_budget_ms is not None or size_budget_mb is not None
+    fitting = [v for v in eligible if within_budget(v)]
+    if has_budget and fitting:
+        chosen = max(fitting, key=lambda v: (v["f1_macro"], -v["model_size_mb"]))
+    elif has_budget:
+        # Nothing meets the budget: get as close to it as the tolerance allows
+        key = "row_latency_ms" if latency_budget_ms is not None else "model_size_mb"
+        chosen = min(eligible, key=lambda v: v[key])
+    else:
+        chosen = min(eligible, key=lambda v: (v["model_size_mb"], -v["f1_macro"]))
+
+    original = next(v for v in variants if v["n_estimators"] == n_trees and "_pipeline" in v
+                    and v["max_depth"] == forest.max_depth
+                    and v["max_leaf_nodes"] == forest.max_leaf_nodes)
+
+    def strip(v):
+        return {k: val for k, val in v.items() if k != "_pipeline"}
+
+    report = {
+        "max_f1_loss": max_f1_loss,
+        "latency_budget_ms": latency_budget_ms,
+        "size_budget_mb": size_budget_mb,
+        "budget_met": within_budget(chosen) if has_budget else None,
+        "original": strip(original),
+        "chosen": strip(chosen),
+        "variants": [strip(v) for v in variants],
+    }
+    return chosen["_pipeline"], report
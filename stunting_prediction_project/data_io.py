@@ -0,0 +1,184 @@
+"""Tabular input/output shared by train.py and infer.py.
+
+The format is picked from the file extension: CSV, Parquet (``.parquet``,
+``.pq``) or Arrow IPC / Feather v2 (``.arrow``, ``.feather``, ``.ipc``).
+Columnar formats are read with column projection, so only the requested
+columns are decoded. pyarrow is only imported for Parquet/Arrow files.
+With ``lean=True`` numeric columns are read as float32 and text columns as
+pandas categories, which roughly halves (numeric) or shrinks by an order of
+magnitude (repetitive text) the memory of a large dataset.
+"""
+import os
+import re
+
+import pandas as pd
+
+PARQUET_EXTS = (".parquet", ".pq")
+ARROW_EXTS = (".arrow", ".feather", ".ipc")
+
+
+def file_format(path) -> str:
+    ext = os.path.splitext(str(path))[1].lower()
+    if ext in PARQUET_EXTS:
+        return "parquet"
+    if ext in ARROW_EXTS:
+        return "arrow"
+    return "csv"
+
+
+def clean_name(c) -> str:
+    """Pembersihan nama kolom yang sama dengan training/notebook."""
+    return re.sub(r"\s+", "_", str(c).strip())
+
+
+def _open_arrow(path):
+    import pyarrow as pa
+
+    # Memory-mapped: record batches are read zero-copy from the file
+    return pa.ipc.open_file(pa.memory_map(str(path), "r"))
+
+
+def read_column_names(path):
+    """Column names of a file without reading its data."""
+    fmt = file_format(path)
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        return list(pq.read_schema(path).names)
+    if fmt == "arrow":
+        return list(_open_arrow(path).schema.names)
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def resolve_columns(path, wanted, optional=()):
+    """Map `wanted` (+ any `optional` present) to the file's own column names.
+
+    Names are compared after `clean_name`, so 'Umur (bulan)' matches
+    'Umur_(bulan)'. Missing `wanted` columns are returned as-is and left for
+    the caller's validation to report.
+    """
+    by_clean = {}
+    for c in read_column_names(path):
+        by_clean.setdefault(clean_name(c), c)
+    cols = [by_clean.get(clean_name(c), c) for c in wanted]
+    cols += [by_clean[clean_name(c)] for c in optional
+             if clean_name(c) in by_clean and by_clean[clean_name(c)] not in cols]
+    return cols
+
+
+def downcast_frame(df: pd.DataFrame, keep=()) -> pd.DataFrame:
+    """float32 for numeric columns and category for text columns, except `keep`."""
+    keep = {clean_name(c) for c in keep}
+    for c in df.columns:
+        s = df[c]
+        if clean_name(c) in keep or pd.api.types.is_bool_dtype(s):
+            continue
+        if pd.api.types.is_numeric_dtype(s):
+            if s.dtype != "float32":
+                df[c] = s.astype("float32")
+        elif not isinstance(s.dtype, pd.CategoricalDtype):
+            df[c] = s.astype("category")
+    return df
+
+
+def lean_csv_dtypes(path, columns=None, keep=(), sample_rows=10000):
+    """read_csv dtypes matching `downcast_frame`, inferred from the first rows.
+
+    Reading with these dtypes avoids ever materialising the float64/object
+    frame, so peak memory stays close to the final (lean) size.
+    """
+    sample = pd.read_csv(path, usecols=columns, nrows=sample_rows)
+    keep = {clean_name(c) for c in keep}
+    return {
+        c: ("float32" if pd.api.types.is_numeric_dtype(sample[c]) else "category")
+        for c in sample.columns
+        if clean_name(c) not in keep and not pd.api.types.is_bool_dtype(sample[c])
+    }
+
+
+def read_table(path, columns=None, lean=False, keep=()) -> pd.DataFrame:
+    """Read a whole file; `columns` projects Parquet/Arrow reads (and CSV usecols).
+
+    `lean` downcasts every column but those in `keep` (see `downcast_frame`).
+    """
+    fmt = file_format(path)
+    if fmt == "parquet":
+        df = pd.read_parquet(path, columns=columns)
+    elif fmt == "arrow":
+        table = _open_arrow(path).read_all()
+        if columns is not None:
+            table = table.select(columns)
+        df = table.to_pandas()
+    else:
+        df = None
+        if lean:
+            try:
+                df = pd.read_csv(path, usecols=columns, dtype=lean_csv_dtypes(path, columns, keep))
+            except (ValueError, TypeError):
+                pass  # The first rows were not representative; read, then downcast
+        if df is None:
+            df = pd.read_csv(path, usecols=columns)
+    return downcast_frame(df, keep) if lean else df
+
+
+def iter_table(path, chunksize, columns=None):
+    """Yield DataFrames of at most `chunksize` rows."""
+    fmt = file_format(path)
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+    elif fmt == "arrow":
+        table = _open_arrow(path).read_all()
+        if columns is not None:
+            table = table.select(columns)
+        for offset in range(0, table.num_rows, chunksize):
+            yield table.slice(offset, chunksize).to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunksize, usecols=columns)
+
+
+class TableWriter:
+    """Write DataFrames chunk by chunk to CSV, Parquet or Arrow IPC.
+
+    The header (CSV) or schema (Parquet/Arrow) is taken from the first chunk;
+    later chunks are appended.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.format = file_format(path)
+        self._writer = None
+        self._schema = None
+        self._first = True
+
+    def write(self, df: pd.DataFrame):
+        if self.format == "csv":
+            df.to_csv(self.path, mode="w" if self._first else "a",
+                      header=self._first, index=False)
+        else:
+            import pyarrow as pa
+
+            table = pa.Table.from_pandas(df, schema=self._schema, preserve_index=False)
+            if self._writer is None:
+                self._schema = table.schema
+                if self.format == "parquet":
+                    import pyarrow.parquet as pq
+
+                    self._writer = pq.ParquetWriter(self.path, self._schema)
+                else:
+                    self._writer = pa.ipc.new_file(self.path, self._schema)
+            self._writer.write_table(table)
+        self._first = False
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,344 @@
+"""Input-drift monitoring: training reference sketches and their streaming
+counterpart for live traffic.
+
+``train.py`` writes ``drift_reference.json`` next to the model: for every
+numeric feature a histogram on NUM_BINS training quantiles (plus range and
+missing count), for every categorical feature the category counts. The file
+is a few KB however large the training set; ``train.py --update`` adds the
+counts of each new slice on the same bins.
+
+``DriftMonitor`` keeps the same histograms for the inputs a service sees,
+as fixed-size count arrays: one bin lookup and one increment per feature and
+row, no raw values stored. Counts cover the current window of `window` rows
+and the one before it, so the report follows recent traffic in constant
+memory. ``report`` compares them with the reference: population stability
+index (PSI) per feature, missing and out-of-range rates, and the share of
+categorical values never seen in training.
+"""
+import bisect
+import json
+import os
+import threading
+from collections import Counter
+
+import numpy as np
+
+DRIFT_FILE = "drift_reference.json"
+FORMAT_VERSION = 1
+# Histogram bins per numeric feature (training quantiles; ties merge bins)
+NUM_BINS = 20
+# Categories kept per feature; rarer ones are pooled in "other"
+MAX_CATEGORIES = 100
+# Distinct unseen values reported per feature (further ones are only counted)
+MAX_UNSEEN_VALUES = 20
+# Usual PSI reading: < 0.1 stable, 0.1-0.25 moderate shift, >= 0.25 drift
+PSI_MODERATE = 0.1
+PSI_DRIFT = 0.25
+# Unseen-category share of live values that raises an alert
+UNSEEN_ALERT_RATE = 0.01
+# Live rows needed before a feature gets a status
+MIN_ROWS = 200
+
+
+def _is_missing(value):
+    return value is None or (isinstance(value, float) and value != value)
+
+
+def bin_counts(values, edges):
+    """(counts per bin, missing) of numeric `values` on interior bin `edges`."""
+    x = np.asarray(values, dtype=np.float64)
+    ok = ~np.isnan(x)
+    counts = np.bincount(np.searchsorted(edges, x[ok], side="right"), minlength=len(edges) + 1)
+    return counts, int(len(x) - ok.sum())
+
+
+def build_reference(X, num_cols, cat_cols, bins=NUM_BINS):
+    """Reference sketches of the training DataFrame `X`."""
+    numeric = {}
+    for c in num_cols:
+        x = X[c].to_numpy(dtype=np.float64, na_value=np.nan)
+        finite = x[~np.isnan(x)]
+        if len(finite):
+            edges = np.unique(np.quantile(finite, np.linspace(0, 1, bins + 1)[1:-1]))
+        else:
+            edges = np.zeros(0)
+        counts, missing = bin_counts(x, edges)
+        numeric[c] = {
+            "edges": edges.tolist(),
+            "counts": counts.tolist(),
+            "missing": missing,
+            "min": float(finite.min()) if len(finite) else None,
+            "max": float(finite.max()) if len(finite) else None,
+        }
+    categorical = {}
+    for c in cat_cols:
+        counts = X[c].astype(str).where(X[c].notna()).value_counts(dropna=True)
+        categorical[c] = {
+            "counts": {str(k): int(v) for k, v in counts.iloc[:MAX_CATEGORIES].items()},
+            "other": int(counts.iloc[MAX_CATEGORIES:].sum()),
+            "missing": int(X[c].isna().sum()),
+        }
+    return {"format_version": FORMAT_VERSION, "rows": int(len(X)),
+            "numeric": numeric, "categorical": categorical}
+
+
+def fold_reference(reference, X):
+    """Add the rows of `X` (a new training slice) to `reference` on its existing bins."""
+    for c, ref in reference["numeric"].items():
+        if c not in X:
+            continue
+        x = X[c].to_numpy(dtype=np.float64, na_value=np.nan)
+        counts, missing = bin_counts(x, np.asarray(ref["edges"]))
+        ref["counts"] = (np.asarray(ref["counts"]) + counts).tolist()
+        ref["missing"] += missing
+        finite = x[~np.isnan(x)]
+        if len(finite):
+            ref["min"] = float(finite.min()) if ref["min"] is None else min(ref["min"], float(finite.min()))
+            ref["max"] = float(finite.max()) if ref["max"] is None else max(ref["max"], float(finite.max()))
+    for c, ref in reference["categorical"].items():
+        if c not in X:
+            continue
+        for k, v in X[c].dropna().astype(str).value_counts().items():
+            if k in ref["counts"]:
+                ref["counts"][k] += int(v)
+            else:
+                # The category set stays as in the first training run
+                ref["other"] += int(v)
+        ref["missing"] += int(X[c].isna().sum())
+    reference["rows"] += int(len(X))
+    return reference
+
+
+def load_reference(model_dir):
+    path = os.path.join(model_dir, DRIFT_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        reference = json.load(f)
+    if reference.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported drift reference format: {reference.get('format_version')}")
+    return reference
+
+
+def save_reference(model_dir, reference):
+    with open(os.path.join(model_dir, DRIFT_FILE), "w") as f:
+        json.dump(reference, f)
+
+
+def psi(expected, actual):
+    """Population stability index of two count vectors (0.5 added per bin against empty bins)."""
+    e = np.asarray(expected, dtype=np.float64) + 0.5
+    a = np.asarray(actual, dtype=np.float64) + 0.5
+    e /= e.sum()
+    a /= a.sum()
+    return float(np.sum((a - e) * np.log(a / e)))
+
+
+def status(score, rows):
+    if rows < MIN_ROWS:
+        return "insufficient_data"
+    if score >= PSI_DRIFT:
+        return "drift"
+    return "moderate" if score >= PSI_MODERATE else "ok"
+
+
+class _Counts:
+    """Live counts of one window: per numeric bin (+ below/above the training
+    range and missing) and per category (+ unseen and missing)."""
+
+    def __init__(self, numeric, categorical):
+        self.rows = 0
+        # bins..., below min, above max, missing
+        self.numeric = {c: np.zeros(len(ref["edges"]) + 4, dtype=np.int64) for c, ref in numeric.items()}
+        # categories..., unseen, missing
+        self.categorical = {c: np.zeros(len(ref["counts"]) + 2, dtype=np.int64)
+                            for c, ref in categorical.items()}
+
+
+class DriftMonitor:
+    """Streaming sketches of live inputs compared with a training reference.
+
+    Thread-safe; memory is fixed by the reference (bins and categories per
+    feature, MAX_UNSEEN_VALUES unseen labels), not by the traffic.
+    """
+
+    def __init__(self, reference, window=10000):
+        self.reference = reference
+        self.window = max(1, int(window))
+        self.numeric = reference["numeric"]
+        self.categorical = reference["categorical"]
+        self._edges = {c: ref["edges"] for c, ref in self.numeric.items()}
+        self._edge_arrays = {c: np.asarray(ref["edges"], dtype=np.float64) for c, ref in self.numeric.items()}
+        self._range = {c: (ref["min"], ref["max"]) for c, ref in self.numeric.items()}
+        self._codes = {c: {k: i for i, k in enumerate(ref["counts"])} for c, ref in self.categorical.items()}
+        self._lock = threading.Lock()
+        self._current = _Counts(self.numeric, self.categorical)
+        self._previous = None
+        self.rows_seen = 0
+        self.unseen_values = {c: {} for c in self.categorical}
+
+    def _rotate(self):
+        if self._current.rows >= self.window:
+            self._previous = self._current
+            self._current = _Counts(self.numeric, self.categorical)
+
+    def _unseen(self, col, value, n=1):
+        seen = self.unseen_values[col]
+        if value in seen or len(seen) < MAX_UNSEEN_VALUES:
+            seen[value] = seen.get(value, 0) + n
+
+    def observe_row(self, row):
+        """Count one input row ({column: value}).
+
+        Columns without a reference are ignored, and reference columns absent
+        from the row are skipped rather than counted as missing, as in observe.
+        """
+        with self._lock:
+            counts = self._current
+            for col, edges in self._edges.items():
+                if col not in row:
+                    continue
+                value = row[col]
+                bins = counts.numeric[col]
+                if _is_missing(value):
+                    bins[-1] += 1
+                    continue
+                value = float(value)
+                bins[bisect.bisect_right(edges, value)] += 1
+                low, high = self._range[col]
+                if low is not None and value < low:
+                    bins[-3] += 1
+                elif high is not None and value > high:
+                    bins[-2] += 1
+            for col, codes in self._codes.items():
+                if col not in row:
+                    continue
+                value = row[col]
+                cats = counts.categorical[col]
+                if _is_missing(value):
+                    cats[-1] += 1
+                    continue
+                code = codes.get(str(value))
+                if code is None:
+                    cats[-2] += 1
+                    self._unseen(col, str(value))
+                else:
+                    cats[code] += 1
+            counts.rows += 1
+            self.rows_seen += 1
+            self._rotate()
+
+    def observe(self, columns, n):
+        """Count `n` rows given as {column: sequence or scalar} (scalars apply to every row)."""
+        if not n:
+            return
+        binned = {}
+        for col, edges in self._edge_arrays.items():
+            if col not in columns:
+                continue
+            x = np.broadcast_to(np.asarray(columns[col], dtype=np.float64), (n,))
+            counts, missing = bin_counts(x, edges)
+            low, high = self._range[col]
+            below = int(np.sum(x < low)) if low is not None else 0
+            above = int(np.sum(x > high)) if high is not None else 0
+            binned[col] = np.concatenate([counts, [below, above, missing]])
+        cats = {}
+        for col, codes in self._codes.items():
+            if col not in columns:
+                continue
+            values = columns[col]
+            if isinstance(values, str) or not hasattr(values, "__len__"):
+                tally = {values: n}
+            else:
+                # Few distinct values per batch: classify each once
+                tally = Counter(values.tolist() if isinstance(values, np.ndarray) else values)
+            out = np.zeros(len(codes) + 2, dtype=np.int64)
+            unseen = {}
+            for value, k in tally.items():
+                if _is_missing(value):
+                    out[-1] += k
+                    continue
+                code = codes.get(str(value))
+                if code is None:
+                    out[-2] += k
+                    unseen[str(value)] = unseen.get(str(value), 0) + k
+                else:
+                    out[code] += k
+            cats[col] = (out, unseen)
+        with self._lock:
+            counts = self._current
+            for col, add in binned.items():
+                counts.numeric[col] += add
+            for col, (add, unseen) in cats.items():
+                counts.categorical[col] += add
+                for value, k in unseen.items():
+                    self._unseen(col, value, k)
+            counts.rows += n
+            self.rows_seen += n
+            self._rotate()
+
+    def _recent(self):
+        """Counts of the current and the previous window, summed."""
+        with self._lock:
+            windows = [w for w in (self._previous, self._current) if w is not None]
+            rows = sum(w.rows for w in windows)
+            numeric = {c: sum(w.numeric[c] for w in windows) for c in self.numeric}
+            categorical = {c: sum(w.categorical[c] for w in windows) for c in self.categorical}
+            unseen = {c: dict(v) for c, v in self.unseen_values.items()}
+        return rows, numeric, categorical, unseen
+
+    def report(self):
+        """Drift scores of recent traffic per feature, and the features needing attention."""
+        rows, numeric, categorical, unseen = self._recent()
+        features = {}
+        alerts = []
+        for col, ref in self.numeric.items():
+            live = numeric[col]
+            n_values = int(live[:-3].sum())
+            score = psi(ref["counts"], live[:-3]) if n_values else None
+            n_ref = sum(ref["counts"]) + ref["missing"]
+            features[col] = {
+                "type": "numeric",
+                "psi": None if score is None else round(score, 4),
+                "status": status(score or 0.0, n_values),
+                "missing_rate": round(int(live[-1]) / rows, 4) if rows else None,
+                "reference_missing_rate": round(ref["missing"] / n_ref, 4) if n_ref else None,
+                "below_range_rate": round(int(live[-3]) / n_values, 4) if n_values else None,
+                "above_range_rate": round(int(live[-2]) / n_values, 4) if n_values else None,
+            }
+        for col, ref in self.categorical.items():
+            live = categorical[col]
+            n_values = int(live[:-1].sum())
+            # Unseen values are compared with the pooled rare categories of training
+            score = psi(list(ref["counts"].values()) + [ref["other"]], live[:-1]) if n_values else None
+            n_ref = sum(ref["counts"].values()) + ref["other"] + ref["missing"]
+            unseen_rate = int(live[-2]) / n_values if n_values else None
+            top = sorted(unseen[col].items(), key=lambda kv: -kv[1])
+            features[col] = {
+                "type": "categorical",
+                "psi": None if score is None else round(score, 4),
+                "status": status(score or 0.0, n_values),
+                "missing_rate": round(int(live[-1]) / rows, 4) if rows else None,
+                "reference_missing_rate": round(ref["missing"] / n_ref, 4) if n_ref else None,
+                "unseen_rate": None if unseen_rate is None else round(unseen_rate, 4),
+                "unseen_values": dict(top),
+            }
+            if unseen_rate is not None and n_values >= MIN_ROWS and unseen_rate >= UNSEEN_ALERT_RATE:
+                alerts.append({"feature": col, "reason": "unseen_categories", "rate": round(unseen_rate, 4)})
+        for col, f in features.items():
+            if f["status"] == "drift":
+                alerts.append({"feature": col, "reason": "psi", "psi": f["psi"]})
+        return {
+            "rows_seen": self.rows_seen,
+            "window_rows": self.window,
+            "recent_rows": rows,
+            "reference_rows": self.reference["rows"],
+            "thresholds": {"psi_moderate": PSI_MODERATE, "psi_drift": PSI_DRIFT,
+                           "unseen_rate": UNSEEN_ALERT_RATE, "min_rows": MIN_ROWS},
+            "features": features,
+            "alerts": alerts,
+        }
+
+    def gauges(self):
+        """{feature: (psi, unseen_rate)} of recent traffic, for Prometheus gauges."""
+        return {col: (f["psi"], f.get("unseen_rate")) for col, f in self.report()["features"].items()}
@@ -0,0 +1,70 @@
+# Flatten the trained pipeline into a NumPy bundle for compiled_model.CompiledForest
+# Usage:
+#   python export_compiled.py --model artifacts_sklearn171/best_model_RandomForest.joblib
+import argparse
+import re
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from compiled_model import CompiledForest, compile_pipeline, save_compiled
+from who_growth import FEATURES as WHO_FEATURES, add_features, find_columns
+
+
+def align_columns(df: pd.DataFrame, cols) -> pd.DataFrame:
+    """Rename columns of `df` to the pipeline's names, ignoring whitespace/underscore differences."""
+    def key(c):
+        return re.sub(r"[\s_]+", "_", str(c).strip())
+
+    by_key = {key(c): c for c in df.columns}
+    rename = {by_key[key(c)]: c for c in cols if c not in df.columns and key(c) in by_key}
+    return df.rename(columns=rename)
+
+
+def check_parity(pipeline, compiled, csv_path, atol=1e-9):
+    """Compare CompiledForest with Pipeline.predict_proba on a CSV; raises on mismatch."""
+    df = align_columns(pd.read_csv(csv_path), compiled.feature_cols)
+    # WHO z-score features (train.py --who_features) are derived, not part of the CSV
+    derived = [c for c in compiled.feature_cols if c in WHO_FEATURES and c not in df.columns]
+    if derived:
+        add_features(df, derived, find_columns(list(df.columns)))
+    X = df[compiled.feature_cols]
+
+    t0 = time.perf_counter()
+    expected = pipeline.predict_proba(X)
+    t1 = time.perf_counter()
+    actual = compiled.predict_proba(X)
+    t2 = time.perf_counter()
+
+    max_diff = float(np.abs(expected - actual).max()) if len(X) else 0.0
+    same_class = np.array_equal(pipeline.predict(X), compiled.predict(X))
+    print(f"Parity on {csv_path} ({len(X)} rows): max |diff| = {max_diff:.3g}, "
+          f"classes equal = {same_class}")
+    print(f"  sklearn pipeline: {(t1 - t0) * 1000:.1f} ms, compiled: {(t2 - t1) * 1000:.1f} ms")
+    if max_diff > atol or not same_class:
+        raise AssertionError(f"Compiled model does not match pipeline on {csv_path}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--model", default="artifacts_sklearn171/best_model_RandomForest.joblib")
+    ap.add_argument("--output", default="artifacts_sklearn171/compiled_model.npz")
+    ap.add_argument("--check_csv", default="sample_input.csv",
+                    help="CSV used for the parity check against the pipeline ('' to skip)")
+    args = ap.parse_args()
+
+    pipeline = joblib.load(args.model)
+    meta, arrays = compile_pipeline(pipeline)
+    save_compiled(args.output, meta, arrays)
+    n_nodes = len(arrays["node_feature"])
+    print(f"Saved compiled model ({meta['n_trees']} trees, {n_nodes} nodes, "
+          f"max depth {meta['max_depth']}) to: {args.output}")
+
+    if args.check_csv:
+        check_parity(pipeline, CompiledForest.load(args.output), args.check_csv)
+
+
+if __name__ == "__main__":
+    main()
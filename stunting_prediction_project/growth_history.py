@@ -0,0 +1,279 @@
+"""Longitudinal growth history: an SQLite store of measurements per child and
+vectorised trajectory scoring.
+
+Every measurement is one row keyed by (child_id, measured_on). The table is
+clustered on that key (``WITHOUT ROWID``), so a child's visits are one index
+range scan however large the history grows, and a secondary index on
+(village_id, child_id) finds every child of a village. Writes go in bulk, one
+transaction per call; WAL mode lets API workers read while one of them writes.
+
+``score_trajectories`` works on the visits of many children at once, sorted
+by child and date, and their height-for-age z-scores (``who_growth``): the
+HAZ trend per month, height and weight velocity between the last two visits
+and a risk category, all computed with group-wise NumPy reductions
+(``np.add.reduceat``) instead of a loop over children.
+
+Dates are stored as days since 1970-01-01; sex codes follow api_model
+(1 = Laki-laki, 0 = Perempuan, -1 = unknown).
+"""
+import argparse
+import os
+import sqlite3
+import threading
+
+import numpy as np
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS measurements (
+    child_id TEXT NOT NULL,
+    measured_on INTEGER NOT NULL,
+    village_id TEXT,
+    sex INTEGER NOT NULL,
+    age_months REAL NOT NULL,
+    height_cm REAL NOT NULL,
+    weight_kg REAL NOT NULL,
+    prob_stunting REAL,
+    PRIMARY KEY (child_id, measured_on)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS measurements_village ON measurements (village_id, child_id);
+"""
+# As in who_growth
+DAYS_PER_MONTH = 30.4375
+COLUMNS = ("child_id", "measured_on", "village_id", "sex", "age_months", "height_cm", "weight_kg",
+           "prob_stunting")
+# Bound parameters per query when looking up many children (SQLite allows 32766)
+MAX_PARAMS = 900
+
+# Trajectory risk categories (codes index into this tuple; -1 = no valid HAZ)
+RISK_CATEGORIES = ("Normal", "Berisiko", "Stunting")
+STUNTED_HAZ = -2.0
+# Growth faltering: HAZ falling at least this fast (SD per month, i.e. 0.6 per year) ...
+FALTERING_HAZ_PER_MONTH = -0.05
+# ... or the current trend crossing STUNTED_HAZ within this many months
+PROJECTION_MONTHS = 6
+
+
+def to_days(dates):
+    """Days since 1970-01-01 for ISO dates ('2025-07-14'), datetime64 values or day numbers."""
+    arr = np.asarray(dates)
+    if arr.dtype.kind in "iu":
+        return arr.astype(np.int64)
+    return arr.astype("datetime64[D]").astype(np.int64)
+
+
+def to_dates(days):
+    """ISO date strings for day numbers."""
+    return np.asarray(days, dtype=np.int64).astype("datetime64[D]").astype(str)
+
+
+def today():
+    return int(np.datetime64("today", "D").astype(np.int64))
+
+
+class GrowthHistory:
+    """Measurement store in the SQLite file `path` (created on first use).
+
+    One connection per instance, shared by the threads of a process under a
+    lock; separate processes open their own instance of the same file.
+    """
+
+    def __init__(self, path, timeout=30.0):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def add(self, child_ids, measured_on, sex, age_months, height_cm, weight_kg, village_ids=None,
+            prob_stunting=None):
+        """Insert measurements given as columns (one transaction); returns the count.
+
+        `sex` holds codes (1/0/-1, see ``who_growth.sex_codes``); `prob_stunting`
+        is the model's probability when the caller scored the visit. A second
+        measurement of a child on the same day replaces the first.
+        """
+        n = len(child_ids)
+        if not n:
+            return 0
+        probs = [None] * n
+        if prob_stunting is not None:
+            probs = [None if p != p else p for p in np.asarray(prob_stunting, dtype=np.float64).tolist()]
+        rows = zip(
+            [str(c) for c in child_ids],
+            to_days(measured_on).tolist(),
+            [None if v is None else str(v) for v in village_ids] if village_ids is not None else [None] * n,
+            np.asarray(sex, dtype=np.int64).tolist(),
+            np.asarray(age_months, dtype=np.float64).tolist(),
+            np.asarray(height_cm, dtype=np.float64).tolist(),
+            np.asarray(weight_kg, dtype=np.float64).tolist(),
+            probs,
+        )
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO measurements ({', '.join(COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(COLUMNS))})", rows)
+        return n
+
+    def _select(self, where, params):
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM measurements WHERE {where} "
+                f"ORDER BY child_id, measured_on", params).fetchall()
+        return rows
+
+    def children(self, child_ids):
+        """Visits of `child_ids` as columns sorted by child and date (see `visits_from_rows`)."""
+        ids = sorted({str(c) for c in child_ids})
+        rows = []
+        for start in range(0, len(ids), MAX_PARAMS):
+            chunk = ids[start:start + MAX_PARAMS]
+            rows += self._select(f"child_id IN ({', '.join('?' * len(chunk))})", chunk)
+        return visits_from_rows(rows)
+
+    def village(self, village_id):
+        """Full visit history of every child measured at least once in `village_id`."""
+        rows = self._select(
+            "child_id IN (SELECT DISTINCT child_id FROM measurements WHERE village_id = ?)", (str(village_id),))
+        return visits_from_rows(rows)
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM measurements").fetchone()[0]
+
+
+def visits_from_rows(rows):
+    """{column: array} from query rows (already sorted by child_id, measured_on)."""
+    cols = list(zip(*rows)) if rows else [()] * len(COLUMNS)
+    return {
+        "child_id": np.array(cols[0], dtype=object),
+        "measured_on": np.array(cols[1], dtype=np.int64),
+        "village_id": np.array(cols[2], dtype=object),
+        "sex": np.array(cols[3], dtype=np.int8),
+        "age_months": np.array(cols[4], dtype=np.float64),
+        "height_cm": np.array(cols[5], dtype=np.float64),
+        "weight_kg": np.array(cols[6], dtype=np.float64),
+        # NaN where the visit was stored without a model probability
+        "prob_stunting": np.array(cols[7], dtype=np.float64),
+    }
+
+
+def score_trajectories(visits, haz, prob_stunting=None):
+    """Per-child growth trajectory for `visits` sorted by child and date.
+
+    `haz` holds the height-for-age z-score of every visit (NaN where it is not
+    defined, e.g. after 60 months). `prob_stunting` (optional, one per visit)
+    is the model's probability for each visit; the latest one and its change
+    since the previous visit are reported with the trajectory.
+
+    Returns {column: array} with one entry per child: visit count, first/last
+    date, latest age, height, weight and HAZ, the HAZ trend (least-squares
+    slope on age, SD per month, from visits with a valid HAZ), height/weight
+    velocity over the last interval (per month), the HAZ projected
+    PROJECTION_MONTHS ahead and the risk code (RISK_CATEGORIES: Stunting when
+    the latest HAZ < -2, Berisiko when HAZ falls by FALTERING_HAZ_PER_MONTH or
+    more or is projected below -2).
+    """
+    child = visits["child_id"]
+    n = len(child)
+    if not n:
+        return {"child_id": child, "visits": np.zeros(0, dtype=np.int64), "risk": np.zeros(0, dtype=np.int8)}
+    age = visits["age_months"]
+    haz = np.asarray(haz, dtype=np.float64)
+
+    new_child = np.ones(n, dtype=bool)
+    new_child[1:] = child[1:] != child[:-1]
+    start = np.flatnonzero(new_child)
+    last = np.r_[start[1:], n] - 1
+    count = last - start + 1
+    prev = np.where(count > 1, last - 1, last)
+
+    # Least-squares slope of HAZ on age per child from group sums
+    ok = ~np.isnan(haz)
+    w = ok.astype(np.float64)
+    t = np.where(ok, age, 0.0)
+    z = np.where(ok, haz, 0.0)
+    sums = np.add.reduceat(np.stack([w, t, z, t * t, t * z]), start, axis=1)
+    n_ok, s_t, s_z, s_tt, s_tz = sums
+    denom = n_ok * s_tt - s_t * s_t
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = np.where((n_ok >= 2) & (denom > 1e-9), (n_ok * s_tz - s_t * s_z) / denom, np.nan)
+        months = (visits["measured_on"][last] - visits["measured_on"][prev]) / DAYS_PER_MONTH
+        months = np.where(count > 1, months, np.nan)
+        height_velocity = (visits["height_cm"][last] - visits["height_cm"][prev]) / months
+        weight_velocity = (visits["weight_kg"][last] - visits["weight_kg"][prev]) / months
+
+    last_haz = haz[last]
+    projected = last_haz + np.where(np.isnan(slope), 0.0, slope) * PROJECTION_MONTHS
+    risk = np.where(last_haz < STUNTED_HAZ, 2,
+                    np.where((slope <= FALTERING_HAZ_PER_MONTH) | (projected < STUNTED_HAZ), 1, 0)).astype(np.int8)
+    risk[np.isnan(last_haz)] = -1
+
+    out = {
+        "child_id": child[start],
+        "visits": count,
+        "first_date": to_dates(visits["measured_on"][start]),
+        "last_date": to_dates(visits["measured_on"][last]),
+        "age_months": age[last],
+        "height_cm": visits["height_cm"][last],
+        "weight_kg": visits["weight_kg"][last],
+        "haz": last_haz,
+        "haz_per_month": slope,
+        "height_velocity_cm_per_month": height_velocity,
+        "weight_velocity_kg_per_month": weight_velocity,
+        "projected_haz": projected,
+        "risk": risk,
+    }
+    if prob_stunting is not None:
+        prob_stunting = np.asarray(prob_stunting, dtype=np.float64)
+        out["prob_stunting"] = prob_stunting[last]
+        out["prob_stunting_change"] = np.where(count > 1, prob_stunting[last] - prob_stunting[prev], np.nan)
+    return out
+
+
+def risk_labels(codes):
+    """RISK_CATEGORIES label per risk code ('' where unknown)."""
+    return np.array(RISK_CATEGORIES + ("",))[np.asarray(codes)]
+
+
+def trajectory_frame(visits):
+    """Trajectories of stored `visits` as a DataFrame with risk labels, scored
+    with the probabilities stored alongside the visits."""
+    import pandas as pd
+    from who_growth import load
+
+    haz = load().height_for_age(visits["sex"], visits["age_months"], visits["height_cm"])
+    scores = score_trajectories(visits, haz, visits["prob_stunting"])
+    df = pd.DataFrame(scores)
+    df["risk"] = risk_labels(scores["risk"])
+    return df
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Score growth trajectories from a growth-history database")
+    ap.add_argument("--db", required=True, help="SQLite file written by api_model.py or infer.py --history")
+    ap.add_argument("--village", default=None, help="Score every child of this village")
+    ap.add_argument("--child", nargs="*", default=[], help="Score these child IDs")
+    ap.add_argument("--output", default="trajectories.csv",
+                    help="Output file; .parquet/.arrow extensions write columnar output")
+    args = ap.parse_args()
+    if not os.path.exists(args.db):
+        raise FileNotFoundError(f"History database not found: {args.db}")
+
+    from data_io import TableWriter
+
+    store = GrowthHistory(args.db)
+    visits = store.village(args.village) if args.village else store.children(args.child)
+    df = trajectory_frame(visits)
+    with TableWriter(args.output) as writer:
+        writer.write(df)
+    print(f"Saved trajectories of {len(df)} children ({len(visits['child_id'])} visits) to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
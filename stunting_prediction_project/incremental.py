@@ -0,0 +1,183 @@
+"""Training state and forest updates for incremental retraining (train.py --update).
+
+A full ``train.py`` run writes ``training_state.json`` next to the model: the
+class balance and per-feature statistics of every row the model has learned
+from (count, mean, variance and range of numeric columns, category counts),
+plus which data slice each block of trees was grown on. The statistics merge
+exactly, so the state stays the same size however many slices are folded in.
+
+``train.py --update`` then refreshes a RandomForest from a new slice only:
+the stored preprocessing is reused as is (the existing trees split on its
+output), new trees are grown on the slice with ``warm_start`` and the oldest
+trees are pruned to bound the forest size. The cost depends on the size of the
+slice and of the forest, not on the archive the model was first trained on.
+"""
+import json
+import math
+import os
+import time
+
+import numpy as np
+
+STATE_FILE = "training_state.json"
+FORMAT_VERSION = 1
+
+
+def column_stats(X, y, num_cols, cat_cols):
+    """Mergeable statistics of a DataFrame slice: rows, classes, numeric moments, category counts."""
+    numeric = {}
+    for c in num_cols:
+        s = X[c].dropna().astype(np.float64)
+        n = int(len(s))
+        mean = float(s.mean()) if n else 0.0
+        numeric[c] = {
+            "n": n,
+            "mean": mean,
+            "m2": float(((s - mean) ** 2).sum()),
+            "min": float(s.min()) if n else None,
+            "max": float(s.max()) if n else None,
+        }
+    categorical = {
+        c: {str(k): int(v) for k, v in X[c].value_counts(dropna=True).items() if v}
+        for c in cat_cols
+    }
+    values, counts = np.unique(np.asarray(y), return_counts=True)
+    classes = {str(k): int(v) for k, v in zip(values.tolist(), counts.tolist())}
+    return {"rows": int(len(X)), "classes": classes, "numeric": numeric, "categorical": categorical}
+
+
+def _merge_moments(a, b):
+    # Chan et al. parallel update of count, mean and sum of squared deviations
+    n = a["n"] + b["n"]
+    if not b["n"]:
+        return dict(a)
+    if not a["n"]:
+        return dict(b)
+    delta = b["mean"] - a["mean"]
+    return {
+        "n": n,
+        "mean": a["mean"] + delta * b["n"] / n,
+        "m2": a["m2"] + b["m2"] + delta * delta * a["n"] * b["n"] / n,
+        "min": min(a["min"], b["min"]),
+        "max": max(a["max"], b["max"]),
+    }
+
+
+def _add_counts(a, b):
+    out = dict(a)
+    for k, v in b.items():
+        out[k] = out.get(k, 0) + v
+    return out
+
+
+def merge_stats(a, b):
+    """Statistics of the union of two slices."""
+    return {
+        "rows": a["rows"] + b["rows"],
+        "classes": _add_counts(a["classes"], b["classes"]),
+        "numeric": {c: _merge_moments(a["numeric"][c], s) if c in a["numeric"] else dict(s)
+                    for c, s in b["numeric"].items()},
+        "categorical": {c: _add_counts(a["categorical"].get(c, {}), s)
+                        for c, s in b["categorical"].items()},
+    }
+
+
+def shift(state_stats, new_stats):
+    """How far a new slice is from everything seen so far.
+
+    Numeric columns: difference of means in standard deviations of the
+    accumulated data. Categorical columns: total variation distance between
+    the category distributions (0 = identical, 1 = disjoint).
+    """
+    out = {}
+    for c, new in new_stats["numeric"].items():
+        old = state_stats["numeric"].get(c)
+        if not old or old["n"] < 2 or not new["n"]:
+            continue
+        std = math.sqrt(old["m2"] / (old["n"] - 1))
+        out[c] = round((new["mean"] - old["mean"]) / std, 4) if std > 0 else None
+    for c, new in new_stats["categorical"].items():
+        old = state_stats["categorical"].get(c)
+        if not old or not new:
+            continue
+        n_old, n_new = sum(old.values()), sum(new.values())
+        keys = set(old) | set(new)
+        out[c] = round(0.5 * sum(abs(old.get(k, 0) / n_old - new.get(k, 0) / n_new) for k in keys), 4)
+    return out
+
+
+def initial_state(stats, n_trees, slice_name):
+    """State of a model trained from scratch on one slice."""
+    entry = {"slice": slice_name, "rows": stats["rows"], "added": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    return {
+        "format_version": FORMAT_VERSION,
+        "stats": stats,
+        "slices": [entry],
+        # Run-length tags in estimators_ order: which slice grew each block of trees
+        "trees": [{"slice": slice_name, "trees": n_trees}] if n_trees else [],
+    }
+
+
+def state_from_metadata(metadata, n_trees):
+    """Starting state for a model trained before training_state.json existed (no statistics)."""
+    empty = {"rows": 0, "classes": {}, "numeric": {}, "categorical": {}}
+    return initial_state(empty, n_trees, metadata.get("csv_path") or "base")
+
+
+def load_state(model_dir):
+    path = os.path.join(model_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        state = json.load(f)
+    if state.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported training state format: {state.get('format_version')}")
+    return state
+
+
+def save_state(model_dir, state):
+    with open(os.path.join(model_dir, STATE_FILE), "w") as f:
+        json.dump(state, f, indent=2)
+
+
+def add_trees(forest, Xt, y, n_new, fit=None):
+    """Grow `n_new` more trees of a fitted RandomForest on (Xt, y) with warm_start.
+
+    `Xt` is the preprocessed float32 matrix. Returns the fit time in seconds.
+    """
+    classes = np.unique(y)
+    if not np.array_equal(classes, forest.classes_):
+        # warm_start refits classes_ from y; a slice without every class would corrupt it
+        raise ValueError(f"The new slice has classes {classes.tolist()}, the model "
+                         f"{forest.classes_.tolist()}; every class is needed to add trees")
+    fit = fit or (lambda est, X, y: est.fit(X, y))
+    forest.set_params(warm_start=True, n_estimators=len(forest.estimators_) + n_new)
+    t0 = time.perf_counter()
+    fit(forest, Xt, y)
+    forest.set_params(warm_start=False)
+    return round(time.perf_counter() - t0, 3)
+
+
+def prune_oldest(forest, max_trees):
+    """Drop the oldest trees so at most `max_trees` remain; returns how many were dropped."""
+    n_drop = max(0, len(forest.estimators_) - max_trees)
+    if n_drop:
+        forest.estimators_ = forest.estimators_[n_drop:]
+        forest.n_estimators = len(forest.estimators_)
+    return n_drop
+
+
+def record_update(state, stats, slice_name, n_new, n_pruned):
+    """Fold a slice into the state: merged statistics, slice log and tree tags."""
+    state["stats"] = merge_stats(state["stats"], stats)
+    state["slices"].append({"slice": slice_name, "rows": stats["rows"],
+                            "added": time.strftime("%Y-%m-%dT%H:%M:%S")})
+    trees = state["trees"]
+    while n_pruned and trees:
+        take = min(n_pruned, trees[0]["trees"])
+        trees[0]["trees"] -= take
+        n_pruned -= take
+        if not trees[0]["trees"]:
+            trees.pop(0)
+    trees.append({"slice": slice_name, "trees": n_new})
+    return state
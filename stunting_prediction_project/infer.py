@@ -1,69 +1,370 @@
 import argparse
 import json
 import os
-import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
-import joblib
+import numpy as np
 import pandas as pd
 
+from compiled_model import resolve_engine
+from data_io import TableWriter, clean_name, iter_table, read_column_names, read_table, resolve_columns
+from who_growth import HFA_CATEGORIES, add_features, classify_height_for_age, feature_names, find_columns, sex_codes
+
 
 def clean_column_names(df: pd.DataFrame) -> pd.DataFrame:
     """Samakan pembersihan nama kolom dengan proses training/notebook."""
     df = df.copy()
-    df.columns = [re.sub(r"\s+", "_", str(c).strip()) for c in df.columns]
+    df.columns = [clean_name(c) for c in df.columns]
     df = df.loc[:, ~df.columns.duplicated(keep="first")]
     return df
 
 
+def select_features(df_raw: pd.DataFrame, feature_cols) -> pd.DataFrame:
+    """Ambil kolom fitur dari input mentah tanpa menyalin seluruh DataFrame.
+
+    Nama kolom dicocokkan setelah pembersihan yang sama dengan
+    `clean_column_names` (duplikat: kolom pertama dipakai), lalu diberi nama
+    persis seperti di metadata agar cocok dengan pipeline.
+    """
+    position = {}
+    for i, c in enumerate(df_raw.columns):
+        position.setdefault(clean_name(c), i)
+
+    # Validasi kolom
+    missing = [c for c in feature_cols if clean_name(c) not in position]
+    if missing:
+        raise ValueError(
+            "Input CSV is missing required feature columns: " + ", ".join(missing)
+        )
+
+    X = df_raw.iloc[:, [position[clean_name(c)] for c in feature_cols]]
+    X.columns = list(feature_cols)
+    return X
+
+
+def model_features(df_raw: pd.DataFrame, feature_cols, who_features=None) -> pd.DataFrame:
+    """`select_features` ditambah kolom z-score WHO untuk model yang dilatih dengan
+    --who_features: kolom ini dihitung dari usia/jenis kelamin/tinggi/berat, tidak dibaca."""
+    if not who_features:
+        return select_features(df_raw, feature_cols)
+    derived = who_features["features"]
+    X = select_features(df_raw, [c for c in feature_cols if c not in derived]).copy()
+    return add_features(X, derived, who_features["columns"])
+
+
+def add_who_zscores(df: pd.DataFrame) -> pd.DataFrame:
+    """Tambahkan z-score WHO (hfa_z, wfa_z, ...) dan kategori hfa_status ke output."""
+    add_features(df, feature_names(), find_columns(list(df.columns)))
+    # Kode -1 (z tidak terdefinisi, mis. usia > 60 bulan) menjadi string kosong
+    df["hfa_status"] = np.array(HFA_CATEGORIES + ("",))[classify_height_for_age(df["hfa_z"])]
+    return df
+
+
+def record_history(store, df_raw: pd.DataFrame, roles, id_col, date_col=None, village_col=None, y_proba=None):
+    """Simpan pengukuran satu chunk ke riwayat pertumbuhan (satu transaksi); baris tanpa ID dilewati.
+
+    `roles` memetakan age/sex/height/weight ke nama kolom fitur (metadata);
+    tanpa `date_col` semua pengukuran bertanggal hari ini.
+    """
+    from growth_history import today
+
+    X = select_features(df_raw, [roles["age"], roles["sex"], roles["height"], roles["weight"]])
+    ids = df_raw[id_col]
+    keep = ids.notna().to_numpy()
+    if date_col:
+        days = pd.to_datetime(df_raw[date_col]).to_numpy().astype("datetime64[D]").astype(np.int64)
+        keep = keep & df_raw[date_col].notna().to_numpy()
+    else:
+        days = np.full(len(df_raw), today(), dtype=np.int64)
+    villages = df_raw[village_col].to_numpy(dtype=object)[keep] if village_col else None
+    if village_col:
+        villages = [None if pd.isna(v) else v for v in villages]
+    return store.add(
+        ids.to_numpy(dtype=object)[keep], days[keep], sex_codes(X[roles["sex"]].to_numpy())[keep],
+        X[roles["age"]].to_numpy(np.float64)[keep], X[roles["height"]].to_numpy(np.float64)[keep],
+        X[roles["weight"]].to_numpy(np.float64)[keep], villages,
+        None if y_proba is None else np.asarray(y_proba, dtype=np.float64)[keep])
+
+
+def predict_rows(model, X: pd.DataFrame, table=None, table_mode="nearest"):
+    """Kembalikan (y_pred, y_proba) untuk X; y_proba None bila model tidak punya predict_proba."""
+    y_pred = np.empty(len(X), dtype=object)
+    y_proba = np.full(len(X), np.nan)
+    todo = np.ones(len(X), dtype=bool)
+    if table is not None:
+        cols = table.params["columns"]
+        proba, in_grid = table.lookup(
+            X[cols["age"]], table.sex_codes(X[cols["sex"]]),
+            X[cols["height"]], X[cols["weight"]],
+            interpolate=table_mode == "interpolate",
+        )
+        # Tabel dibangun untuk satu nilai Wasting; baris dengan nilai lain memakai model
+        in_grid &= (X[cols["wasting"]] == table.params["wasting"]).to_numpy()
+        y_proba[in_grid] = proba[in_grid]
+        y_pred[in_grid] = np.where(proba[in_grid] > 0.5, table.classes[1], table.classes[0])
+        todo = ~in_grid
+
+    if todo.any():
+        X_todo = X[todo] if not todo.all() else X
+        if hasattr(model, "predict_proba"):
+            # Satu kali evaluasi model: kelas = argmax probabilitas (sama dengan predict)
+            proba = model.predict_proba(X_todo)
+            y_pred[todo] = model.classes_[proba.argmax(axis=1)]
+            y_proba[todo] = proba[:, 1]
+        else:
+            y_pred[todo] = model.predict(X_todo)
+            y_proba = None
+    # Kembali ke dtype biasa (int/str) agar konsisten di CSV/Parquet
+    return np.array(y_pred.tolist()), y_proba
+
+
+def explain_rows(explainer, X: pd.DataFrame):
+    """Kembalikan (y_pred, y_proba, contributions) untuk X dari jalur keputusan CompiledForest.
+
+    contributions[i, j]: seberapa jauh split pada feature_cols[j] menggeser
+    probabilitas stunting baris i dari explainer.baseline[1]; baseline ditambah
+    jumlah satu baris sama dengan y_proba-nya. Probabilitas berasal dari
+    penelusuran pohon yang sama, jadi tidak ada evaluasi predict terpisah.
+    """
+    contributions = explainer.contributions(explainer.transform(explainer.encode(X)))
+    proba = explainer.baseline + contributions.sum(axis=1)
+    # Dibulatkan agar nilai yang persis seri memilih kelas pertama, seperti predict
+    y_pred = explainer.classes_[np.round(proba, 12).argmax(axis=1)]
+    return y_pred, proba[:, 1], contributions[:, :, 1]
+
+
+def score_rows(model, X: pd.DataFrame, table=None, table_mode="nearest", explainer=None):
+    """(y_pred, y_proba, contributions): `explain_rows` bila ada explainer, selain itu
+    `predict_rows` tanpa kontribusi (None)."""
+    if explainer is not None:
+        return explain_rows(explainer, X)
+    return (*predict_rows(model, X, table, table_mode), None)
+
+
+def load_model(engine, path, mmap=False):
+    """Muat Pipeline sklearn (joblib) atau bundle NumPy hasil kompilasi."""
+    if engine == "compiled":
+        from compiled_model import CompiledForest
+        return CompiledForest.load(path)
+    # joblib (dan sklearn) hanya diimpor bila Pipeline yang dipakai
+    import joblib
+    # mmap_mode membagi array numpy di file joblib antar proses (tanpa salinan)
+    return joblib.load(path, mmap_mode="r" if mmap else None)
+
+
+# State per proses worker, diisi sekali oleh _init_worker
+_worker = {}
+
+
+def _init_worker(engine, model_path, table_path, table_model_path, table_mode, explain=False):
+    model = load_model(engine, model_path, mmap=True)
+    # Paralelisme sudah di level proses; hindari oversubscription oleh n_jobs=-1
+    for _, step in getattr(model, "steps", []):
+        if hasattr(step, "n_jobs"):
+            step.n_jobs = 1
+    table = None
+    if table_path:
+        from lookup_table import RiskTable
+        table = RiskTable.load(table_path, model_path=table_model_path)
+    explainer = None
+    if explain:
+        from compiled_model import forest_explainer
+        explainer = forest_explainer(model)
+    _worker.update(model=model, table=table, table_mode=table_mode, explainer=explainer)
+
+
+def _worker_predict(X):
+    return score_rows(_worker["model"], X, _worker["table"], _worker["table_mode"], _worker["explainer"])
+
+
+def predict_parallel(chunks, feature_cols, workers, initargs, who_features=None):
+    """Skor chunk di process pool; menghasilkan (df_raw, y_pred, y_proba, contributions) sesuai urutan input.
+
+    Hanya kolom fitur yang dikirim ke worker, dan paling banyak 2 x workers
+    chunk diproses sekaligus agar pemakaian memori tetap terbatas.
+    """
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=initargs) as pool:
+        pending = deque()
+        for df_raw in chunks:
+            X = model_features(df_raw, feature_cols, who_features)
+            pending.append((df_raw, pool.submit(_worker_predict, X)))
+            if len(pending) >= 2 * workers:
+                df_done, future = pending.popleft()
+                yield (df_done, *future.result())
+        while pending:
+            df_done, future = pending.popleft()
+            yield (df_done, *future.result())
+
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--model", default="artifacts_sklearn171/best_model_RandomForest.joblib")
     parser.add_argument("--metadata", default="artifacts_sklearn171/metadata.json")
-    parser.add_argument("--input_csv", required=True)
-    parser.add_argument("--output_csv", default="predictions.csv")
+    parser.add_argument("--input_csv", "--input", dest="input_csv", required=True,
+                        help="CSV, Parquet (.parquet) or Arrow IPC (.arrow/.feather) input")
+    parser.add_argument("--output_csv", "--output", dest="output_csv", default="predictions.csv",
+                        help="Output file; .parquet/.arrow extensions write columnar output")
+    parser.add_argument("--engine", choices=["auto", "sklearn", "compiled"], default="sklearn",
+                        help="sklearn (default): joblib Pipeline, fastest for bulk scoring; compiled: NumPy "
+                             "bundle from train.py/export_compiled.py, faster to start but about 3x slower "
+                             "from ~1000 rows on, so only for small inputs; auto: the bundle if it is not "
+                             "older than --model, else the Pipeline")
+    parser.add_argument("--compiled_model", default="artifacts_sklearn171/compiled_model.npz")
+    parser.add_argument("--risk_table", default=None,
+                        help="Precomputed risk table from build_lookup.py; off-grid rows use the model")
+    parser.add_argument("--table_mode", choices=["nearest", "interpolate"], default="nearest")
+    parser.add_argument("--keep", nargs="+", default=None, metavar="COL",
+                        help="Read and write only these input columns (e.g. IDs) besides the features, "
+                             "target and --history columns, for every input format (default: all columns)")
+    parser.add_argument("--chunksize", type=int, default=None,
+                        help="Stream the input in chunks of this many rows (bounded memory)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Score chunks in N processes (0 = all CPU cores)")
+    parser.add_argument("--who_zscores", action="store_true",
+                        help="Also write WHO growth-standard z-scores (hfa_z, wfa_z, ...) and hfa_status")
+    parser.add_argument("--explain", action="store_true",
+                        help="Also write per-feature contributions to prob_stunting (contrib_<feature>) "
+                             "from the RandomForest's decision paths, and their baseline")
+    parser.add_argument("--history", default=None,
+                        help="Also store every scored measurement in this growth-history SQLite file "
+                             "(see growth_history.py)")
+    parser.add_argument("--id_col", default=None, help="Child ID column (required with --history)")
+    parser.add_argument("--date_col", default=None,
+                        help="Measurement date column for --history (default: today)")
+    parser.add_argument("--village_col", default=None, help="Village column for --history")
+    parser.add_argument("--trajectory_output", default=None,
+                        help="With --history: write the growth trajectory of every child in the input "
+                             "(full stored history) to this file")
     args = parser.parse_args()
+    if args.explain and args.risk_table:
+        parser.error("--explain scores every row with the model; it cannot be combined with --risk_table")
+    if args.history and not args.id_col:
+        parser.error("--history needs --id_col")
+    if args.trajectory_output and not args.history:
+        parser.error("--trajectory_output needs --history")
 
-    if not os.path.exists(args.model):
-        raise FileNotFoundError(f"Model file not found: {args.model}")
+    engine = resolve_engine(args.engine, args.compiled_model, args.model)
+    model_path = args.compiled_model if engine == "compiled" else args.model
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(f"Model file not found: {model_path}")
     if not os.path.exists(args.metadata):
         raise FileNotFoundError(f"Metadata file not found: {args.metadata}")
 
-    # Load model dan metadata
-    model = joblib.load(args.model)
+    workers = args.workers or os.cpu_count() or 1
+
+    # Load model dan metadata (mode paralel: model dimuat oleh tiap worker)
+    model = load_model(engine, model_path) if workers == 1 else None
+    explainer = None
+    if args.explain:
+        from compiled_model import forest_explainer
+        # Pipeline sklearn dikompilasi ke array (juga memeriksa bahwa modelnya RandomForest)
+        explainer = forest_explainer(model if model is not None else load_model(engine, model_path))
     with open(args.metadata, "r") as f:
         meta = json.load(f)
 
     numeric_cols = meta.get("numeric_cols", [])
     categorical_cols = meta.get("categorical_cols", [])
     feature_cols = list(numeric_cols) + list(categorical_cols)
+    # Model yang dilatih dengan --who_features: z-score dihitung, bukan dibaca dari input
+    who_features = meta.get("who_features")
+    input_cols = [c for c in feature_cols if not who_features or c not in who_features["features"]]
 
-    # Load data input
-    df_raw = pd.read_csv(args.input_csv)
-    df = clean_column_names(df_raw)
+    store = roles = None
+    history_cols = []
+    if args.history:
+        from growth_history import GrowthHistory
+        roles = find_columns(input_cols)
+        store = GrowthHistory(args.history)
+        history_cols = [c for c in (args.id_col, args.date_col, args.village_col) if c]
 
-    # Validasi kolom
-    missing = [c for c in feature_cols if c not in df.columns]
-    if missing:
-        raise ValueError(
-            "Input CSV is missing required feature columns: " + ", ".join(missing)
+    table = None
+    if args.risk_table and workers == 1:
+        from lookup_table import RiskTable
+        table = RiskTable.load(args.risk_table, model_path=args.model)
+
+    t0 = time.perf_counter()
+
+    # Default: semua kolom input ikut ke output (ID, nama, ...) untuk semua format.
+    # --keep: hanya kolom fitur + --keep (+ riwayat, + target jika ada); Parquet/Arrow
+    # lewat column projection, CSV lewat usecols
+    columns = None
+    if args.keep:
+        target = [meta["target_col"]] if meta.get("target_col") else []
+        wanted = list(dict.fromkeys(input_cols + history_cols + list(args.keep)))
+        columns = resolve_columns(args.input_csv, wanted, optional=target)
+        # Urutan kolom file (seperti usecols CSV), agar output sama untuk setiap format
+        order = {c: i for i, c in enumerate(read_column_names(args.input_csv))}
+        columns.sort(key=lambda c: order.get(c, len(order)))
+
+    # Load data input: sekaligus, atau per chunk dengan --chunksize
+    if args.chunksize:
+        chunks = iter_table(args.input_csv, args.chunksize, columns)
+    elif workers > 1:
+        # Tanpa --chunksize, bagi input menjadi satu bagian per worker
+        df_all = read_table(args.input_csv, columns)
+        step = max(1, -(-len(df_all) // workers))
+        chunks = [df_all.iloc[i:i + step].copy() for i in range(0, len(df_all), step)] or [df_all]
+        del df_all
+    else:
+        chunks = [read_table(args.input_csv, columns)]
+
+    if workers > 1:
+        initargs = (engine, model_path, args.risk_table, args.model, args.table_mode, args.explain)
+        scored = predict_parallel(chunks, feature_cols, workers, initargs, who_features)
+    else:
+        scored = (
+            (df_raw, *score_rows(model, model_features(df_raw, feature_cols, who_features),
+                                 table, args.table_mode, explainer))
+            for df_raw in chunks
         )
 
-    X = df[feature_cols].copy()
+    n_rows = n_history = 0
+    child_ids = set()
+    with TableWriter(args.output_csv) as writer:
+        for df_raw, y_pred, y_proba, contributions in scored:
+            # Kolom prediksi ditambahkan langsung ke chunk input (tidak disalin)
+            df_raw["pred_stunting"] = y_pred
+            if y_proba is not None:
+                df_raw["prob_stunting"] = y_proba
+            if contributions is not None:
+                # prob_stunting = explain_baseline + jumlah semua contrib_*
+                df_raw["explain_baseline"] = explainer.baseline[1]
+                for j, col in enumerate(explainer.feature_cols):
+                    df_raw[f"contrib_{col}"] = contributions[:, j]
+            if args.who_zscores:
+                add_who_zscores(df_raw)
+            if store is not None:
+                n_history += record_history(store, df_raw, roles, args.id_col, args.date_col,
+                                            args.village_col, y_proba)
+                if args.trajectory_output:
+                    child_ids.update(df_raw[args.id_col].dropna().astype(str))
+
+            # Header/schema hanya ditulis sekali; chunk berikutnya di-append
+            writer.write(df_raw)
+            n_rows += len(df_raw)
+
+    elapsed = time.perf_counter() - t0
+    print(f"Saved predictions for {n_rows} rows to: {args.output_csv}")
+    print(f"Throughput: {n_rows / elapsed if elapsed > 0 else 0:.0f} rows/s "
+          f"({elapsed:.2f}s, {workers} worker{'s' if workers > 1 else ''}, {engine} engine)")
+    if store is not None:
+        print(f"Stored {n_history} measurements in: {args.history} ({store.count()} in total)")
+        if args.trajectory_output:
+            write_trajectories(store, child_ids, args.trajectory_output)
+        store.close()
 
-    # Prediksi
-    y_pred = model.predict(X)
-    try:
-        y_proba = model.predict_proba(X)[:, 1]
-    except Exception:
-        y_proba = None
 
-    out = df_raw.copy()
-    out["pred_stunting"] = y_pred
-    if y_proba is not None:
-        out["prob_stunting"] = y_proba
+def write_trajectories(store, child_ids, path):
+    """Skor trajektori (riwayat tersimpan lengkap) tiap anak di `child_ids` ke `path`."""
+    from growth_history import trajectory_frame
 
-    out.to_csv(args.output_csv, index=False)
-    print(f"Saved predictions to: {args.output_csv}")
+    df = trajectory_frame(store.children(child_ids))
+    with TableWriter(path) as writer:
+        writer.write(df)
+    print(f"Saved trajectories of {len(df)} children to: {path}")
 
 
 if __name__ == "__main__":
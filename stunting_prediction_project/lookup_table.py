@@ -0,0 +1,130 @@
+"""Precomputed stunting-risk lookup table.
+
+``build_lookup.py`` evaluates the trained pipeline once over a grid of
+age (whole months) x sex x height x weight and stores P(stunting) as a
+float16 ``.npy`` array, with its build parameters in a JSON sidecar.
+``RiskTable`` answers predictions by indexing that array (memory-mapped),
+optionally with bilinear interpolation over height and weight; inputs that
+fall outside the grid are reported so the caller can use the model instead.
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+
+FORMAT_VERSION = 1
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def params_path(table_path):
+    return os.path.splitext(table_path)[0] + ".json"
+
+
+def grid_axis(start, stop, step):
+    """Inclusive, evenly spaced axis rounded to avoid float drift."""
+    n = int(round((stop - start) / step)) + 1
+    return np.round(start + step * np.arange(n), 6)
+
+
+def save_table(path, table, params):
+    np.save(path, table.astype(np.float16))
+    with open(params_path(path), "w") as f:
+        json.dump(params, f, indent=2)
+
+
+class RiskTable:
+    """P(stunting) over age x sex x height x weight, shape (n_age, n_sex, n_height, n_weight)."""
+
+    def __init__(self, table, params):
+        if params.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported risk table format: {params.get('format_version')}")
+        self.params = params
+        self.table = table
+        self.age_min, self.age_max = int(params["age_min"]), int(params["age_max"])
+        self.height_min, self.height_step = float(params["height_min"]), float(params["height_step"])
+        self.weight_min, self.weight_step = float(params["weight_min"]), float(params["weight_step"])
+        self.sex_values = list(params["sex_values"])
+        self.classes = list(params["classes"])
+        expected = (
+            self.age_max - self.age_min + 1,
+            len(self.sex_values),
+            len(grid_axis(params["height_min"], params["height_max"], params["height_step"])),
+            len(grid_axis(params["weight_min"], params["weight_max"], params["weight_step"])),
+        )
+        if tuple(table.shape) != expected:
+            raise ValueError(f"Risk table shape {table.shape} does not match its parameters {expected}")
+
+    @classmethod
+    def load(cls, path, model_path=None):
+        """Memory-map the table; if `model_path` is given, refuse a table built from another model."""
+        with open(params_path(path)) as f:
+            params = json.load(f)
+        if model_path is not None:
+            actual = file_sha256(model_path)
+            if params.get("model_sha256") != actual:
+                raise ValueError(
+                    f"Risk table {path} was built from a different model "
+                    f"(table: {params.get('model_sha256')}, model: {actual}); rebuild it"
+                )
+        return cls(np.load(path, mmap_mode="r"), params)
+
+    def sex_codes(self, values):
+        """Map sex labels to table indices (-1 when unknown)."""
+        lookup = {v: i for i, v in enumerate(self.sex_values)}
+        return np.array([lookup.get(v, -1) for v in values], dtype=np.int64)
+
+    def lookup(self, age, sex_code, height, weight, interpolate=False):
+        """
+        Vectorised lookup. Returns (proba, in_grid): P(stunting) per row and a
+        mask of rows the table can answer; `proba` is NaN where `in_grid` is False.
+        """
+        age = np.asarray(age, dtype=np.float64)
+        sex_code = np.asarray(sex_code, dtype=np.int64)
+        h = (np.asarray(height, dtype=np.float64) - self.height_min) / self.height_step
+        w = (np.asarray(weight, dtype=np.float64) - self.weight_min) / self.weight_step
+        n_age, n_sex, n_h, n_w = self.table.shape
+
+        in_grid = (
+            (age == np.round(age)) & (age >= self.age_min) & (age <= self.age_max)
+            & (sex_code >= 0) & (sex_code < n_sex)
+            & (h >= -0.5) & (h <= n_h - 0.5) & (w >= -0.5) & (w <= n_w - 0.5)
+        )
+        proba = np.full(age.shape, np.nan)
+        if not in_grid.any():
+            return proba, in_grid
+
+        a = age[in_grid].astype(np.int64) - self.age_min
+        s = sex_code[in_grid]
+        h, w = h[in_grid], w[in_grid]
+        if interpolate:
+            h = np.clip(h, 0, n_h - 1)
+            w = np.clip(w, 0, n_w - 1)
+            h0 = np.minimum(np.floor(h).astype(np.int64), n_h - 2 if n_h > 1 else 0)
+            w0 = np.minimum(np.floor(w).astype(np.int64), n_w - 2 if n_w > 1 else 0)
+            h1 = np.minimum(h0 + 1, n_h - 1)
+            w1 = np.minimum(w0 + 1, n_w - 1)
+            fh, fw = h - h0, w - w0
+            t = self.table
+            p = (t[a, s, h0, w0] * (1 - fh) * (1 - fw) + t[a, s, h1, w0] * fh * (1 - fw)
+                 + t[a, s, h0, w1] * (1 - fh) * fw + t[a, s, h1, w1] * fh * fw)
+        else:
+            hi = np.clip(np.rint(h).astype(np.int64), 0, n_h - 1)
+            wi = np.clip(np.rint(w).astype(np.int64), 0, n_w - 1)
+            p = self.table[a, s, hi, wi]
+        proba[in_grid] = p
+        return proba, in_grid
+
+    def lookup_one(self, age, sex_label, height, weight, interpolate=False):
+        """Single-row lookup; returns P(stunting) or None when outside the grid."""
+        proba, in_grid = self.lookup(
+            [age], self.sex_codes([sex_label]), [height], [weight], interpolate
+        )
+        return float(proba[0]) if in_grid[0] else None
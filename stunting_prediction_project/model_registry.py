@@ -0,0 +1,71 @@
+"""Versioned view over the ``artifacts_*`` directories written by train.py.
+
+Every artifact directory holds a ``metadata.json`` and a ``best_model_*.joblib``
+(plus optionally ``compiled_model.npz`` and ``risk_table.npy``). A version is
+identified by the SHA-256 of its ``metadata.json`` contents, so retraining into
+the same directory with different data or results yields a new version id.
+"""
+import glob
+import hashlib
+import json
+import os
+
+ARTIFACT_GLOB = "artifacts_*"
+METADATA_FILE = "metadata.json"
+VERSION_LENGTH = 12
+
+
+def metadata_version(metadata_path) -> str:
+    with open(metadata_path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:VERSION_LENGTH]
+
+
+def find_model_file(model_dir, metadata=None):
+    """The joblib model of an artifact directory (None if there is none)."""
+    if metadata and metadata.get("model_file"):
+        path = os.path.join(model_dir, metadata["model_file"])
+        return path if os.path.exists(path) else None
+    candidates = sorted(glob.glob(os.path.join(model_dir, "best_model_*.joblib")))
+    return candidates[0] if candidates else None
+
+
+def describe(model_dir):
+    """Version entry for one artifact directory, or None if it has no metadata."""
+    metadata_path = os.path.join(model_dir, METADATA_FILE)
+    if not os.path.exists(metadata_path):
+        return None
+    with open(metadata_path) as f:
+        metadata = json.load(f)
+    model_path = find_model_file(model_dir, metadata)
+    return {
+        "version": metadata_version(metadata_path),
+        "dir": model_dir,
+        "model_path": model_path,
+        "metadata": metadata,
+        "modified": os.path.getmtime(model_path or metadata_path),
+    }
+
+
+def scan(root):
+    """All versions under `root`, newest model file first."""
+    entries = []
+    for model_dir in glob.glob(os.path.join(root, ARTIFACT_GLOB)):
+        if os.path.isdir(model_dir):
+            entry = describe(model_dir)
+            if entry is not None:
+                entries.append(entry)
+    return sorted(entries, key=lambda e: e["modified"], reverse=True)
+
+
+def resolve(root, key):
+    """Find a version by id (or unique id prefix) or by directory name."""
+    entries = scan(root)
+    for entry in entries:
+        if os.path.basename(entry["dir"]) == key or entry["dir"] == key:
+            return entry
+    matches = [e for e in entries if e["version"].startswith(key)]
+    if len(matches) == 1:
+        return matches[0]
+    if matches:
+        raise ValueError(f"Ambiguous model version '{key}'")
+    raise ValueError(f"Unknown model version '{key}'")
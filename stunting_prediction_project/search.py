@@ -0,0 +1,235 @@
+"""Successive-halving hyperparameter search for train.py --search.
+
+Every configuration of ``SEARCH_SPACE`` is first scored with a small budget
+(a fraction of the training rows, or of the forest's trees), then only the
+best 1/eta of them are scored again with eta times the budget, and so on
+until the last rung uses the full budget. Poor configurations are dropped
+after their cheap fits, so most of the compute goes to the promising ones.
+Scores are macro F1 on a validation split carved from the training set; the
+test set stays untouched for the final comparison in train.py.
+
+Fits of one rung run concurrently in forked processes that share the
+preprocessed data copy-on-write. Each result (score and fit time) is appended
+to a JSON-lines cache keyed by a hash of the data and the configuration, so a
+re-run (or a run that was interrupted) only fits what is not cached yet.
+"""
+import hashlib
+import itertools
+import json
+import math
+import multiprocessing as mp
+import os
+import time
+
+import numpy as np
+import sklearn
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import f1_score
+from sklearn.model_selection import train_test_split
+
+ESTIMATORS = {"LogisticRegression": LogisticRegression, "RandomForest": RandomForestClassifier}
+# Fixed settings of each candidate, as train.py uses them without --search
+BASE_PARAMS = {
+    "LogisticRegression": {"max_iter": 1000, "class_weight": "balanced"},
+    "RandomForest": {"n_estimators": 150, "class_weight": "balanced_subsample",
+                     "random_state": 171, "n_jobs": -1},
+}
+# Values tried per hyperparameter (the grid of each model is searched)
+SEARCH_SPACE = {
+    "LogisticRegression": {"C": [0.01, 0.1, 1.0, 10.0]},
+    "RandomForest": {
+        "max_depth": [None, 12, 20],
+        "min_samples_leaf": [1, 3, 10],
+        "max_features": ["sqrt", 0.6],
+    },
+}
+CACHE_FILE = "search_cache.jsonl"
+# Fewest trees a forest is scored with when the budget is the tree count
+MIN_TREES = 10
+SEED = 171
+
+# Search data, set before forking so that the fit workers share it copy-on-write
+_data = {}
+
+
+def make_classifier(name, params):
+    """Unfitted estimator `name` with its BASE_PARAMS overridden by `params`."""
+    return ESTIMATORS[name](**{**BASE_PARAMS[name], **params})
+
+
+def configurations(space):
+    """(model, params) for every point of each model's grid."""
+    configs = []
+    for name, grid in space.items():
+        if name not in ESTIMATORS:
+            raise ValueError(f"Unknown model in search space: {name} (expected one of {list(ESTIMATORS)})")
+        keys = sorted(grid)
+        for values in itertools.product(*(grid[k] for k in keys)):
+            configs.append((name, dict(zip(keys, values))))
+    return configs
+
+
+def data_hash(*arrays):
+    """Fingerprint of the search data (preprocessed matrices and labels)."""
+    h = hashlib.sha256()
+    for a in arrays:
+        a = np.ascontiguousarray(a)
+        h.update(f"{a.dtype}{a.shape}".encode())
+        h.update(a.tobytes())
+    return h.hexdigest()[:16]
+
+
+def cache_key(data_id, name, params, rows):
+    """Key of one fit: data, sklearn version, every estimator setting but n_jobs, and rows."""
+    settings = {k: v for k, v in {**BASE_PARAMS[name], **params}.items() if k != "n_jobs"}
+    payload = json.dumps({"data": data_id, "sklearn": sklearn.__version__, "model": name,
+                          "params": settings, "rows": rows}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:24]
+
+
+def load_cache(path):
+    """Cached results by key; unreadable lines (e.g. from an interrupted write) are skipped."""
+    cache = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    cache[entry["key"]] = entry
+                except (ValueError, KeyError):
+                    continue
+    return cache
+
+
+def rung_params(name, params, fraction, resource, n_rows):
+    """(params, rows) a configuration is fitted with at budget `fraction`."""
+    if resource == "trees" and name == "RandomForest":
+        n_trees = {**BASE_PARAMS[name], **params}["n_estimators"]
+        return {**params, "n_estimators": max(MIN_TREES, round(n_trees * fraction))}, n_rows
+    if resource == "trees":
+        # Estimators without trees are always fitted on every row (then cached)
+        return dict(params), n_rows
+    return dict(params), max(1, round(n_rows * fraction))
+
+
+def score_config(name, params, rows, n_jobs):
+    """Fit one configuration on the first `rows` search rows; validation F1 and fit time."""
+    from threadpoolctl import threadpool_limits
+
+    clf = make_classifier(name, params)
+    if "n_jobs" in clf.get_params():
+        clf.set_params(n_jobs=n_jobs)
+    idx = _data["order"][:rows]
+    t0 = time.perf_counter()
+    with threadpool_limits(limits=n_jobs):
+        clf.fit(_data["X_fit"][idx], _data["y_fit"][idx])
+    fit_seconds = time.perf_counter() - t0
+    score = f1_score(_data["y_val"], clf.predict(_data["X_val"]), average="macro", zero_division=0)
+    return {"f1_macro": float(score), "fit_seconds": round(fit_seconds, 3)}
+
+
+def _run_task(task):
+    key, name, params, rows, n_jobs = task
+    return key, score_config(name, params, rows, n_jobs)
+
+
+def _score_all(tasks, cores):
+    """Yield (key, result) for tasks as they finish, fitted concurrently within `cores`."""
+    if not tasks:
+        return
+    n_jobs = max(1, cores // len(tasks))
+    tasks = [(*task, n_jobs) for task in tasks]
+    if len(tasks) < 2 or cores < 2 or "fork" not in mp.get_all_start_methods():
+        for task in tasks:
+            yield _run_task(task)
+        return
+    with mp.get_context("fork").Pool(processes=min(len(tasks), cores)) as pool:
+        yield from pool.imap_unordered(_run_task, tasks)
+
+
+def successive_halving(Xt, y, cores, cache_path, space=None, resource="rows", eta=3,
+                       rungs=3, val_size=0.2, time_budget=None):
+    """Search `space` (default SEARCH_SPACE) on preprocessed training data.
+
+    Returns (best, summary): the best params per model and a JSON-ready
+    summary with the full leaderboard (one entry per configuration, at the
+    last rung it reached).
+    """
+    t_start = time.perf_counter()
+    X_fit, X_val, y_fit, y_val = train_test_split(
+        Xt, np.asarray(y), test_size=val_size, stratify=y, random_state=SEED)
+    # Nested row subsets: each rung's rows include those of the rung before
+    order = np.random.default_rng(SEED).permutation(len(X_fit))
+    _data.update(X_fit=X_fit, y_fit=y_fit, X_val=X_val, y_val=y_val, order=order)
+    data_id = data_hash(X_fit, y_fit, X_val, y_val)
+    cache = load_cache(cache_path)
+
+    configs = configurations(space or SEARCH_SPACE)
+    alive = list(range(len(configs)))
+    entries = [None] * len(configs)
+    fits = hits = 0
+    stopped_early = False
+    fractions = [eta ** -(rungs - 1 - r) for r in range(rungs)]
+    try:
+        with open(cache_path, "a") as cache_file:
+            for rung, fraction in enumerate(fractions):
+                if rung and time_budget is not None and time.perf_counter() - t_start > time_budget:
+                    stopped_early = True
+                    break
+                tasks, keys = [], {}
+                for i in alive:
+                    name, params = configs[i]
+                    fit_params, rows = rung_params(name, params, fraction, resource, len(X_fit))
+                    key = cache_key(data_id, name, fit_params, rows)
+                    keys[i] = (key, fit_params, rows)
+                    if key in cache:
+                        hits += 1
+                    elif all(t[0] != key for t in tasks):
+                        tasks.append((key, name, fit_params, rows))
+                for key, result in _score_all(tasks, cores):
+                    entry = {"key": key, **result}
+                    cache[key] = entry
+                    # Written as soon as it is known, so an interrupted search keeps it
+                    cache_file.write(json.dumps(entry) + "\n")
+                    cache_file.flush()
+                    fits += 1
+                for i in alive:
+                    key, fit_params, rows = keys[i]
+                    name, params = configs[i]
+                    entries[i] = {
+                        "model": name, "params": params, "rung": rung, "rows": rows,
+                        "n_estimators": fit_params.get("n_estimators"),
+                        "f1_macro": cache[key]["f1_macro"], "fit_seconds": cache[key]["fit_seconds"],
+                    }
+                # Best F1 first; equal scores prefer the cheaper fit
+                alive.sort(key=lambda i: (-entries[i]["f1_macro"], entries[i]["fit_seconds"]))
+                if rung < rungs - 1:
+                    alive = alive[:max(1, math.ceil(len(alive) / eta))]
+    finally:
+        _data.clear()
+
+    leaderboard = sorted((e for e in entries if e is not None),
+                         key=lambda e: (-e["rung"], -e["f1_macro"], e["fit_seconds"]))
+    best = {}
+    for e in leaderboard:
+        best.setdefault(e["model"], e["params"])
+    summary = {
+        "enabled": True,
+        "resource": resource,
+        "eta": eta,
+        "rungs": rungs,
+        "fractions": fractions,
+        "configurations": len(configs),
+        "search_rows": len(X_fit),
+        "validation_rows": len(X_val),
+        "data_hash": data_id,
+        "fits": fits,
+        "cache_hits": hits,
+        "cache_file": cache_path,
+        "stopped_early": stopped_early,
+        "seconds": round(time.perf_counter() - t_start, 3),
+        "best": best,
+        "leaderboard": leaderboard,
+    }
+    return best, summary
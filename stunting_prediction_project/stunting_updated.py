@@ -1,14 +1,21 @@
-import joblib
-import pandas as pd
 import warnings
 import os
 
+from compiled_model import resolve_engine
+
 # Suppress warnings
 warnings.filterwarnings('ignore', category=UserWarning)
 
 # Try to load the new model first
 model_path = "artifacts_sklearn171/best_model_RandomForest.joblib"
-if os.path.exists(model_path):
+# Bundle NumPy hasil train.py: dimuat tanpa impor sklearn/pandas (start lebih cepat)
+compiled_path = "artifacts_sklearn171/compiled_model.npz"
+if resolve_engine("auto", compiled_path, model_path) == "compiled":
+    from compiled_model import CompiledForest
+    model = CompiledForest.load(compiled_path)
+    print(f"✅ Model terbaru berhasil dimuat dari: {compiled_path}")
+elif os.path.exists(model_path):
+    import joblib
     try:
         model = joblib.load(model_path)
         print(f"✅ Model terbaru berhasil dimuat dari: {model_path}")
@@ -17,6 +24,7 @@ if os.path.exists(model_path):
         exit(1)
 else:
     # Fallback to old model with proper error handling
+    import joblib
     try:
         model = joblib.load("best_model_RandomForest.joblib")
         print("⚠️  Menggunakan model lama (mungkin ada warning versi)")
@@ -38,18 +46,31 @@ try:
     # Convert jenis kelamin to format yang diharapkan model
     jk_converted = "Laki-laki" if jk.upper() in ['L', 'LAKI', 'LAKI-LAKI'] else "Perempuan"
     
-    # Buat DataFrame sesuai format dataset yang ditraining
-    data_baru = pd.DataFrame([{
-        "Jenis_Kelamin": jk_converted,
-        "Umur_(bulan)": umur,
-        "Tinggi_Badan_(cm)": tinggi,
-        "Berat_Badan_(kg)": berat,
-        "Wasting": "Normal"  # Default value untuk kolom yang tidak digunakan dalam prediksi stunting
-    }])
+    # Buat input sesuai format dataset yang ditraining
+    data_baru = {
+        "Jenis_Kelamin": [jk_converted],
+        "Umur_(bulan)": [umur],
+        "Tinggi_Badan_(cm)": [tinggi],
+        "Berat_Badan_(kg)": [berat],
+        "Wasting": ["Normal"]  # Default value untuk kolom yang tidak digunakan dalam prediksi stunting
+    }
+    # Model hasil train.py --who_features juga butuh z-score WHO (dihitung dari input di atas)
+    metadata_path = "artifacts_sklearn171/metadata.json"
+    if os.path.exists(metadata_path):
+        import json
+        with open(metadata_path) as f:
+            who_features = json.load(f).get("who_features")
+        if who_features:
+            from who_growth import add_features
+            add_features(data_baru, who_features["features"], who_features["columns"])
+    if not hasattr(model, "encode"):
+        # Pipeline sklearn butuh DataFrame; bundle NumPy cukup dengan list per kolom
+        import pandas as pd
+        data_baru = pd.DataFrame(data_baru)
     
-    # Prediksi
-    pred = model.predict(data_baru)[0]
+    # Prediksi (satu kali evaluasi model: kelas = argmax probabilitas)
     prob = model.predict_proba(data_baru)[0]
+    pred = model.classes_[prob.argmax()]
     
     print(f"\n✅ Hasil prediksi:")
     print(f"📊 Input data:")
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The project's scripts import their siblings directly (e.g. `from compiled_model import ...`)
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
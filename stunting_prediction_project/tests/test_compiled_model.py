@@ -0,0 +1,55 @@
+"""Parity of the compiled NumPy model with the sklearn pipeline it was built from."""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL_DIR = os.path.join(PROJECT_DIR, "artifacts_sklearn171")
+MODEL_PATH = os.path.join(MODEL_DIR, "best_model_RandomForest.joblib")
+BUNDLE_PATH = os.path.join(MODEL_DIR, "compiled_model.npz")
+SAMPLE_CSV = os.path.join(PROJECT_DIR, "sample_input.csv")
+
+pytestmark = pytest.mark.skipif(not os.path.exists(MODEL_PATH), reason="no trained model in artifacts_sklearn171")
+
+
+@pytest.fixture(scope="module")
+def pipeline():
+    joblib = pytest.importorskip("joblib")
+    return joblib.load(MODEL_PATH)
+
+
+@pytest.fixture(scope="module")
+def sample(pipeline):
+    from export_compiled import align_columns
+
+    cols = list(pipeline.feature_names_in_)
+    return align_columns(pd.read_csv(SAMPLE_CSV), cols)[cols]
+
+
+def test_preprocessor_matches_column_transformer(pipeline, sample):
+    from compiled_model import CompiledPreprocessor
+
+    pre = CompiledPreprocessor.from_pipeline(pipeline)
+    expected = pipeline.steps[0][1].transform(sample)
+    actual = pre.transform(pre.encode({c: sample[c].tolist() for c in sample.columns}), np.float64)
+    assert actual.shape == expected.shape
+    assert np.allclose(actual, expected)
+
+
+def test_compiled_forest_matches_predict_proba(pipeline, sample):
+    from compiled_model import CompiledForest
+
+    compiled = CompiledForest.from_pipeline(pipeline)
+    expected = pipeline.predict_proba(sample)
+    assert np.allclose(compiled.predict_proba(sample), expected, atol=1e-9)
+    assert np.array_equal(compiled.predict(sample), pipeline.predict(sample))
+
+
+@pytest.mark.skipif(not os.path.exists(BUNDLE_PATH), reason="no compiled_model.npz bundle")
+def test_saved_bundle_matches_predict_proba(pipeline, sample):
+    from compiled_model import CompiledForest
+
+    compiled = CompiledForest.load(BUNDLE_PATH)
+    assert np.allclose(compiled.predict_proba(sample), pipeline.predict_proba(sample), atol=1e-9)
@@ -2,10 +2,24 @@
 # Usage:
 #   pip install -r requirements.txt
 #   python train.py --csv stunting_wasting_dataset.csv --target Stunting
-import argparse, re, json, joblib, warnings, os
+#   python train.py --csv roster.parquet --target Stunting --columns_from artifacts_sklearn171/metadata.json
+#   python train.py --csv national.csv --target Stunting --fast --n_jobs 16
+#   python train.py --csv stunting_wasting_dataset.csv --target Stunting --compact --latency_budget_ms 5
+#   python train.py --csv stunting_wasting_dataset.csv --target Stunting --no_fast_start
+#   python train.py --csv stunting_wasting_dataset.csv --target Stunting --who_features
+#   python train.py --csv penimbangan_2025_07.csv --target Stunting --update artifacts_sklearn171
+#   python train.py --csv stunting_wasting_dataset.csv --target Stunting --fast --search
+import argparse, re, json, joblib, warnings, os, sys, time
+import multiprocessing as mp
 import pandas as pd
 import numpy as np
 
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from sklearn.base import clone
 from sklearn.model_selection import train_test_split
 from sklearn.compose import ColumnTransformer
 from sklearn.preprocessing import OneHotEncoder, StandardScaler, LabelEncoder
@@ -15,6 +29,16 @@ from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_sc
 from sklearn.linear_model import LogisticRegression
 from sklearn.ensemble import RandomForestClassifier
 
+from compaction import compact_forest, inference_cost
+from compiled_model import COMPILED_MODEL_FILE, CompiledForest, compile_pipeline, save_compiled
+from data_io import clean_name, read_table, resolve_columns
+from drift import DRIFT_FILE, build_reference, fold_reference, load_reference, save_reference
+from incremental import (STATE_FILE, add_trees, column_stats, initial_state, load_state,
+                         prune_oldest, record_update, save_state, shift, state_from_metadata)
+from model_registry import find_model_file
+from search import CACHE_FILE as SEARCH_CACHE_FILE, make_classifier, successive_halving
+from who_growth import FEATURES as WHO_FEATURES, add_features, feature_names, find_columns
+
 warnings.filterwarnings("ignore")
 
 
@@ -80,17 +104,339 @@ def to_binary_target(y_raw, positive_labels=None, negative_labels=None):
     return y_series.astype(int)
 
 
+# Candidates whose fit uses a single core; the others get the rest of the budget
+SINGLE_CORE_MODELS = ("LogisticRegression",)
+
+# Raw test rows used to time candidates (single-row and batch predict_proba)
+COST_SAMPLE_ROWS = 1000
+
+# Fitted preprocessing and preprocessed train/test data, set before forking
+# so that the fit workers share them copy-on-write
+_shared = {}
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process so far in MB (None where unavailable)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+
+def split_core_budget(budget, names):
+    """Cores per candidate: one for single-core estimators, the rest split over the others."""
+    n_single = sum(1 for n in names if n in SINGLE_CORE_MODELS)
+    n_multi = len(names) - n_single
+    per_multi = max(1, (budget - n_single) // n_multi) if n_multi else 1
+    return {n: 1 if n in SINGLE_CORE_MODELS else per_multi for n in names}
+
+
+def fit_within_budget(mdl, clf, X, y, n_jobs):
+    """Fit `mdl` using at most `n_jobs` cores; `clf` keeps its own n_jobs for prediction."""
+    from threadpoolctl import threadpool_limits
+
+    saved = clf.get_params().get("n_jobs")
+    if saved is not None:
+        clf.set_params(n_jobs=n_jobs)
+    t0 = time.perf_counter()
+    with threadpool_limits(limits=n_jobs):
+        mdl.fit(X, y)
+    if saved is not None:
+        clf.set_params(n_jobs=saved)
+    return round(time.perf_counter() - t0, 3)
+
+
+def fit_candidate(name, clf, n_jobs, path):
+    """Fit, score and save one classifier on the shared preprocessed data.
+
+    In ``--fast`` mode this runs in a fresh forked process, so the peak memory
+    it reports is that of this model alone (plus the shared data it maps), and
+    the fitted model goes straight to `path` instead of back to the parent.
+    """
+    rss_start = peak_rss_mb()
+    fit_seconds = fit_within_budget(clf, clf, _shared["X_train"], _shared["y_train"], n_jobs)
+    peak = peak_rss_mb()
+    row, report, cm = evaluate(name, clf, _shared["X_test"], _shared["y_test"])
+    joblib.dump(Pipeline([("prep", _shared["prep"]), ("clf", clf)]), path)
+    row.update(fit_seconds=fit_seconds, n_jobs=n_jobs, peak_rss_mb=peak, rss_at_start_mb=rss_start)
+    return name, row, report, cm
+
+
+def fit_candidates(classifiers, cores, outdir):
+    """Fit candidates concurrently, each in its own forked process; in-process where fork is unavailable.
+
+    Returns (name, row, report, cm, path) per candidate; `path` holds the fitted pipeline.
+    """
+    paths = {n: os.path.join(outdir, f".candidate_{n}.joblib") for n in classifiers}
+    if len(classifiers) < 2 or "fork" not in mp.get_all_start_methods():
+        done = [fit_candidate(n, clf, cores[n], paths[n]) for n, clf in classifiers.items()]
+    else:
+        # Never more processes than the core budget allows
+        processes = min(len(classifiers), sum(cores.values()))
+        with mp.get_context("fork").Pool(processes=processes, maxtasksperchild=1) as pool:
+            jobs = [pool.apply_async(fit_candidate, (n, clf, cores[n], paths[n]))
+                    for n, clf in classifiers.items()]
+            done = [job.get() for job in jobs]
+    return [(*result, paths[result[0]]) for result in done]
+
+
+def evaluate(name, mdl, X_test, y_test):
+    """Test-set metrics, classification report and confusion matrix of one model."""
+    y_pred = mdl.predict(X_test)
+    try:
+        y_proba = mdl.predict_proba(X_test)[:, 1]
+        auc_val = roc_auc_score(y_test, y_proba)
+    except Exception:
+        auc_val = float("nan")
+    row = {
+        "model": name,
+        "accuracy": accuracy_score(y_test, y_pred),
+        "precision_macro": precision_score(
+            y_test, y_pred, average="macro", zero_division=0
+        ),
+        "recall_macro": recall_score(
+            y_test, y_pred, average="macro", zero_division=0
+        ),
+        "f1_macro": f1_score(y_test, y_pred, average="macro", zero_division=0),
+        "roc_auc": auc_val,
+    }
+    report = classification_report(y_test, y_pred, output_dict=True, zero_division=0)
+    return row, report, confusion_matrix(y_test, y_pred).tolist()
+
+
+def write_fast_start(mdl, X_sample, outdir):
+    """Save the compiled NumPy bundle of `mdl` next to the joblib model.
+
+    The bundle loads without sklearn/pandas, so api_model.py, infer.py and
+    stunting_updated.py start much faster with it. It is only written when it
+    reproduces the pipeline's probabilities on `X_sample`; otherwise a bundle
+    left by an earlier run is removed so it cannot be mistaken for this model.
+    """
+    path = os.path.join(outdir, COMPILED_MODEL_FILE)
+    try:
+        meta, arrays = compile_pipeline(mdl)
+        max_diff = float(np.abs(mdl.predict_proba(X_sample)
+                                - CompiledForest(meta, arrays).predict_proba(X_sample)).max())
+        if max_diff > 1e-9:
+            raise ValueError(f"compiled model differs from the pipeline (max |diff| {max_diff:.3g})")
+    except ValueError as e:
+        if os.path.exists(path):
+            os.remove(path)
+        return {"enabled": False, "reason": str(e)}
+    save_compiled(path, meta, arrays)
+    t0 = time.perf_counter()
+    CompiledForest.load(path)
+    return {
+        "enabled": True,
+        "file": COMPILED_MODEL_FILE,
+        "model_size_mb": round(os.path.getsize(path) / 2**20, 3),
+        "load_seconds": round(time.perf_counter() - t0, 4),
+        "parity_max_diff": max_diff,
+    }
+
+
+def update_model(args, budget, t_start):
+    """--update: fold a new data slice into an existing RandomForest (see incremental.py).
+
+    Only the slice is read. The stored preprocessing is reused, `--new_trees`
+    trees are grown on part of the slice and added to the forest (the oldest
+    are pruned only when `--max_trees` caps its size), and the previous and updated models are compared on the
+    rest of the slice (`--holdout`). The update is refused if it loses more
+    than `--max_update_f1_loss` F1 there.
+    """
+    with open(os.path.join(args.update, "metadata.json"), "r") as f:
+        prev = json.load(f)
+    # Artifacts older than metadata["model_file"] are found by their best_model_*.joblib name
+    model_file = find_model_file(args.update, prev)
+    if model_file is None:
+        raise SystemExit(f"--update: no model file in {args.update} "
+                         f"({prev.get('model_file') or 'best_model_*.joblib'} not found)")
+    mdl = joblib.load(model_file)
+    prep, forest = mdl.steps[0][1], mdl.steps[-1][1]
+    if not isinstance(forest, RandomForestClassifier):
+        raise SystemExit(f"--update needs a RandomForest model, {args.update} holds "
+                         f"{type(forest).__name__}: retrain it from scratch")
+    n_before = len(forest.estimators_)
+    # Default: keep every tree. Replacing trees fitted on the full archive with
+    # trees from one small slice loses accuracy; pruning is opt-in.
+    max_trees = args.max_trees or n_before + args.new_trees
+    state = load_state(args.update) or state_from_metadata(prev, n_before)
+
+    num_cols, cat_cols = prev["numeric_cols"], prev["categorical_cols"]
+    who_features = prev.get("who_features")
+    derived = who_features["features"] if who_features else []
+    base_cols = [c for c in num_cols + cat_cols if c not in derived]
+    df = read_table(args.csv, resolve_columns(args.csv, base_cols + [args.target]),
+                    lean=args.fast, keep=[args.target])
+    df.columns = [clean_name(c) for c in df.columns]
+    df = df.loc[:, ~df.columns.duplicated(keep="first")]
+    missing = [c for c in base_cols + [args.target] if clean_name(c) not in df.columns]
+    if missing:
+        raise SystemExit(f"{args.csv} is missing columns of the model: {', '.join(missing)}")
+    # Models from before names were cleaned (e.g. 'Umur (bulan)') keep their own column names
+    X = df[[clean_name(c) for c in base_cols]].copy()
+    X.columns = base_cols
+    y = to_binary_target(df[clean_name(args.target)]).astype(int)
+    if who_features:
+        add_features(X, derived, who_features["columns"], dtype=np.float32 if args.fast else np.float64)
+
+    X_fit, X_hold, y_fit, y_hold = train_test_split(
+        X, y, test_size=args.holdout, stratify=y, random_state=171
+    )
+    stats = column_stats(X, y, num_cols, cat_cols)
+    drift = shift(state["stats"], stats) if state["stats"]["rows"] else {}
+    reference = load_reference(args.update)
+    previous, _, _ = evaluate("RandomForest (previous)", mdl, X_hold, y_hold)
+
+    t0 = time.perf_counter()
+    Xt_fit = np.ascontiguousarray(prep.transform(X_fit), dtype=np.float32)
+    preprocess_seconds = round(time.perf_counter() - t0, 3)
+    fit_seconds = add_trees(forest, Xt_fit, y_fit.to_numpy(), args.new_trees,
+                            fit=lambda est, X, y: fit_within_budget(est, est, X, y, budget))
+    n_pruned = prune_oldest(forest, max_trees)
+    row, report, cm = evaluate("RandomForest", mdl, X_hold, y_hold)
+    row.update(fit_seconds=fit_seconds, n_jobs=budget, peak_rss_mb=peak_rss_mb())
+    row.update(inference_cost(mdl, X_hold.iloc[:COST_SAMPLE_ROWS]))
+    print(f"Slice {args.csv}: {len(X)} rows, +{args.new_trees} trees, -{n_pruned} oldest "
+          f"({len(forest.estimators_)} trees). Hold-out F1 {previous['f1_macro']:.4f} -> {row['f1_macro']:.4f}")
+    if row["f1_macro"] < previous["f1_macro"] - args.max_update_f1_loss:
+        raise SystemExit(f"Update refused: hold-out F1 drops by more than --max_update_f1_loss "
+                         f"({args.max_update_f1_loss}); {args.outdir} is unchanged")
+
+    model_path = os.path.join(args.outdir, os.path.basename(model_file))
+    joblib.dump(mdl, model_path)
+    fast_start = {"enabled": False}
+    bundle_path = os.path.join(args.outdir, COMPILED_MODEL_FILE)
+    if not args.no_fast_start:
+        fast_start = write_fast_start(mdl, X_hold.iloc[:COST_SAMPLE_ROWS], args.outdir)
+    elif os.path.exists(bundle_path):
+        os.remove(bundle_path)
+    save_state(args.outdir, record_update(state, stats, args.csv, args.new_trees, n_pruned))
+    # Bins stay those of the first training run, so live drift scores remain comparable
+    save_reference(args.outdir, fold_reference(reference, X) if reference
+                   else build_reference(X, num_cols, cat_cols))
+
+    meta = dict(prev)
+    meta.update({
+        "csv_path": args.csv,
+        "model_file": os.path.basename(model_path),
+        "results": [row],
+        "training": {
+            "mode": "incremental",
+            "core_budget": budget,
+            "preprocess_seconds": preprocess_seconds,
+            "total_seconds": round(time.perf_counter() - t_start, 3),
+            "peak_rss_mb": peak_rss_mb(),
+        },
+        "selection": {"chosen": "RandomForest", "incremental": True},
+        "compaction": {"enabled": False, "reason": "incremental update"},
+        "fast_start": fast_start,
+        "training_state": STATE_FILE,
+        "drift_reference": DRIFT_FILE,
+        "incremental": {
+            "base_dir": args.update,
+            "slice": args.csv,
+            "rows": len(X),
+            "rows_fit": len(X_fit),
+            "rows_holdout": len(X_hold),
+            "trees_before": n_before,
+            "new_trees": args.new_trees,
+            "pruned_trees": n_pruned,
+            "n_estimators": len(forest.estimators_),
+            "previous": previous,
+            "updated": {k: row[k] for k in previous if k != "model"},
+            "report": report,
+            "confusion_matrix": cm,
+            "shift": drift,
+            "slices_seen": len(state["slices"]),
+            "rows_seen": state["stats"]["rows"],
+        },
+    })
+    with open(os.path.join(args.outdir, "metadata.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+
+    print(f"Updated artifacts written to: {args.outdir}")
+    print(json.dumps({"model_path": model_path, "outdir": args.outdir}, indent=2))
+
+
 def main():
     ap = argparse.ArgumentParser()
-    ap.add_argument("--csv", required=True)
+    ap.add_argument("--csv", "--data", dest="csv", required=True,
+                    help="CSV, Parquet (.parquet) or Arrow IPC (.arrow/.feather) dataset")
     ap.add_argument("--target", required=True)
-    ap.add_argument("--outdir", default="artifacts_sklearn171")
+    ap.add_argument("--outdir", default=None,
+                    help="Artifact directory (default: artifacts_sklearn171, or the --update directory)")
+    ap.add_argument("--columns_from", default=None,
+                    help="metadata.json whose numeric_cols/categorical_cols (+ --target) are the only columns read")
+    ap.add_argument("--fast", action="store_true",
+                    help="Read as float32/category, fit preprocessing once and train candidates in parallel")
+    ap.add_argument("--n_jobs", type=int, default=-1,
+                    help="Core budget shared by all candidates (-1 = all cores)")
+    ap.add_argument("--max_f1_loss", type=float, default=0.002,
+                    help="F1 (macro, absolute) that may be traded for a cheaper candidate or a compacted forest")
+    ap.add_argument("--compact", action="store_true",
+                    help="Shrink the winning RandomForest (fewer trees, depth/leaf caps) within --max_f1_loss")
+    ap.add_argument("--latency_budget_ms", type=float, default=None,
+                    help="Target single-row predict_proba latency for --compact")
+    ap.add_argument("--size_budget_mb", type=float, default=None,
+                    help="Target serialized model size for --compact")
+    ap.add_argument("--compact_depths", type=int, nargs="*", default=[8, 12, 16],
+                    help="max_depth caps to refit the forest with for --compact")
+    ap.add_argument("--compact_leaves", type=int, nargs="*", default=[],
+                    help="max_leaf_nodes caps to refit the forest with for --compact")
+    ap.add_argument("--no_fast_start", action="store_true",
+                    help=f"Do not write the startup-optimised {COMPILED_MODEL_FILE} bundle")
+    ap.add_argument("--who_features", action="store_true",
+                    help="Add WHO growth-standard z-scores (hfa_z, wfa_z, ...) computed from age/sex/height/weight")
+    ap.add_argument("--update", metavar="DIR", default=None,
+                    help="Fold --csv (a new data slice only) into the RandomForest in DIR instead of retraining")
+    ap.add_argument("--new_trees", type=int, default=50,
+                    help="Trees grown on the new slice for --update")
+    ap.add_argument("--max_trees", type=int, default=None,
+                    help="Cap on the forest size after --update; the oldest trees are pruned "
+                         "(default: no pruning, the new trees are added)")
+    ap.add_argument("--holdout", type=float, default=0.2,
+                    help="Fraction of the new slice held out to evaluate --update")
+    ap.add_argument("--max_update_f1_loss", type=float, default=0.01,
+                    help="Largest hold-out F1 drop versus the previous model that --update accepts")
+    ap.add_argument("--search", action="store_true",
+                    help="Choose each candidate's hyperparameters by successive halving on a validation split")
+    ap.add_argument("--search_resource", choices=["rows", "trees"], default="rows",
+                    help="Budget grown between --search rungs: training rows, or RandomForest trees")
+    ap.add_argument("--search_eta", type=int, default=3,
+                    help="Each --search rung keeps the best 1/eta configurations and gives them eta times the budget")
+    ap.add_argument("--search_rungs", type=int, default=3,
+                    help="Number of --search rungs; the first uses 1/eta^(rungs-1) of the budget")
+    ap.add_argument("--search_budget_s", type=float, default=None,
+                    help="Start no further --search rung after this many seconds")
+    ap.add_argument("--search_space", default=None,
+                    help="JSON file {model: {param: [values]}} replacing the built-in search space")
+    ap.add_argument("--search_cache", default=None,
+                    help=f"Score cache of --search (default: {SEARCH_CACHE_FILE} in --outdir)")
     args = ap.parse_args()
+    if args.outdir is None:
+        # An update rewrites the directory it read, never artifacts_sklearn171 by accident
+        args.outdir = args.update or "artifacts_sklearn171"
+    budget = args.n_jobs if args.n_jobs > 0 else (os.cpu_count() or 1)
+    t_start = time.perf_counter()
 
     os.makedirs(args.outdir, exist_ok=True)
+    if args.update:
+        update_model(args, budget, t_start)
+        return
+
+    columns = None
+    if args.columns_from:
+        with open(args.columns_from, "r") as f:
+            prev = json.load(f)
+        wanted = list(prev.get("numeric_cols", [])) + list(prev.get("categorical_cols", []))
+        # WHO z-scores are derived columns, not read from the data
+        wanted = [c for c in wanted if c not in WHO_FEATURES]
+        columns = resolve_columns(args.csv, wanted + [args.target])
 
-    df = pd.read_csv(args.csv)
-    df.columns = [re.sub(r"\\s+", "_", str(c).strip()) for c in df.columns]
+    df = read_table(args.csv, columns, lean=args.fast, keep=[args.target])
+    df.columns = [clean_name(c) for c in df.columns]
     df = df.loc[:, ~df.columns.duplicated(keep="first")]
     df = df.dropna(axis=1, how="all")
 
@@ -98,6 +444,14 @@ def main():
     X = df.drop(columns=[args.target] + id_cols, errors="ignore")
     y = to_binary_target(df[args.target]).astype(int)
 
+    who_features = None
+    if args.who_features:
+        who_columns = find_columns(list(X.columns))
+        names = feature_names()
+        add_features(X, names, who_columns, dtype=np.float32 if args.fast else np.float64)
+        who_features = {"features": names, "columns": who_columns}
+        print(f"Added WHO z-score features {names} from {who_columns}")
+
     num_cols = [c for c in X.columns if pd.api.types.is_numeric_dtype(X[c])]
     cat_cols = [c for c in X.columns if c not in num_cols]
 
@@ -107,7 +461,8 @@ def main():
     ])
     cat_trans = Pipeline([
         ("imputer", SimpleImputer(strategy="most_frequent")),
-        ("onehot", OneHotEncoder(handle_unknown="ignore", sparse_output=False)),
+        ("onehot", OneHotEncoder(handle_unknown="ignore", sparse_output=False,
+                                 dtype=np.float32 if args.fast else np.float64)),
     ])
     prep = ColumnTransformer(
         [("num", num_trans, num_cols), ("cat", cat_trans, cat_cols)],
@@ -118,63 +473,152 @@ def main():
     X_train, X_test, y_train, y_test = train_test_split(
         X, y, test_size=0.2, stratify=y, random_state=171
     )
+    X_sample = X_test.iloc[:COST_SAMPLE_ROWS].copy()
+    # Starting point for later --update runs; X_train is freed in --fast mode
+    train_stats = column_stats(X_train, y_train, num_cols, cat_cols)
+    # Per-feature histograms the API compares live inputs with (drift.py)
+    drift_reference = build_reference(X_train, num_cols, cat_cols)
 
-    models = {
-        "LogisticRegression": Pipeline([
-            ("prep", prep),
-            ("clf", LogisticRegression(max_iter=1000, class_weight="balanced")),
-        ]),
-        "RandomForest": Pipeline([
-            ("prep", prep),
-            ("clf", RandomForestClassifier(
-                n_estimators=150,
-                class_weight="balanced_subsample",
-                random_state=171,
-                n_jobs=-1,
-            )),
-        ]),
+    classifiers = {
+        "LogisticRegression": LogisticRegression(max_iter=1000, class_weight="balanced"),
+        "RandomForest": RandomForestClassifier(
+            n_estimators=150,
+            class_weight="balanced_subsample",
+            random_state=171,
+            n_jobs=-1,
+        ),
     }
 
+    search = {"enabled": False}
+    best_params = {}
+    if args.search:
+        space = None
+        if args.search_space:
+            with open(args.search_space, "r") as f:
+                space = json.load(f)
+        # Searched on its own fitted copy of the preprocessing; candidates below fit theirs as usual
+        Xt_search = np.ascontiguousarray(clone(prep).fit_transform(X_train), dtype=np.float32)
+        best_params, search = successive_halving(
+            Xt_search, y_train.to_numpy(), budget,
+            args.search_cache or os.path.join(args.outdir, SEARCH_CACHE_FILE), space,
+            args.search_resource, args.search_eta, args.search_rungs, time_budget=args.search_budget_s,
+        )
+        del Xt_search
+        print(f"Search: {search['configurations']} configurations, {search['fits']} fits, "
+              f"{search['cache_hits']} cached, {search['seconds']}s")
+        for entry in search["leaderboard"][:5]:
+            print(f"  rung {entry['rung']}  F1 {entry['f1_macro']:.4f}  {entry['model']} {entry['params']}")
+        classifiers = {name: make_classifier(name, params) for name, params in best_params.items()}
+
     results = []
     reports = {}
     cms = {}
     trained = {}
-    best_name = None
-    best_f1 = -1
-
-    for name, mdl in models.items():
-        mdl.fit(X_train, y_train)
-        y_pred = mdl.predict(X_test)
-        try:
-            y_proba = mdl.predict_proba(X_test)[:, 1]
-            auc_val = roc_auc_score(y_test, y_proba)
-        except Exception:
-            y_proba = None
-            auc_val = float("nan")
-        row = {
-            "model": name,
-            "accuracy": accuracy_score(y_test, y_pred),
-            "precision_macro": precision_score(
-                y_test, y_pred, average="macro", zero_division=0
-            ),
-            "recall_macro": recall_score(
-                y_test, y_pred, average="macro", zero_division=0
-            ),
-            "f1_macro": f1_score(y_test, y_pred, average="macro", zero_division=0),
-            "roc_auc": auc_val,
-        }
-        results.append(row)
-        reports[name] = classification_report(
-            y_test, y_pred, output_dict=True, zero_division=0
+    training = {"mode": "fast" if args.fast else "standard", "core_budget": budget}
+
+    if args.fast:
+        # Preprocessing is identical for every candidate: fit and apply it once,
+        # then let each classifier train on the same float32 matrix
+        t0 = time.perf_counter()
+        _shared.update(
+            X_train=np.ascontiguousarray(prep.fit_transform(X_train), dtype=np.float32),
+            X_test=np.ascontiguousarray(prep.transform(X_test), dtype=np.float32),
+            y_train=y_train.to_numpy(),
+            y_test=y_test.to_numpy(),
+            prep=prep,
         )
-        cms[name] = confusion_matrix(y_test, y_pred).tolist()
-        trained[name] = mdl
-        if row["f1_macro"] > best_f1:
-            best_f1 = row["f1_macro"]
-            best_name = name
+        # Only the preprocessed matrices are used from here on; free the frames before forking
+        del df, X, X_train, X_test
+        training["preprocess_seconds"] = round(time.perf_counter() - t0, 3)
+        cores = split_core_budget(budget, list(classifiers))
+        for name, row, reports[name], cms[name], path in fit_candidates(classifiers, cores, args.outdir):
+            results.append(row)
+            trained[name] = path
+    else:
+        for name, clf in classifiers.items():
+            mdl = Pipeline([("prep", prep), ("clf", clf)])
+            fit_seconds = fit_within_budget(mdl, clf, X_train, y_train, budget)
+            row, reports[name], cms[name] = evaluate(name, mdl, X_test, y_test)
+            # Process-wide high-water mark: includes every earlier step
+            row.update(fit_seconds=fit_seconds, n_jobs=budget, peak_rss_mb=peak_rss_mb())
+            results.append(row)
+            trained[name] = mdl
+
+    # Serving cost of every candidate, measured one at a time after training
+    for row in results:
+        mdl = trained[row["model"]]
+        row.update(inference_cost(joblib.load(mdl) if args.fast else mdl, X_sample))
+        if row["model"] in best_params:
+            row["params"] = best_params[row["model"]]
+
+    # Best F1 wins, unless a cheaper (single-row latency) candidate is within --max_f1_loss
+    best_f1 = max(row["f1_macro"] for row in results)
+    close = [row for row in results if row["f1_macro"] >= best_f1 - args.max_f1_loss]
+    best_name = min(close, key=lambda row: (row["row_latency_ms"], -row["f1_macro"]))["model"]
+    selection = {"max_f1_loss": args.max_f1_loss, "best_f1": best_f1, "chosen": best_name}
 
     model_path = os.path.join(args.outdir, f"best_model_{best_name}.joblib")
-    joblib.dump(trained[best_name], model_path)
+    if args.fast:
+        # Candidates were saved by their workers: keep the winner, drop the rest
+        os.replace(trained.pop(best_name), model_path)
+        for path in trained.values():
+            os.remove(path)
+        best_model = None
+    else:
+        best_model = trained[best_name]
+
+    compaction = {"enabled": False}
+    if args.compact:
+        if best_model is None:
+            best_model = joblib.load(model_path)
+        if hasattr(best_model.steps[-1][1], "estimators_"):
+            if not _shared:
+                _shared.update(
+                    X_train=np.ascontiguousarray(prep.transform(X_train), dtype=np.float32),
+                    X_test=np.ascontiguousarray(prep.transform(X_test), dtype=np.float32),
+                    y_train=y_train.to_numpy(),
+                    y_test=y_test.to_numpy(),
+                )
+            t0 = time.perf_counter()
+            best_model, compaction = compact_forest(
+                best_model, _shared["X_train"], _shared["y_train"], _shared["X_test"], _shared["y_test"],
+                X_sample, args.max_f1_loss, args.latency_budget_ms, args.size_budget_mb,
+                args.compact_depths, args.compact_leaves,
+                fit=lambda est, X, y: fit_within_budget(est, est, X, y, budget),
+            )
+            compaction.update(enabled=True, seconds=round(time.perf_counter() - t0, 3))
+            chosen = compaction["chosen"]
+            print(f"Compacted {best_name}: {chosen['n_estimators']} trees, max_depth={chosen['max_depth']}, "
+                  f"max_leaf_nodes={chosen['max_leaf_nodes']}, F1 {chosen['f1_macro']:.4f}, "
+                  f"{chosen['model_size_mb']} MB, {chosen['row_latency_ms']} ms/row")
+            if compaction["budget_met"] is False:
+                print("Warning: no variant within --max_f1_loss meets the latency/size budget.")
+        else:
+            compaction = {"enabled": False, "reason": f"{best_name} is not a forest"}
+    _shared.clear()
+    if best_model is not None:
+        joblib.dump(best_model, model_path)
+
+    if best_model is None:
+        best_model = joblib.load(model_path)
+    final_clf = best_model.steps[-1][1]
+    n_trees = len(final_clf.estimators_) if isinstance(final_clf, RandomForestClassifier) else 0
+    save_state(args.outdir, initial_state(train_stats, n_trees, args.csv))
+    save_reference(args.outdir, drift_reference)
+
+    bundle_path = os.path.join(args.outdir, COMPILED_MODEL_FILE)
+    fast_start = {"enabled": False}
+    if not args.no_fast_start:
+        fast_start = write_fast_start(best_model, X_sample, args.outdir)
+        if fast_start["enabled"]:
+            print(f"Saved fast-start bundle ({fast_start['model_size_mb']} MB) to: {bundle_path}")
+        else:
+            print(f"No fast-start bundle: {fast_start['reason']}")
+    elif os.path.exists(bundle_path):
+        # A bundle from an earlier run belongs to the previous model
+        os.remove(bundle_path)
+    training["total_seconds"] = round(time.perf_counter() - t_start, 3)
+    training["peak_rss_mb"] = peak_rss_mb()
 
     meta = {
         "sklearn_version": "1.7.1",
@@ -184,6 +628,15 @@ def main():
         "numeric_cols": num_cols,
         "categorical_cols": cat_cols,
         "results": results,
+        "model_file": os.path.basename(model_path),
+        "training": training,
+        "selection": selection,
+        "compaction": compaction,
+        "search": search,
+        "fast_start": fast_start,
+        "who_features": who_features,
+        "training_state": STATE_FILE,
+        "drift_reference": DRIFT_FILE,
     }
     with open(os.path.join(args.outdir, "metadata.json"), "w") as f:
         json.dump(meta, f, indent=2)
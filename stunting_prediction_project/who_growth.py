@@ -0,0 +1,290 @@
+"""WHO Child Growth Standards (2006) z-scores, vectorised over whole columns.
+
+The LMS reference tables (Box-Cox power L, median M and coefficient of
+variation S per sex and month of age or cm of height) are stored in
+``who_lms.npz`` as small NumPy arrays. The bundle is built from the
+WHO-format text tables in ``who_tables/`` (``python who_growth.py --build
+who_tables``), which are read directly when no bundle has been built. A
+z-score is a table lookup with linear interpolation plus a few array
+operations, so millions of rows are scored without per-row Python.
+
+Indicators:
+  hfa  length/height-for-age, 0-60 months (length below 24 months, standing
+       height from 24 months, as in the WHO tables)
+  wfa  weight-for-age, 0-60 months
+
+Weight-for-length/height is not supported: its WHO tables are indexed by
+length/height rather than age and are not shipped in ``who_tables/``.
+
+Sex codes follow api_model: 1 = boy (Laki-laki), 0 = girl (Perempuan);
+-1 (unrecognised) and out-of-range ages/heights give NaN.
+"""
+import argparse
+import json
+import os
+import re
+from functools import lru_cache
+
+import numpy as np
+
+FORMAT_VERSION = 1
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TABLE_FILE = os.path.join(BASE_DIR, "who_lms.npz")
+SOURCE_DIR = os.path.join(BASE_DIR, "who_tables")
+
+# Tables that can be bundled and what they are indexed by; sex index 0 = girls, 1 = boys
+TABLES = {"hfa": "age", "wfa": "age"}
+SEXES = ("girls", "boys")
+DAYS_PER_MONTH = 30.4375
+# First column of a WHO table -> unit of the index
+INDEX_UNITS = {"month": "month", "day": "day"}
+
+# Feature columns for train.py/infer.py, one per indicator
+FEATURES = {"hfa_z": "hfa", "wfa_z": "wfa"}
+# Input roles and the column names they are recognised by
+ROLE_PATTERNS = {
+    "age": r"umur|usia|age",
+    "sex": r"kelamin|gender|sex",
+    "height": r"tinggi|height",
+    "weight": r"berat|weight",
+}
+# Height-for-age categories (Permenkes RI No. 2/2020), same order as the API's fallback codes
+HFA_CATEGORIES = ("Sangat Pendek", "Pendek", "Normal", "Tinggi")
+HFA_CUTOFFS = (-3.0, -2.0, 3.0)
+
+BOY_LABELS = {"1", "l", "lk", "laki", "laki-laki", "laki laki", "m", "male", "boy", "boys"}
+GIRL_LABELS = {"0", "p", "pr", "perempuan", "f", "female", "girl", "girls"}
+
+
+def sex_codes(values):
+    """1 for boys, 0 for girls, -1 if unrecognised; accepts 1/0 or labels ('L', 'Laki-laki', 'P', ...)."""
+    arr = np.asarray(values)
+    if arr.dtype.kind in "biuf":
+        return np.where(arr == 1, 1, np.where(arr == 0, 0, -1)).astype(np.int8)
+    # Few distinct labels: classify each once and broadcast back
+    uniques, inverse = np.unique(arr.astype(str), return_inverse=True)
+    lookup = np.array([1 if u.strip().lower() in BOY_LABELS
+                       else 0 if u.strip().lower() in GIRL_LABELS else -1 for u in uniques],
+                      dtype=np.int8)
+    return lookup[inverse.reshape(arr.shape)]
+
+
+def classify_height_for_age(z):
+    """Category codes 0-3 (index into HFA_CATEGORIES) for height-for-age z-scores; -1 where z is NaN.
+
+    >>> classify_height_for_age([-3.0, -2.5, -2.0, -1.9, 3.0, 3.1]).tolist()
+    [1, 1, 2, 2, 2, 3]
+    """
+    z = np.asarray(z, dtype=np.float64)
+    very_short, short, tall = HFA_CUTOFFS
+    # Strict bounds as in Permenkes 2/2020 and rule_based_classes: z = -3 is
+    # Pendek, z = -2 and z = 3 are Normal
+    codes = np.select([z < very_short, z < short, z > tall], [0, 1, 3], 2).astype(np.int8)
+    codes[np.isnan(z)] = -1
+    return codes
+
+
+def read_lms_file(path):
+    """Read one WHO LMS text table (first column Month/Day, then L, M, S, ...).
+
+    Returns (x0, step, unit, lms) with lms of shape (n, 3).
+    """
+    header, rows = None, []
+    with open(path) as f:
+        for line in f:
+            if not line.strip() or line.lstrip().startswith("#"):
+                continue
+            parts = line.split()
+            if header is None:
+                header = [p.lower() for p in parts]
+                continue
+            rows.append([float(p) for p in parts])
+    if header is None or header[0] not in INDEX_UNITS or not rows:
+        raise ValueError(f"{path}: expected a header starting with one of {sorted(INDEX_UNITS)}")
+    data = np.array(rows)
+    x = data[:, 0]
+    step = float(x[1] - x[0]) if len(x) > 1 else 1.0
+    if not np.allclose(np.diff(x), step):
+        raise ValueError(f"{path}: the {header[0]} column is not evenly spaced")
+    lms = data[:, [header.index("l"), header.index("m"), header.index("s")]]
+    return float(x[0]), step, INDEX_UNITS[header[0]], lms
+
+
+def build_tables(source_dir):
+    """Read ``{table}_{boys,girls}.txt`` from `source_dir` into (meta, arrays) for the bundle."""
+    meta = {"format_version": FORMAT_VERSION, "source": os.path.basename(os.path.normpath(source_dir)),
+            "tables": {}}
+    arrays = {}
+    for table in TABLES:
+        paths = [os.path.join(source_dir, f"{table}_{sex}.txt") for sex in SEXES]
+        if not all(os.path.exists(p) for p in paths):
+            continue
+        parsed = [read_lms_file(p) for p in paths]
+        x0, step, unit, _ = parsed[0]
+        if any(p[:3] != (x0, step, unit) or len(p[3]) != len(parsed[0][3]) for p in parsed):
+            raise ValueError(f"{table}: boys and girls tables must share the same {unit} axis")
+        meta["tables"][table] = {"x0": x0, "step": step, "unit": unit, "n": len(parsed[0][3])}
+        arrays[f"{table}_lms"] = np.stack([p[3] for p in parsed])
+    if "hfa" not in meta["tables"]:
+        raise ValueError(f"No hfa_boys.txt/hfa_girls.txt in {source_dir}")
+    return meta, arrays
+
+
+def save_tables(path, meta, arrays):
+    np.savez(path, meta=np.array(json.dumps(meta)), **arrays)
+
+
+class GrowthStandard:
+    """LMS tables by sex with vectorised z-score computation."""
+
+    def __init__(self, meta, arrays):
+        if meta.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported WHO table format: {meta.get('format_version')}")
+        self.meta = meta
+        self.tables = {}
+        for table, info in meta["tables"].items():
+            lms = np.ascontiguousarray(arrays[f"{table}_lms"], dtype=np.float64)
+            # L == 1 everywhere (length/height) reduces the Box-Cox transform to (y/M - 1)/S
+            self.tables[table] = (info["x0"], info["step"], info["unit"], lms, bool(np.all(lms[..., 0] == 1)))
+
+    @classmethod
+    def load(cls, path=TABLE_FILE):
+        with np.load(path, allow_pickle=False) as bundle:
+            meta = json.loads(str(bundle["meta"]))
+            arrays = {k: bundle[k] for k in bundle.files if k != "meta"}
+        return cls(meta, arrays)
+
+    @property
+    def indicators(self):
+        """Indicators this standard can score (the tables in the bundle)."""
+        return [t for t in TABLES if t in self.tables]
+
+    def _table_z(self, table, sex, x, y):
+        x0, step, unit, lms, normal = self.tables[table]
+        sex = sex_codes(sex)
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        if unit == "day":
+            x = x * DAYS_PER_MONTH
+        n = lms.shape[1]
+        pos = (x - x0) / step
+        valid = (pos >= 0) & (pos <= n - 1) & (sex >= 0)
+        pos = np.where(valid, pos, 0.0)
+        i = np.minimum(pos.astype(np.intp), n - 2)
+        frac = (pos - i)[..., None]
+        s = np.where(valid, sex, 0).astype(np.intp)
+        # Linear interpolation between neighbouring table rows
+        L, M, S = np.moveaxis(lms[s, i] * (1 - frac) + lms[s, i + 1] * frac, -1, 0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            if normal:
+                z = (y / M - 1) / S
+            else:
+                z = (np.power(y / M, L) - 1) / (L * S)
+                # WHO restricted application for weight indicators: beyond +/-3 SD,
+                # distances are measured in units of the 2-3 SD interval
+                sd = {k: M * np.power(1 + L * S * k, 1 / L) for k in (-3, -2, 2, 3)}
+                z = np.where(z > 3, 3 + (y - sd[3]) / (sd[3] - sd[2]), z)
+                z = np.where(z < -3, -3 + (y - sd[-3]) / (sd[-2] - sd[-3]), z)
+        return np.where(valid, z, np.nan)
+
+    def height_for_age(self, sex, age_months, height_cm):
+        return self._table_z("hfa", sex, age_months, height_cm)
+
+    def weight_for_age(self, sex, age_months, weight_kg):
+        return self._table_z("wfa", sex, age_months, weight_kg)
+
+    def zscores(self, sex, age_months, height_cm, weight_kg, indicators=None):
+        """{indicator: z array} for `indicators` (default: every available one)."""
+        sex = sex_codes(sex)
+        out = {}
+        for indicator in indicators or self.indicators:
+            if indicator == "hfa":
+                out[indicator] = self.height_for_age(sex, age_months, height_cm)
+            elif indicator == "wfa":
+                out[indicator] = self.weight_for_age(sex, age_months, weight_kg)
+            else:
+                raise KeyError(f"Unknown indicator '{indicator}'")
+        return out
+
+
+@lru_cache(maxsize=None)
+def load(path=TABLE_FILE):
+    """The bundled standard (loaded once per process).
+
+    Without a built bundle at the default location, the tables are read from
+    ``who_tables/`` instead (a few milliseconds more at first use).
+    """
+    if path == TABLE_FILE and not os.path.exists(path):
+        return GrowthStandard(*build_tables(SOURCE_DIR))
+    return GrowthStandard.load(path)
+
+
+def feature_names(standard=None):
+    """Feature column names available from `standard` (default: the bundled one)."""
+    indicators = (standard or load()).indicators
+    return [name for name, indicator in FEATURES.items() if indicator in indicators]
+
+
+def find_columns(names):
+    """Map the roles age/sex/height/weight to the first matching column name."""
+    names = [n for n in names if n not in FEATURES]
+    columns = {}
+    for role, pattern in ROLE_PATTERNS.items():
+        match = next((n for n in names if re.search(pattern, str(n), flags=re.I)), None)
+        if match is None:
+            raise ValueError(f"No {role} column (pattern '{pattern}') among {names}")
+        columns[role] = match
+    return columns
+
+
+def add_features(data, features, columns, standard=None, dtype=np.float64):
+    """Compute the z-score `features` from the role `columns` of `data` and store them in it.
+
+    `data` is a DataFrame or a dict of columns; returns it for chaining.
+    """
+    standard = standard or load()
+    z = standard.zscores(
+        np.asarray(data[columns["sex"]]),
+        np.asarray(data[columns["age"]], dtype=np.float64),
+        np.asarray(data[columns["height"]], dtype=np.float64),
+        np.asarray(data[columns["weight"]], dtype=np.float64),
+        [FEATURES[name] for name in features],
+    )
+    for name in features:
+        data[name] = z[FEATURES[name]].astype(dtype, copy=False)
+    return data
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Build or check the WHO LMS bundle used by who_growth")
+    ap.add_argument("--build", metavar="DIR", help="Directory with {hfa,wfa}_{boys,girls}.txt")
+    ap.add_argument("--output", default=TABLE_FILE)
+    ap.add_argument("--verify", metavar="DIR",
+                    help="Compare the bundle with WHO tables in DIR (same file names) and report differences")
+    args = ap.parse_args()
+
+    if args.build:
+        meta, arrays = build_tables(args.build)
+        save_tables(args.output, meta, arrays)
+        summary = ", ".join(f"{t} ({info['n']} x {info['unit']})" for t, info in meta["tables"].items())
+        print(f"Saved WHO LMS tables [{summary}] to: {args.output}")
+    if args.verify:
+        bundled = GrowthStandard.load(args.output)
+        meta, arrays = build_tables(args.verify)
+        for table, info in meta["tables"].items():
+            if table not in bundled.tables:
+                print(f"{table}: not in the bundle")
+                continue
+            x0, step, unit, lms, _ = bundled.tables[table]
+            other = arrays[f"{table}_lms"]
+            if (x0, step, unit) != (info["x0"], info["step"], info["unit"]) or lms.shape != other.shape:
+                print(f"{table}: different axis ({x0}/{step} {unit} vs {info['x0']}/{info['step']} {info['unit']})")
+                continue
+            diff = np.abs(lms - other).max(axis=(0, 1))
+            print(f"{table}: max |diff| L={diff[0]:.5g} M={diff[1]:.5g} S={diff[2]:.5g}")
+    if not args.build and not args.verify:
+        ap.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Fixtures for the api_model tests: small trained artifact directories and a Flask test client."""
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# api_model and its route modules live in the repository root
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+NUM_COLS = ["Umur_(bulan)", "Tinggi_Badan_(cm)", "Berat_Badan_(kg)"]
+CAT_COLS = ["Jenis_Kelamin", "Wasting"]
+
+
+def training_frame(n, seed):
+    """Synthetic measurements labelled by a rough height-for-age rule (1 = stunting)."""
+    rng = np.random.default_rng(seed)
+    age = rng.integers(0, 61, n)
+    height = 50 + 1.5 * age + rng.normal(0, 6, n)
+    X = pd.DataFrame({
+        "Umur_(bulan)": age,
+        "Tinggi_Badan_(cm)": height.round(1),
+        "Berat_Badan_(kg)": (3 + 0.25 * age + rng.normal(0, 1.5, n)).round(1),
+        "Jenis_Kelamin": rng.choice(["Laki-laki", "Perempuan"], n),
+        "Wasting": rng.choice(["Normal weight", "Underweight"], n),
+    })
+    y = (height < 50 + 1.5 * age - 4).astype(int)
+    return X, y
+
+
+def write_artifacts(model_dir, seed=0, n_estimators=20, who_features=False):
+    """Train a small Pipeline like train.py and write it with metadata.json and a drift reference.
+
+    With `who_features`, the WHO z-scores are added as features as by train.py --who_features.
+    """
+    import joblib
+    from sklearn.compose import ColumnTransformer
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.impute import SimpleImputer
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import OneHotEncoder, StandardScaler
+    from stunting_prediction_project.drift import DRIFT_FILE, build_reference, save_reference
+
+    X, y = training_frame(600, seed)
+    num_cols, who = list(NUM_COLS), None
+    if who_features:
+        from stunting_prediction_project.who_growth import add_features, feature_names, find_columns
+
+        who = {"features": feature_names(), "columns": find_columns(list(X.columns))}
+        add_features(X, who["features"], who["columns"])
+        num_cols += who["features"]
+    prep = ColumnTransformer([
+        ("num", Pipeline([("imputer", SimpleImputer(strategy="median")),
+                          ("scaler", StandardScaler(with_mean=False))]), num_cols),
+        ("cat", Pipeline([("imputer", SimpleImputer(strategy="most_frequent")),
+                          ("onehot", OneHotEncoder(handle_unknown="ignore", sparse_output=False))]), CAT_COLS),
+    ])
+    model = Pipeline([("prep", prep),
+                      ("clf", RandomForestClassifier(n_estimators=n_estimators, max_depth=6, random_state=seed))])
+    model.fit(X, y)
+
+    os.makedirs(model_dir, exist_ok=True)
+    model_file = "best_model_RandomForest.joblib"
+    joblib.dump(model, os.path.join(model_dir, model_file))
+    save_reference(model_dir, build_reference(X, num_cols, CAT_COLS))
+    meta = {
+        "target_col": "Stunting",
+        "numeric_cols": num_cols,
+        "categorical_cols": CAT_COLS,
+        "model_file": model_file,
+        "who_features": who,
+        "drift_reference": DRIFT_FILE,
+        "seed": seed,
+    }
+    with open(os.path.join(model_dir, "metadata.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+    return model_dir
+
+
+@pytest.fixture(scope="session")
+def model_root(tmp_path_factory):
+    """MODEL_ROOT with two versions, artifacts_a (active in the tests) and artifacts_b."""
+    root = tmp_path_factory.mktemp("models")
+    write_artifacts(str(root / "artifacts_a"), seed=0)
+    write_artifacts(str(root / "artifacts_b"), seed=1, n_estimators=30)
+    return str(root)
+
+
+@pytest.fixture(scope="session")
+def who_model_dir(tmp_path_factory):
+    """Artifact directory of a model trained with the WHO z-score features."""
+    return write_artifacts(str(tmp_path_factory.mktemp("models") / "artifacts_who"), who_features=True)
+
+
+@pytest.fixture
+def api(model_root, monkeypatch):
+    """api_model serving a freshly loaded artifacts_a, without cache, batcher or history.
+
+    Module globals are restored after each test, so tests can swap in their own.
+    """
+    import api_model
+
+    for name in ("active", "model", "risk_table"):
+        monkeypatch.setattr(api_model, name, getattr(api_model, name))
+    monkeypatch.setattr(api_model, "MODEL_ROOT", model_root)
+    monkeypatch.setattr(api_model, "prediction_cache", None)
+    monkeypatch.setattr(api_model, "batcher", None)
+    monkeypatch.setattr(api_model, "history_store", None)
+    api_model.activate(api_model.load_version(os.path.join(model_root, "artifacts_a")))
+    return api_model
+
+
+@pytest.fixture
+def client(api):
+    return api.app.test_client()
+
@@ -0,0 +1,59 @@
+"""Micro-batched /predict: same answers as direct scoring, and a bounded wait on the batch thread."""
+import threading
+import time
+
+from prediction_batcher import PredictionBatcher
+from record_scorer import score_records
+
+RECORDS = [{"usia_bulan": age, "tinggi_badan": 50 + 1.4 * age, "berat_badan": 3 + 0.25 * age,
+            "gender": "LP"[age % 2]} for age in range(0, 60, 3)]
+
+
+def post_concurrently(client_factory, records):
+    """POST every record to /predict from its own thread; returns the bodies in record order."""
+    bodies = [None] * len(records)
+    start = threading.Barrier(len(records))
+
+    def send(i):
+        client = client_factory()
+        start.wait()
+        bodies[i] = client.post("/predict", json=records[i]).get_json()
+
+    threads = [threading.Thread(target=send, args=(i,)) for i in range(len(records))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return bodies
+
+
+def test_batched_equals_direct(api, client, monkeypatch):
+    direct = [client.post("/predict", json=r).get_json() for r in RECORDS]
+
+    batcher = PredictionBatcher(score_records, max_batch_size=8, max_wait_ms=20)
+    monkeypatch.setattr(api, "batcher", batcher)
+    batched = post_concurrently(api.app.test_client, RECORDS)
+
+    assert batched == direct
+    stats = client.get("/predict/batcher").get_json()
+    assert stats["enabled"] and stats["rows"] == len(RECORDS)
+    assert stats["largest_batch_size"] <= 8
+
+
+def test_stalled_batcher_falls_back_to_direct_scoring(api, client, monkeypatch):
+    expected = client.post("/predict", json=RECORDS[0]).get_json()
+
+    def slow(version, records):
+        time.sleep(1.0)
+        return score_records(version, records)
+
+    monkeypatch.setattr(api, "batcher", PredictionBatcher(slow, max_wait_ms=1))
+    monkeypatch.setattr(api, "BATCH_TIMEOUT_MS", 50)
+    timeouts = api.errors_total.value("predict", "batcher_timeout")
+    started = time.perf_counter()
+    body = client.post("/predict", json=RECORDS[0]).get_json()
+
+    assert time.perf_counter() - started < 0.9
+    assert body == expected
+    assert api.errors_total.value("predict", "batcher_timeout") == timeouts + 1
+
@@ -0,0 +1,44 @@
+"""The /predict result cache: hits on repeated inputs, dropped when the model is reloaded."""
+import os
+
+import pytest
+
+from prediction_cache import PredictionCache
+
+RECORD = {"usia_bulan": 24, "tinggi_badan": 80.0, "berat_badan": 10.5, "gender": "L"}
+
+
+@pytest.fixture
+def cache(api, monkeypatch):
+    cache = PredictionCache(max_size=16, ttl_seconds=3600)
+    monkeypatch.setattr(api, "prediction_cache", cache)
+    return cache
+
+
+def test_repeated_record_is_a_hit(client, cache):
+    first = client.post("/predict", json=RECORD).get_json()
+    second = client.post("/predict", json=RECORD).get_json()
+    assert second == first
+    assert first["message"] == "Prediction based on AI Model."
+    stats = client.get("/predict/cache").get_json()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (1, 1, 1)
+
+
+def test_key_is_quantized_but_inputs_are_echoed_as_sent(client, cache):
+    client.post("/predict", json=RECORD)
+    body = client.post("/predict", json={**RECORD, "tinggi_badan": 80.04}).get_json()
+    assert cache.stats()["hits"] == 1
+    assert body["input_received"]["tinggi"] == 80.04
+
+
+def test_reload_invalidates_cached_predictions(api, client, cache, model_root):
+    client.post("/predict", json=RECORD)
+    assert cache.stats()["size"] == 1
+    api.activate(api.load_version(os.path.join(model_root, "artifacts_b")))
+    client.post("/predict", json=RECORD)
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["invalidations"], stats["size"]) == (0, 2, 1, 1)
+
+
+def test_cache_disabled(client):
+    assert client.get("/predict/cache").get_json() == {"enabled": False}
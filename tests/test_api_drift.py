@@ -0,0 +1,52 @@
+"""Input-drift monitor: /drift counts the records scored by /predict and /predict/batch."""
+import os
+
+RECORDS = [{"usia_bulan": age, "tinggi_badan": 50 + 1.5 * age, "berat_badan": 3 + 0.25 * age,
+            "gender": "LP"[age % 2]} for age in range(0, 60, 5)]
+
+
+def test_drift_counts_scored_records(client):
+    for record in RECORDS[:5]:
+        client.post("/predict", json=record)
+    client.post("/predict/batch", json=RECORDS[5:] + [{"usia_bulan": 3}])  # The invalid one is not counted
+
+    response = client.get("/drift")
+    assert response.status_code == 200
+    report = response.get_json()
+    assert report["rows_seen"] == report["recent_rows"] == len(RECORDS)
+    assert set(report["features"]) == {"Umur_(bulan)", "Tinggi_Badan_(cm)", "Berat_Badan_(kg)",
+                                       "Jenis_Kelamin", "Wasting"}
+    for feature in ("Umur_(bulan)", "Tinggi_Badan_(cm)", "Berat_Badan_(kg)"):
+        assert report["features"][feature]["missing_rate"] == 0.0
+
+
+def test_drift_counts_restart_with_a_new_version(api, client, model_root):
+    client.post("/predict", json=RECORDS[0])
+    api.activate(api.load_version(os.path.join(model_root, "artifacts_b")))
+    client.post("/predict/batch", json=RECORDS[:3])
+    report = client.get("/drift").get_json()
+    assert report["version"] == api.active.version
+    assert report["rows_seen"] == 3
+
+
+def test_who_features_are_observed(api, client, who_model_dir):
+    # The reference of a --who_features model holds hfa_z/wfa_z; requests must fill them in
+    api.activate(api.load_version(who_model_dir))
+    client.post("/predict", json=RECORDS[0])
+    client.post("/predict/batch", json=RECORDS[1:])
+    report = client.get("/drift").get_json()
+    assert report["rows_seen"] == len(RECORDS)
+    for feature in ("hfa_z", "wfa_z"):
+        assert report["features"][feature]["missing_rate"] == 0.0
+
+
+def test_drift_gauges_in_metrics(client):
+    for record in RECORDS:
+        client.post("/predict", json=record)
+    text = client.get("/metrics").get_data(as_text=True)
+    assert 'stunting_drift_psi{feature="Umur_(bulan)"}' in text
+
+
+def test_no_reference(api, client, monkeypatch):
+    monkeypatch.setattr(api.active, "drift", None)
+    assert client.get("/drift").status_code == 404
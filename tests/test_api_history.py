@@ -0,0 +1,67 @@
+"""Growth history: visits sent with /predict and /predict/batch come back from /history."""
+import pytest
+
+VISITS = [
+    {"usia_bulan": 12, "tinggi_badan": 72.0, "berat_badan": 8.9, "tanggal_ukur": "2025-01-10"},
+    {"usia_bulan": 15, "tinggi_badan": 74.0, "berat_badan": 9.4, "tanggal_ukur": "2025-04-10"},
+    {"usia_bulan": 18, "tinggi_badan": 75.0, "berat_badan": 9.8, "tanggal_ukur": "2025-07-10"},
+]
+
+
+@pytest.fixture
+def history(api, monkeypatch, tmp_path):
+    from stunting_prediction_project.growth_history import GrowthHistory
+
+    store = GrowthHistory(str(tmp_path / "history.sqlite"))
+    monkeypatch.setattr(api, "history_store", store)
+    yield store
+    store.close()
+
+
+def test_predict_round_trip(client, history):
+    for visit in VISITS:
+        body = {**visit, "gender": "L", "id_anak": "A1", "desa": "Sukamaju"}
+        assert client.post("/predict", json=body).status_code == 200
+
+    response = client.get("/history/A1")
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["id_anak"] == "A1"
+    assert [v["tanggal_ukur"] for v in body["visits"]] == [v["tanggal_ukur"] for v in VISITS]
+    assert [v["tinggi"] for v in body["visits"]] == [v["tinggi_badan"] for v in VISITS]
+    assert all(v["gender"] == "Laki-laki" and v["desa"] == "Sukamaju" for v in body["visits"])
+    assert all(0.0 <= v["prob_stunting"] <= 1.0 for v in body["visits"])
+
+    trajectory = body["trajectory"]
+    assert trajectory["child_id"] == "A1" and trajectory["visits"] == 3
+    assert (trajectory["first_date"], trajectory["last_date"]) == ("2025-01-10", "2025-07-10")
+    assert trajectory["haz_per_month"] < 0
+    assert trajectory["risk"] in ("Normal", "Berisiko", "Stunting")
+
+
+def test_batch_visits_and_village_trajectories(client, history):
+    records = [{**visit, "gender": "P", "id_anak": child, "desa": "Sukamaju"}
+               for child in ("B1", "B2") for visit in VISITS]
+    records.append({**VISITS[0], "gender": "P"})  # No id_anak: scored, not stored
+    body = client.post("/predict/batch", json=records).get_json()
+    assert body["count"] == len(records) and body["errors"] == []
+    assert history.count() == 6
+
+    body = client.post("/history/trajectories", json={"desa": "Sukamaju"}).get_json()
+    assert (body["count"], body["visits"]) == (2, 6)
+    assert sorted(r["child_id"] for r in body["results"]) == ["B1", "B2"]
+
+    body = client.post("/history/trajectories", json={"id_anak": ["B2", "nope"]}).get_json()
+    assert [r["child_id"] for r in body["results"]] == ["B2"]
+
+
+def test_invalid_date_is_rejected_and_not_stored(client, history):
+    body = {**VISITS[0], "gender": "L", "id_anak": "A1", "tanggal_ukur": "2025-13-01"}
+    assert client.post("/predict", json=body).status_code == 400
+    assert history.count() == 0
+    assert client.get("/history/A1").status_code == 404
+
+
+def test_history_off(client):
+    assert client.get("/history/A1").status_code == 404
+    assert client.post("/history/trajectories", json={"id_anak": ["A1"]}).status_code == 404
@@ -0,0 +1,73 @@
+"""Hot model reload through /admin/model/reload while /predict keeps serving."""
+import threading
+
+import pytest
+
+RECORD = {"usia_bulan": 20, "tinggi_badan": 70.0, "berat_badan": 9.0, "gender": "L"}
+
+
+@pytest.fixture
+def admin(api, monkeypatch):
+    # The test client calls from 127.0.0.1, which is allowed without a token
+    monkeypatch.setattr(api, "ADMIN_TOKEN", None)
+    return api
+
+
+def test_reload_swaps_version_without_failed_requests(admin, client):
+    before = admin.active.version
+    failures, answered = [], []
+    stop = threading.Event()
+
+    def predict():
+        c = admin.app.test_client()
+        while not stop.is_set():
+            response = c.post("/predict", json=RECORD)
+            body = response.get_json()
+            if response.status_code != 200 or body["message"] != "Prediction based on AI Model.":
+                failures.append(body)
+            answered.append(body["status"])
+
+    threads = [threading.Thread(target=predict) for _ in range(3)]
+    for t in threads:
+        t.start()
+    try:
+        response = client.post("/admin/model/reload", json={"version": "artifacts_b", "wait": True})
+    finally:
+        stop.set()
+        for t in threads:
+            t.join()
+
+    assert response.status_code == 200
+    reload = response.get_json()["reload"]
+    assert reload["state"] == "idle" and reload["last_reload"]["previous_version"] == before
+    assert admin.active.version != before
+    assert admin.active.model_dir.endswith("artifacts_b")
+    assert answered and not failures
+
+
+def test_reload_of_active_version_is_a_no_op(admin, client):
+    version = admin.active.version
+    body = client.post("/admin/model/reload", json={"version": "artifacts_a", "wait": True}).get_json()
+    assert body["message"] == "Version already active"
+    assert admin.active.version == version
+
+
+def test_failed_reload_keeps_active_version(admin, client, tmp_path):
+    version = admin.active.version
+    broken = tmp_path / "artifacts_broken"
+    broken.mkdir()
+    (broken / "metadata.json").write_text('{"model_file": "missing.joblib"}')
+    admin.reloader.start(str(broken))
+    admin.reloader.wait()
+    assert admin.reloader.state == "failed"
+    assert admin.active.version == version
+    assert client.post("/predict", json=RECORD).get_json()["message"] == "Prediction based on AI Model."
+
+
+def test_admin_requires_token_when_set(admin, client, monkeypatch):
+    monkeypatch.setattr(admin, "ADMIN_TOKEN", "secret")
+    assert client.get("/admin/model").status_code == 403
+    response = client.get("/admin/model", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    assert {entry["version"] for entry in response.get_json()["available"] if entry["active"]} == \
+        {admin.active.version}